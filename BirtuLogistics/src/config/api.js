@@ -5,10 +5,16 @@ export const API_ENDPOINTS = {
   REGISTER: '/auth/register',
   LOGIN: '/auth/login',
   VERIFY_OTP: '/auth/verify-otp',
+  REFRESH: '/auth/refresh',
+  LOGOUT: '/auth/logout',
+  SESSIONS: '/auth/sessions',
+  SESSION: (id) => `/auth/sessions/${id}`,
+  MY_LOCATION: '/auth/me/location',
   
   // Shipments
   SHIPMENTS: '/shipments',
   SHIPMENTS_AVAILABLE: '/shipments/available',
+  SHIPMENTS_BULK: '/shipments/bulk',
   PUBLISH_SHIPMENT: (id) => `/shipments/${id}/publish`,
   UPDATE_LOCATION: (id) => `/shipments/${id}/location`,
   UPDATE_RECEIVER: (id) => `/shipments/${id}/receiver`,
@@ -26,6 +32,9 @@ export const API_ENDPOINTS = {
   DELIVER: (id) => `/deliveries/${id}/deliver`,
   CONFIRM_DELIVERY: (id) => `/deliveries/${id}/confirm`,
   
+  // Delta sync
+  SYNC: '/sync',
+  
   // Payments
   INITIATE_PAYMENT: '/payments/initiate',
   PAYMENT_WEBHOOK: '/payments/webhook',
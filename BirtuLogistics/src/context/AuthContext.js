@@ -2,6 +2,7 @@ import React, { createContext, useContext, useReducer, useEffect, useRef } from
 import AsyncStorage from '@react-native-async-storage/async-storage';
 import * as Notifications from 'expo-notifications';
 import WebSocketService from '../services/websocket';
+import ApiService from '../services/api';
 
 Notifications.setNotificationHandler({
   handleNotification: async () => ({
@@ -22,6 +23,11 @@ const authReducer = (state, action) => {
         user: action.payload.user,
         token: action.payload.token,
       };
+    case 'SET_TOKEN':
+      return {
+        ...state,
+        token: action.payload,
+      };
     case 'LOGOUT':
       return {
         ...state,
@@ -53,6 +59,7 @@ export const AuthProvider = ({ children }) => {
 
   useEffect(() => {
     checkAuthState();
+    ApiService.onTokenRefreshed = (token) => dispatch({ type: 'SET_TOKEN', payload: token });
 
     // Setup notification listeners
     notificationListener.current = Notifications.addNotificationReceivedListener(notification => {
@@ -68,19 +75,21 @@ export const AuthProvider = ({ children }) => {
     return () => {
       Notifications.removeNotificationSubscription(notificationListener.current);
       Notifications.removeNotificationSubscription(responseListener.current);
+      ApiService.onTokenRefreshed = null;
     };
   }, []);
 
   useEffect(() => {
-    if (state.isAuthenticated && state.user?.id) {
-      // Connect WebSocket when user logs in
-      WebSocketService.connect(state.user.id);
+    if (state.isAuthenticated && state.user?.id && state.token) {
+      // Connect WebSocket when user logs in, or reconnect one the server
+      // closed once a refreshed token is available
+      WebSocketService.connect(state.user.id, state.token);
       WebSocketService.onMessage(handleWebSocketMessage);
     } else if (!state.isAuthenticated && WebSocketService.ws) {
       // Close WebSocket when user logs out
       WebSocketService.close();
     }
-  }, [state.isAuthenticated, state.user?.id]);
+  }, [state.isAuthenticated, state.user?.id, state.token]);
 
   const handleWebSocketMessage = (message) => {
     console.log('Received WebSocket message:', message);
@@ -146,10 +155,13 @@ export const AuthProvider = ({ children }) => {
     }
   };
 
-  const login = async (token, user) => {
+  const login = async (token, user, refreshToken) => {
     try {
       await AsyncStorage.setItem('token', token);
       await AsyncStorage.setItem('user', JSON.stringify(user));
+      if (refreshToken) {
+        await AsyncStorage.setItem('refreshToken', refreshToken);
+      }
       
       dispatch({
         type: 'LOGIN',
@@ -162,7 +174,13 @@ export const AuthProvider = ({ children }) => {
 
   const logout = async () => {
     try {
+      const refreshToken = await AsyncStorage.getItem('refreshToken');
+      if (refreshToken) {
+        // End the server-side session too; signing out locally still works offline
+        ApiService.logout(refreshToken).catch(() => {});
+      }
       await AsyncStorage.removeItem('token');
+      await AsyncStorage.removeItem('refreshToken');
       await AsyncStorage.removeItem('user');
       
       dispatch({ type: 'LOGOUT' });
@@ -52,7 +52,7 @@ const LoginScreen = ({ navigation }) => {
         password: password.trim(),
       });
 
-      await login(response.token, response.user);
+      await login(response.access_token, response.user, response.refresh_token);
       
       // Navigation will be handled by the auth state change
     } catch (error) {
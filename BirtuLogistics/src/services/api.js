@@ -1,15 +1,31 @@
 import AsyncStorage from '@react-native-async-storage/async-storage';
 import { API_BASE_URL, API_ENDPOINTS } from '../config/api';
 
+// A 401 from these means bad credentials, not an expired access token
+const NO_REFRESH = [API_ENDPOINTS.LOGIN, API_ENDPOINTS.REFRESH, API_ENDPOINTS.LOGOUT];
+
 class ApiService {
-  async request(endpoint, options = {}) {
+  constructor() {
+    // Last GET response per URL and token, revalidated with If-None-Match
+    this.etagCache = new Map();
+    // In-flight refresh, shared by requests that hit an expired token together
+    this.refreshing = null;
+    // Called with each new access token, so the auth state and socket follow it
+    this.onTokenRefreshed = null;
+  }
+
+  async request(endpoint, options = {}, retried = false) {
     const url = `${API_BASE_URL}${endpoint}`;
     const token = await AsyncStorage.getItem('token');
+    const isGet = !options.method || options.method.toUpperCase() === 'GET';
+    const cacheKey = `${token}|${url}`;
+    const cached = isGet ? this.etagCache.get(cacheKey) : undefined;
     
     const config = {
       headers: {
         'Content-Type': 'application/json',
         ...(token && { Authorization: `Bearer ${token}` }),
+        ...(cached && { 'If-None-Match': cached.etag }),
         ...options.headers,
       },
       ...options,
@@ -17,12 +33,28 @@ class ApiService {
 
     try {
       const response = await fetch(url, config);
+
+      // Access token expired: swap the refresh token for a new pair and retry once
+      if (response.status === 401 && !retried && !NO_REFRESH.includes(endpoint) && await this.refreshTokens()) {
+        return this.request(endpoint, options, true);
+      }
+
+      // Unchanged since our last fetch: reuse it without downloading again
+      if (response.status === 304 && cached) {
+        return cached.data;
+      }
+
       const data = await response.json();
 
       if (!response.ok) {
         throw new Error(data.message || 'Something went wrong');
       }
 
+      const etag = response.headers.get('ETag');
+      if (isGet && etag) {
+        this.etagCache.set(cacheKey, { etag, data });
+      }
+
       return data;
     } catch (error) {
       console.error('API Error:', error);
@@ -30,6 +62,47 @@ class ApiService {
     }
   }
 
+  // Each refresh token works once, so concurrent callers wait on the same refresh
+  refreshTokens() {
+    if (!this.refreshing) {
+      this.refreshing = this.exchangeRefreshToken().finally(() => {
+        this.refreshing = null;
+      });
+    }
+    return this.refreshing;
+  }
+
+  async exchangeRefreshToken() {
+    const refreshToken = await AsyncStorage.getItem('refreshToken');
+    if (!refreshToken) {
+      return false;
+    }
+    try {
+      const response = await fetch(`${API_BASE_URL}${API_ENDPOINTS.REFRESH}`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ refresh_token: refreshToken }),
+      });
+      if (!response.ok) {
+        // Expired or revoked: the user has to log in again
+        await AsyncStorage.removeItem('refreshToken');
+        return false;
+      }
+      const data = await response.json();
+      await AsyncStorage.multiSet([
+        ['token', data.access_token],
+        ['refreshToken', data.refresh_token],
+      ]);
+      if (this.onTokenRefreshed) {
+        this.onTokenRefreshed(data.access_token);
+      }
+      return true;
+    } catch (error) {
+      console.error('Token refresh failed:', error);
+      return false;
+    }
+  }
+
   // Authentication
   async register(userData) {
     return this.request(API_ENDPOINTS.REGISTER, {
@@ -45,6 +118,26 @@ class ApiService {
     });
   }
 
+  async logout(refreshToken) {
+    return this.request(API_ENDPOINTS.LOGOUT, {
+      method: 'POST',
+      body: JSON.stringify({ refresh_token: refreshToken }),
+    });
+  }
+
+  // Devices the user is signed in on
+  async getSessions() {
+    return this.request(API_ENDPOINTS.SESSIONS);
+  }
+
+  async revokeSession(id) {
+    return this.request(API_ENDPOINTS.SESSION(id), { method: 'DELETE' });
+  }
+
+  async revokeAllSessions() {
+    return this.request(API_ENDPOINTS.SESSIONS, { method: 'DELETE' });
+  }
+
   async verifyOTP(otpData) {
     return this.request(API_ENDPOINTS.VERIFY_OTP, {
       method: 'POST',
@@ -60,6 +153,14 @@ class ApiService {
     });
   }
 
+  // Creates many shipments at once; the response has a result per row
+  async createShipmentsBulk(shipments, publish = false) {
+    return this.request(`${API_ENDPOINTS.SHIPMENTS_BULK}?publish=${publish}`, {
+      method: 'POST',
+      body: JSON.stringify(shipments),
+    });
+  }
+
   async updateShipmentLocation(id, locationData) {
     return this.request(API_ENDPOINTS.UPDATE_LOCATION(id), {
       method: 'PUT',
@@ -109,6 +210,20 @@ class ApiService {
     return this.request(API_ENDPOINTS.SHIPMENTS);
   }
 
+  // Changes since the last sync; pass the returned token back next time
+  async sync(since) {
+    const query = since ? `?since=${encodeURIComponent(since)}` : '';
+    return this.request(`${API_ENDPOINTS.SYNC}${query}`);
+  }
+
+  // Drivers report their position so dispatch can assign nearby shipments
+  async updateMyLocation(coordinates) {
+    return this.request(API_ENDPOINTS.MY_LOCATION, {
+      method: 'PUT',
+      body: JSON.stringify({ coordinates }),
+    });
+  }
+
   // Bidding
   async submitBid(bidData) {
     return this.request(API_ENDPOINTS.BIDS, {
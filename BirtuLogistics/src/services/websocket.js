@@ -1,3 +1,4 @@
+import AsyncStorage from "@react-native-async-storage/async-storage";
 import { API_BASE_URL } from "../config/api";
 
 class WebSocketService {
@@ -8,31 +9,35 @@ class WebSocketService {
     this.maxReconnectInterval = 30000; // milliseconds
     this.reconnectAttempts = 0;
     this.maxReconnectAttempts = 10;
+    // Topics to (re)subscribe to whenever the socket opens
+    this.topics = new Set();
   }
 
-  connect(userId) {
+  connect(userId, token) {
+    this.userId = userId;
+    this.token = token;
     if (this.ws && this.ws.readyState === WebSocket.OPEN) {
       console.log("WebSocket already connected.");
       return;
     }
 
-    const wsUrl = `${API_BASE_URL.replace("http", "ws")}/ws/${userId}`;
+    const wsUrl = `${API_BASE_URL.replace("http", "ws")}/ws/${userId}?token=${encodeURIComponent(token)}`;
     this.ws = new WebSocket(wsUrl);
 
     this.ws.onopen = () => {
       console.log("WebSocket connected");
       this.reconnectAttempts = 0; // Reset reconnect attempts on successful connection
+      this.topics.forEach((topic) => this.send({ action: "subscribe", topic }));
       if (this.callbacks.onOpen) {
         this.callbacks.onOpen();
       }
     };
 
     this.ws.onmessage = (event) => {
-      const message = JSON.parse(event.data);
-      console.log("WebSocket message received:", message);
-      if (this.callbacks.onMessage) {
-        this.callbacks.onMessage(message);
-      }
+      const data = JSON.parse(event.data);
+      // Messages sent close together arrive as one array frame
+      const messages = Array.isArray(data) ? data : [data];
+      messages.forEach((message) => this.handleMessage(message));
     };
 
     this.ws.onclose = (event) => {
@@ -40,7 +45,10 @@ class WebSocketService {
       if (this.callbacks.onClose) {
         this.callbacks.onClose(event);
       }
-      this.handleReconnect();
+      // 1008: rejected token, or replaced by a newer connection of this user
+      if (event.code !== 1008) {
+        this.handleReconnect();
+      }
     };
 
     this.ws.onerror = (error) => {
@@ -52,6 +60,18 @@ class WebSocketService {
     };
   }
 
+  handleMessage(message) {
+    if (message.type === "ping") {
+      // The server closes sockets that stop answering its heartbeat
+      this.send({ type: "pong" });
+      return;
+    }
+    console.log("WebSocket message received:", message);
+    if (this.callbacks.onMessage) {
+      this.callbacks.onMessage(message);
+    }
+  }
+
   handleReconnect() {
     if (this.reconnectAttempts < this.maxReconnectAttempts) {
       const delay = Math.min(
@@ -60,9 +80,11 @@ class WebSocketService {
       );
       this.reconnectAttempts++;
       console.log(`Attempting to reconnect in ${delay / 1000} seconds... (Attempt ${this.reconnectAttempts})`);
-      setTimeout(() => {
+      setTimeout(async () => {
         if (this.userId) {
-          this.connect(this.userId);
+          // Access tokens are refreshed in the background; use the latest one
+          const token = (await AsyncStorage.getItem("token")) || this.token;
+          this.connect(this.userId, token);
         }
       }, delay);
     } else {
@@ -78,6 +100,17 @@ class WebSocketService {
     }
   }
 
+  // e.g. subscribe(`shipment:${id}`) to receive the driver's live position
+  subscribe(topic) {
+    this.topics.add(topic);
+    this.send({ action: "subscribe", topic });
+  }
+
+  unsubscribe(topic) {
+    this.topics.delete(topic);
+    this.send({ action: "unsubscribe", topic });
+  }
+
   close() {
     if (this.ws) {
       this.ws.close();
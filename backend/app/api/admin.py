@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends
+from ..core.responses import model_response
+from ..models.user import UserInDB
+from ..models.dispatch import DispatchRequest
+from ..services.assignment_service import AssignmentService
+from ..services.container import container, get_assignment_service
+from ..api.auth import get_current_admin
+
+router = APIRouter()
+
+@router.get("/cache")
+async def get_cache_stats(
+    current_user: UserInDB = Depends(get_current_admin)
+):
+    """Returns hit-ratio statistics for the in-process caches."""
+    return {
+        "shipments": container.shipment_service.cache.stats()
+    }
+
+@router.post("/dispatch")
+async def dispatch_shipments(
+    dispatch: DispatchRequest,
+    current_user: UserInDB = Depends(get_current_admin),
+    assignment_service: AssignmentService = Depends(get_assignment_service)
+):
+    """Assigns open shipments to available drivers at minimum total cost, optionally accepting the bids."""
+    plan = await assignment_service.plan(
+        center=dispatch.center,
+        radius_km=dispatch.radius_km,
+        no_bid_cost=dispatch.no_bid_cost,
+        method=dispatch.method
+    )
+    plan["applied"] = await assignment_service.apply(plan["assignments"]) if dispatch.apply else 0
+    return model_response(plan)
@@ -1,13 +1,19 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from motor.motor_asyncio import AsyncIOMotorDatabase
-from ..core.database import get_database
 from ..core.security import verify_password, get_password_hash, create_access_token, verify_token
 from ..core.config import settings
-from ..models.user import UserCreate, UserLogin, Token, User, UserInDB
+from ..core.executor import blocking_executor
+from ..core.responses import model_response
+from ..core.etag import compute_etag, conditional_response
+from ..models.user import UserCreate, UserLogin, Token, User, UserInDB, LocationUpdate
+from ..models.session import RefreshRequest, Session
 from ..services.user_service import UserService
+from ..services.session_service import SessionService
+from ..services.container import get_user_service, get_session_service
 from datetime import datetime
+from typing import List
 
 router = APIRouter()
 security = HTTPBearer()
@@ -15,10 +21,8 @@ security = HTTPBearer()
 @router.post("/register", response_model=dict)
 async def register(
     user_data: UserCreate,
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    user_service: UserService = Depends(get_user_service)
 ):
-    user_service = UserService(db)
-    
     # Check if user already exists
     existing_user = await user_service.get_user_by_phone(user_data.phone)
     if existing_user:
@@ -35,8 +39,8 @@ async def register(
             detail="Email already registered"
         )
     
-    # Hash password
-    hashed_password = get_password_hash(user_data.password)
+    # Hash password; bcrypt is deliberately slow, so keep it off the event loop
+    hashed_password = await blocking_executor.run(get_password_hash, user_data.password)
     
     # Create user
     user_dict = user_data.dict()
@@ -52,13 +56,26 @@ async def register(
         "user_id": str(created_user.id)
     }
 
+def session_tokens(refresh_token: str, session: dict) -> dict:
+    """A fresh access token for the session, alongside its current refresh token"""
+    access_token = create_access_token(
+        data={"sub": session["phone"], "user_id": str(session["user_id"]), "sid": str(session["_id"])},
+        expires_delta=timedelta(minutes=settings.access_token_expire_minutes)
+    )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "refresh_token_expires_at": session["expires_at"]
+    }
+
 @router.post("/login", response_model=dict)
 async def login(
     credentials: UserLogin,
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    request: Request,
+    user_service: UserService = Depends(get_user_service),
+    session_service: SessionService = Depends(get_session_service)
 ):
-    user_service = UserService(db)
-    
     # Get user by phone
     user = await user_service.get_user_by_phone(credentials.phone)
     if not user:
@@ -68,33 +85,51 @@ async def login(
         )
     
     # Verify password
-    if not verify_password(credentials.password, user.hashed_password):
+    if not await blocking_executor.run(verify_password, credentials.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
         )
     
-    # Create access token
-    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-    access_token = create_access_token(
-        data={"sub": user.phone, "user_id": str(user.id)},
-        expires_delta=access_token_expires
-    )
+    # Start a session for this device; its refresh token replaces logging in again
+    device = credentials.device or request.headers.get("user-agent")
+    refresh_token, session = await session_service.create_session(user, device)
     
-    # Convert user to response format
-    user_dict = user.dict()
-    user_dict.pop("hashed_password", None)
+    # Convert user to response format; clients read the user's `id`, not `_id`
+    user_dict = user.model_dump(exclude={"hashed_password"})
     
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
+    return model_response({
+        **session_tokens(refresh_token, session),
         "user": user_dict
-    }
+    })
+
+@router.post("/refresh", response_model=dict)
+async def refresh(
+    refresh_request: RefreshRequest,
+    session_service: SessionService = Depends(get_session_service)
+):
+    """Swaps a refresh token for a new access token and a new refresh token; the old one stops working."""
+    rotated = await session_service.rotate(refresh_request.refresh_token)
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token"
+        )
+    return model_response(session_tokens(*rotated))
+
+@router.post("/logout", response_model=dict)
+async def logout(
+    refresh_request: RefreshRequest,
+    session_service: SessionService = Depends(get_session_service)
+):
+    """Ends the session the refresh token belongs to."""
+    await session_service.revoke_token(refresh_request.refresh_token)
+    return {"message": "Logged out"}
 
 @router.post("/verify-otp", response_model=dict)
 async def verify_otp(
     otp_data: dict,
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    user_service: UserService = Depends(get_user_service)
 ):
     # This is a placeholder for OTP verification
     # In a real implementation, you would verify the OTP against a stored value
@@ -114,7 +149,6 @@ async def verify_otp(
             detail="Invalid OTP format"
         )
     
-    user_service = UserService(db)
     user = await user_service.get_user_by_phone(phone)
     
     if not user:
@@ -130,7 +164,7 @@ async def verify_otp(
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    user_service: UserService = Depends(get_user_service)
 ) -> UserInDB:
     token = credentials.credentials
     payload = verify_token(token)
@@ -148,7 +182,6 @@ async def get_current_user(
             detail="Invalid token"
         )
     
-    user_service = UserService(db)
     user = await user_service.get_user_by_phone(phone)
     
     if user is None:
@@ -159,11 +192,73 @@ async def get_current_user(
     
     return user
 
+async def get_current_admin(
+    current_user: UserInDB = Depends(get_current_user)
+) -> UserInDB:
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
+
 @router.get("/me", response_model=User)
 async def get_current_user_info(
+    request: Request,
     current_user: UserInDB = Depends(get_current_user)
 ):
-    user_dict = current_user.dict()
-    user_dict.pop("hashed_password", None)
-    return user_dict
+    # Location reports leave updated_at alone, so the location time versions them
+    etag = compute_etag(current_user, salt=str(current_user.location_updated_at or ""))
+    user_dict = current_user.model_dump(exclude={"hashed_password"})
+    return conditional_response(request, user_dict, etag)
+
+@router.put("/me/location", response_model=dict)
+async def update_current_location(
+    location: LocationUpdate,
+    current_user: UserInDB = Depends(get_current_user),
+    user_service: UserService = Depends(get_user_service)
+):
+    if current_user.role != "driver":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only drivers can report their location"
+        )
+    
+    await user_service.update_location(str(current_user.id), location.coordinates)
+    return {"message": "Location updated"}
+
+@router.get("/sessions", response_model=List[Session])
+async def list_sessions(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: UserInDB = Depends(get_current_user),
+    session_service: SessionService = Depends(get_session_service)
+):
+    """The devices the user is signed in on; `current` marks the one making this request."""
+    current_session = (verify_token(credentials.credentials) or {}).get("sid")
+    sessions = await session_service.list_sessions(str(current_user.id))
+    for session in sessions:
+        session["current"] = str(session["_id"]) == current_session
+    return model_response(sessions)
+
+@router.delete("/sessions/{session_id}", response_model=dict)
+async def revoke_session(
+    session_id: str,
+    current_user: UserInDB = Depends(get_current_user),
+    session_service: SessionService = Depends(get_session_service)
+):
+    """Signs one device out; its access token stays valid until it expires."""
+    if not ObjectId.is_valid(session_id) or not await session_service.revoke(str(current_user.id), session_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found"
+        )
+    return {"message": "Session revoked"}
 
+@router.delete("/sessions", response_model=dict)
+async def revoke_all_sessions(
+    current_user: UserInDB = Depends(get_current_user),
+    session_service: SessionService = Depends(get_session_service)
+):
+    """Signs the user out everywhere, including this device."""
+    revoked = await session_service.revoke_all(str(current_user.id))
+    return {"message": "All sessions revoked", "revoked": revoked}
@@ -1,20 +1,36 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from motor.motor_asyncio import AsyncIOMotorDatabase
-from ..core.database import get_database
-from ..models.user import UserInDB
-from ..models.shipment import BidCreate, BidResponse
+from typing import List, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from ..core.responses import model_response
+from ..core.etag import compute_etag, conditional_response
+from ..models.user import UserInDB, DriverSummary
+from ..models.shipment import BidCreate, BidResponse, BidWithDriver
 from ..services.shipment_service import ShipmentService
+from ..services.user_loader import UserLoader
+from ..services.container import get_shipment_service, get_user_loader
 from ..services.notification_service import notification_service
 from ..api.auth import get_current_user
 
 router = APIRouter()
 
+async def bids_response(request: Request, bids: List[BidResponse], include_driver: bool, user_loader: UserLoader):
+    """Conditional bid list response, optionally embedding each bidder's driver summary"""
+    # Same bids with and without drivers embedded are different representations
+    salt = f"drivers={include_driver}"
+    if not include_driver:
+        return conditional_response(request, bids, etag=compute_etag(bids, salt=salt))
+    # One $in query for all bidders, however many bids there are
+    drivers = await user_loader.load_many(bid.driver_id for bid in bids)
+    etag = compute_etag(bids + [driver for driver in drivers if driver], salt=salt)
+    return conditional_response(request, [
+        BidWithDriver.from_bid(bid, DriverSummary.from_user(driver) if driver else None)
+        for bid, driver in zip(bids, drivers)
+    ], etag=etag)
+
 @router.post("/", response_model=BidResponse)
 async def submit_bid(
     bid_data: BidCreate,
     current_user: UserInDB = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    shipment_service: ShipmentService = Depends(get_shipment_service)
 ):
     if current_user.role != "driver":
         raise HTTPException(
@@ -28,8 +44,6 @@ async def submit_bid(
             detail="Driver must be verified to submit bids"
         )
     
-    shipment_service = ShipmentService(db)
-    
     # Check if shipment exists and is in bidding status
     shipment = await shipment_service.get_shipment_by_id(str(bid_data.shipment_id))
     if not shipment:
@@ -75,20 +89,21 @@ async def submit_bid(
             "id": str(bid.id),
             "shipment_id": str(shipment.id),
             "amount": bid.amount,
-            "driver_name": current_user.full_name # Assuming driver has a full_name field
+            "driver_name": current_user.name
         }
     )
     
-    return bid
+    return model_response(bid)
 
-@router.get("/shipment/{shipment_id}", response_model=List[BidResponse])
+@router.get("/shipment/{shipment_id}", response_model=List[Union[BidWithDriver, BidResponse]])
 async def get_shipment_bids(
+    request: Request,
     shipment_id: str,
+    include_driver: bool = Query(False, description="Embed each bidder's name, rating and vehicle type"),
     current_user: UserInDB = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    shipment_service: ShipmentService = Depends(get_shipment_service),
+    user_loader: UserLoader = Depends(get_user_loader)
 ):
-    shipment_service = ShipmentService(db)
-    
     # Check if user has access to view bids
     shipment = await shipment_service.get_shipment_by_id(shipment_id)
     if not shipment:
@@ -113,12 +128,15 @@ async def get_shipment_bids(
     else:
         bids = await shipment_service.get_bids_by_shipment(shipment_id)
     
-    return bids
+    return await bids_response(request, bids, include_driver, user_loader)
 
-@router.get("/my-bids", response_model=List[BidResponse])
+@router.get("/my-bids", response_model=List[Union[BidWithDriver, BidResponse]])
 async def get_my_bids(
+    request: Request,
+    include_driver: bool = Query(False, description="Embed the driver summary in each bid"),
     current_user: UserInDB = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    shipment_service: ShipmentService = Depends(get_shipment_service),
+    user_loader: UserLoader = Depends(get_user_loader)
 ):
     if current_user.role != "driver":
         raise HTTPException(
@@ -126,15 +144,15 @@ async def get_my_bids(
             detail="Only drivers can view their bids"
         )
     
-    shipment_service = ShipmentService(db)
     bids = await shipment_service.get_bids_by_driver(str(current_user.id))
-    return bids
+    return await bids_response(request, bids, include_driver, user_loader)
 
 @router.put("/{bid_id}/accept", response_model=BidResponse)
 async def accept_bid(
     bid_id: str,
     current_user: UserInDB = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    shipment_service: ShipmentService = Depends(get_shipment_service),
+    user_loader: UserLoader = Depends(get_user_loader)
 ):
     if current_user.role != "customer":
         raise HTTPException(
@@ -142,8 +160,6 @@ async def accept_bid(
             detail="Only customers can accept bids"
         )
     
-    shipment_service = ShipmentService(db)
-    
     # Get the bid
     bid = await shipment_service.get_bid_by_id(bid_id)
     if not bid:
@@ -176,7 +192,7 @@ async def accept_bid(
     accepted_bid = await shipment_service.accept_bid(bid_id)
 
     # Notify the driver that their bid was accepted
-    driver = await shipment_service.user_service.get_user_by_id(str(accepted_bid.driver_id))
+    driver = await user_loader.load(accepted_bid.driver_id)
     if driver:
         await notification_service.notify_bid_accepted(
             driver_id=str(driver.id),
@@ -184,17 +200,18 @@ async def accept_bid(
                 "id": str(accepted_bid.id),
                 "shipment_id": str(accepted_bid.shipment_id),
                 "amount": accepted_bid.amount,
-                "customer_name": current_user.full_name # Assuming customer has a full_name field
+                "customer_name": current_user.name
             }
         )
     
-    return accepted_bid
+    return model_response(accepted_bid)
 
 @router.put("/{bid_id}/reject", response_model=BidResponse)
 async def reject_bid(
     bid_id: str,
     current_user: UserInDB = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    shipment_service: ShipmentService = Depends(get_shipment_service),
+    user_loader: UserLoader = Depends(get_user_loader)
 ):
     if current_user.role != "customer":
         raise HTTPException(
@@ -202,8 +219,6 @@ async def reject_bid(
             detail="Only customers can reject bids"
         )
     
-    shipment_service = ShipmentService(db)
-    
     # Get the bid
     bid = await shipment_service.get_bid_by_id(bid_id)
     if not bid:
@@ -230,7 +245,7 @@ async def reject_bid(
     rejected_bid = await shipment_service.reject_bid(bid_id)
 
     # Notify the driver that their bid was rejected
-    driver = await shipment_service.user_service.get_user_by_id(str(rejected_bid.driver_id))
+    driver = await user_loader.load(rejected_bid.driver_id)
     if driver:
         await notification_service.notify_bid_rejected(
             driver_id=str(driver.id),
@@ -240,5 +255,5 @@ async def reject_bid(
             }
         )
     
-    return rejected_bid
+    return model_response(rejected_bid)
 
@@ -0,0 +1,175 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from ..core.config import settings
+from ..core.database import get_database
+from ..models.user import UserInDB
+from ..api.auth import get_current_admin
+
+router = APIRouter()
+
+# Exportable datasets: collection, the indexed date field used for range
+# filters, and the (dotted) fields written as columns.
+EXPORTS: Dict[str, Dict] = {
+    "payment_transactions": {
+        "collection": "payment_transactions",
+        "date_field": "initiated_at",
+        "columns": [
+            "_id", "shipment_id", "user_id", "amount", "payment_method",
+            "status", "initiated_at", "updated_at",
+        ],
+    },
+    "shipments": {
+        "collection": "shipments",
+        "date_field": "created_at",
+        "columns": [
+            "_id", "customer_id", "status", "pickup_location.address",
+            "dropoff_location.address", "receiver_info.name", "receiver_info.phone",
+            "vehicle_requirements", "shipment_date", "item_description", "weight_kg",
+            "urgency", "accepted_bid_id", "payment_transaction_id",
+            "created_at", "updated_at",
+        ],
+    },
+    "bids": {
+        "collection": "bids",
+        "date_field": "bid_time",
+        "columns": ["_id", "shipment_id", "driver_id", "amount", "status", "bid_time"],
+    },
+}
+
+# Flush to the client once this much output has been buffered
+CHUNK_SIZE = 64 * 1024
+
+def _get_path(document: Dict, path: str):
+    value = document
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+def _plain(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    return value
+
+def _csv_value(value):
+    value = _plain(value)
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return ";".join(str(item) for item in value)
+    return value
+
+async def _export_rows(
+    database: AsyncIOMotorDatabase,
+    spec: Dict,
+    start: Optional[datetime],
+    end: Optional[datetime]
+) -> AsyncIterator[Dict]:
+    date_field = spec["date_field"]
+    query = {}
+    if start or end:
+        query[date_field] = {}
+        if start:
+            query[date_field]["$gte"] = start
+        if end:
+            query[date_field]["$lt"] = end
+
+    # Only fetch the top-level fields we write out
+    projection = {column.split(".")[0]: 1 for column in spec["columns"]}
+    cursor = database[spec["collection"]].find(query, projection) \
+        .sort(date_field, 1) \
+        .batch_size(settings.export_batch_size)
+    async for document in cursor:
+        yield document
+
+async def _encode_csv(rows: AsyncIterator[Dict], columns: List[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for row in rows:
+        writer.writerow([_csv_value(_get_path(row, column)) for column in columns])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+async def _encode_ndjson(rows: AsyncIterator[Dict], columns: List[str]) -> AsyncIterator[bytes]:
+    chunk = []
+    size = 0
+    async for row in rows:
+        line = json.dumps({column: _plain(_get_path(row, column)) for column in columns}) + "\n"
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield "".join(chunk).encode("utf-8")
+            chunk = []
+            size = 0
+    if chunk:
+        yield "".join(chunk).encode("utf-8")
+
+async def _gzip(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+@router.get("/{dataset}")
+async def export_dataset(
+    dataset: str,
+    format: str = Query("csv", description="csv or ndjson"),
+    start: Optional[datetime] = Query(None, description="Inclusive lower bound on the dataset's date field"),
+    end: Optional[datetime] = Query(None, description="Exclusive upper bound on the dataset's date field"),
+    gzip: bool = Query(False, description="Compress the stream with gzip"),
+    current_user: UserInDB = Depends(get_current_admin),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Streams a dataset as CSV or NDJSON with constant memory use."""
+    spec = EXPORTS.get(dataset)
+    if not spec:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown dataset. Use one of: {', '.join(EXPORTS)}"
+        )
+
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported format. Use 'csv' or 'ndjson'"
+        )
+
+    rows = _export_rows(db, spec, start, end)
+    if format == "csv":
+        body = _encode_csv(rows, spec["columns"])
+        media_type = "text/csv"
+    else:
+        body = _encode_ndjson(rows, spec["columns"])
+        media_type = "application/x-ndjson"
+
+    filename = f"{dataset}.{format}"
+    if gzip:
+        body = _gzip(body)
+        media_type = "application/gzip"
+        filename += ".gz"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -1,9 +1,8 @@
 from typing import Dict
 from fastapi import APIRouter, Depends, HTTPException, status
-from motor.motor_asyncio import AsyncIOMotorDatabase
-from ..core.database import get_database
 from ..models.user import UserInDB
 from ..services.payment_service import PaymentService
+from ..services.container import get_payment_service
 from ..api.auth import get_current_user
 
 router = APIRouter()
@@ -12,7 +11,7 @@ router = APIRouter()
 async def initiate_payment(
     payment_data: Dict,
     current_user: UserInDB = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    payment_service: PaymentService = Depends(get_payment_service)
 ):
     """Initiates a payment for a shipment."""
     shipment_id = payment_data.get("shipment_id")
@@ -31,7 +30,6 @@ async def initiate_payment(
             detail="Unsupported payment method. Use 'telebirr' or 'cbe_birr'"
         )
 
-    payment_service = PaymentService(db)
 
     try:
         result = await payment_service.initiate_payment(
@@ -50,12 +48,11 @@ async def initiate_payment(
 @router.post("/callback")
 async def payment_callback(
     callback_data: Dict,
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    payment_service: PaymentService = Depends(get_payment_service)
 ):
     """Handles payment callbacks from external gateways."""
     # Note: In a real scenario, you'd validate the callback signature
     # to ensure it's coming from the legitimate payment gateway.
-    payment_service = PaymentService(db)
 
     try:
         result = await payment_service.handle_payment_callback(callback_data)
@@ -70,11 +67,9 @@ async def payment_callback(
 async def get_payment_status(
     transaction_id: str,
     current_user: UserInDB = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    payment_service: PaymentService = Depends(get_payment_service)
 ):
     """Retrieves the status of a payment transaction."""
-    payment_service = PaymentService(db)
-    
     transaction = await payment_service.get_payment_status(transaction_id)
     if not transaction:
         raise HTTPException(
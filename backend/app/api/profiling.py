@@ -0,0 +1,76 @@
+from typing import Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from ..core.config import settings
+from ..core.profiler import Profile, profiler
+from ..models.user import UserInDB
+from ..models.profiling import RequestProfileSettings
+from ..api.auth import get_current_admin
+
+router = APIRouter()
+
+async def get_profiling_admin(current_user: UserInDB = Depends(get_current_admin)) -> UserInDB:
+    if not settings.profiler_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiling is not enabled on this worker")
+    return current_user
+
+def _check_limits(seconds: float, interval_ms: Optional[float]) -> float:
+    """The sampling interval in seconds, after checking the requested duration"""
+    if seconds > settings.profiler_max_seconds:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Profiles are limited to {settings.profiler_max_seconds:g} seconds"
+        )
+    return (interval_ms or settings.profiler_interval_ms) / 1000
+
+def _folded_response(profile: Profile) -> PlainTextResponse:
+    return PlainTextResponse(profile.folded(), headers={"X-Profile-Samples": str(profile.samples)})
+
+@router.post("/capture", response_class=PlainTextResponse)
+async def capture_profile(
+    seconds: float = Query(10, gt=0, description="How long to sample"),
+    interval_ms: Optional[float] = Query(None, ge=1, description="Time between stack samples"),
+    current_user: UserInDB = Depends(get_profiling_admin)
+):
+    """Samples every thread of this worker for `seconds`; returns folded stacks for a flamegraph."""
+    interval = _check_limits(seconds, interval_ms)
+    try:
+        profile = await profiler.capture(seconds, interval)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return _folded_response(profile)
+
+@router.post("/requests")
+async def start_request_profile(
+    request_profile: RequestProfileSettings,
+    current_user: UserInDB = Depends(get_profiling_admin)
+) -> Dict:
+    """Starts sampling one in `every` requests, optionally only those of one route."""
+    interval = _check_limits(request_profile.seconds, request_profile.interval_ms)
+    try:
+        profile = profiler.sample_requests(request_profile.every, request_profile.route, request_profile.seconds, interval)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return profile.summary()
+
+@router.get("")
+async def get_profile_status(current_user: UserInDB = Depends(get_profiling_admin)) -> Dict:
+    """Summary of the running or last profile."""
+    if profiler.profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No profile has been collected")
+    return profiler.profile.summary()
+
+@router.get("/folded", response_class=PlainTextResponse)
+async def get_folded_profile(current_user: UserInDB = Depends(get_profiling_admin)):
+    """Folded stacks of the running or last profile."""
+    if profiler.profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No profile has been collected")
+    return _folded_response(profiler.profile)
+
+@router.delete("")
+async def stop_profile(current_user: UserInDB = Depends(get_profiling_admin)) -> Dict:
+    """Stops the running profile early; its samples stay readable."""
+    profile = await profiler.stop()
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No profile has been collected")
+    return profile.summary()
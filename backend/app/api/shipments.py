@@ -1,23 +1,144 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from motor.motor_asyncio import AsyncIOMotorDatabase
-from ..core.database import get_database
+import csv
+import io
+import math
+from typing import AsyncIterator, Dict, List, Literal, Optional, Tuple
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, UploadFile, File
+from pydantic import ValidationError
+from starlette.datastructures import UploadFile as FormFile
+from ..core.config import settings
+from ..core.responses import model_response
+from ..core.etag import compute_etag, conditional_response
 from ..models.user import UserInDB
 from ..models.shipment import (
-    ShipmentCreate, ShipmentUpdate, Shipment, ShipmentInDB,
+    ShipmentCreate, ShipmentUpdate, Shipment, ShipmentInDB, NearbyShipment,
     BidCreate, BidResponse
 )
 from ..services.shipment_service import ShipmentService
+from ..services.container import get_shipment_service
 from ..services.notification_service import notification_service
 from ..api.auth import get_current_user
 
 router = APIRouter()
 
+# CSV columns holding ";"-separated lists, same as the admin exports write them
+CSV_LIST_COLUMNS = {
+    "vehicle_requirements", "photos",
+    "pickup_location.coordinates", "dropoff_location.coordinates",
+}
+
+def _csv_row_to_shipment(row: Dict[str, str]) -> Dict:
+    """Nests dotted CSV columns (e.g. pickup_location.address); empty cells are left out"""
+    shipment = {}
+    for column, value in row.items():
+        if not column or value is None or not value.strip():
+            continue
+        column, value = column.strip(), value.strip()
+        if column in CSV_LIST_COLUMNS:
+            value = [item.strip() for item in value.split(";") if item.strip()]
+        *parents, field = column.split(".")
+        target = shipment
+        for key in parents:
+            target = target.setdefault(key, {})
+        target[field] = value
+    return shipment
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+class _RowError:
+    """Stands in for a row that could not be read"""
+
+    def __init__(self, msg: str):
+        self.msg = msg
+
+async def _ndjson_rows(request: Request) -> AsyncIterator[object]:
+    """Rows of an NDJSON body, parsed as the lines arrive; blank lines are skipped"""
+    max_line = settings.bulk_shipment_max_line_bytes
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_line(line, max_line)
+        if len(buffer) > max_line:
+            # Not going to end in time; the rest of the body is left unread
+            yield _RowError(f"Lines are limited to {max_line} bytes")
+            return
+    if buffer.strip():
+        yield _parse_line(buffer, max_line)
+
+def _parse_line(line: bytes, max_line: int) -> object:
+    if len(line) > max_line:
+        return _RowError(f"Lines are limited to {max_line} bytes")
+    try:
+        return orjson.loads(line)
+    except orjson.JSONDecodeError:
+        return _RowError("Invalid JSON")
+
+async def _json_body(request: Request) -> bytes:
+    """The request body, refused with 413 past the JSON size cap"""
+    max_bytes = settings.bulk_shipment_max_json_bytes
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"JSON bodies are limited to {max_bytes} bytes; send NDJSON or CSV for more"
+    )
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise too_large
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_bytes:
+            raise too_large
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+async def _bulk_rows(request: Request) -> AsyncIterator[Tuple[int, object]]:
+    """Rows from a multipart CSV upload (field "file"), an NDJSON body or a JSON array body, numbered from 1"""
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if not isinstance(upload, FormFile):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Expected a CSV file in the 'file' field"
+            )
+        # Read row by row from the spooled upload instead of loading it whole
+        reader = csv.DictReader(io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline=""))
+        for number, row in enumerate(reader, start=1):
+            yield number, _csv_row_to_shipment(row)
+        return
+
+    if content_type.startswith(NDJSON_CONTENT_TYPES):
+        number = 0
+        async for row in _ndjson_rows(request):
+            number += 1
+            yield number, row
+        return
+
+    try:
+        rows = orjson.loads(await _json_body(request))
+    except orjson.JSONDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Body must be a JSON array of shipments, NDJSON or a CSV upload"
+        )
+    if not isinstance(rows, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Body must be a JSON array of shipments, NDJSON or a CSV upload"
+        )
+    for number, row in enumerate(rows, start=1):
+        yield number, row
+
 @router.post("/", response_model=Shipment)
 async def create_shipment(
     shipment_data: ShipmentCreate,
     current_user: UserInDB = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    shipment_service: ShipmentService = Depends(get_shipment_service)
 ):
     if current_user.role != "customer":
         raise HTTPException(
@@ -25,7 +146,6 @@ async def create_shipment(
             detail="Only customers can create shipments"
         )
     
-    shipment_service = ShipmentService(db)
     shipment = await shipment_service.create_shipment(
         shipment_data.dict(), 
         str(current_user.id)
@@ -49,15 +169,110 @@ async def create_shipment(
             }
         )
 
-    return shipment
+    return model_response(shipment)
+
+@router.post("/bulk")
+async def create_shipments_bulk(
+    request: Request,
+    publish: bool = Query(False, description="Open all created shipments for bidding right away"),
+    current_user: UserInDB = Depends(get_current_user),
+    shipment_service: ShipmentService = Depends(get_shipment_service)
+):
+    """Creates many shipments from a JSON array, NDJSON or CSV upload, with a result per row."""
+    if current_user.role != "customer":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only customers can create shipments"
+        )
+
+    results = []
+    batch: List[Tuple[int, Dict]] = []
+    drivers = None
+
+    async def flush():
+        nonlocal drivers
+        shipments = await shipment_service.create_shipments(
+            [shipment_data for _, shipment_data in batch], str(current_user.id), publish=publish
+        )
+        created = []
+        for (number, _), shipment in zip(batch, shipments):
+            if shipment is None:
+                results.append({"row": number, "status": "error", "errors": [{"loc": "", "msg": "Could not be saved"}]})
+            else:
+                results.append({"row": number, "status": "created", "id": shipment.id})
+                created.append(shipment)
+        batch.clear()
+
+        if not (publish and created):
+            return
+        # One notification per batch to each driver who could carry any of it
+        if drivers is None:
+            drivers = [
+                driver for driver in await shipment_service.user_service.get_users_by_role("driver")
+                if driver.verification_status == "verified"
+            ]
+        vehicle_types = set()
+        for shipment in created:
+            vehicle_types.update(
+                getattr(vehicle_type, "value", vehicle_type) for vehicle_type in shipment.vehicle_requirements or [None]
+            )
+        eligible_driver_ids = [
+            str(driver.id) for driver in drivers
+            if None in vehicle_types or getattr(driver.vehicle_type, "value", driver.vehicle_type) in vehicle_types
+        ]
+        if eligible_driver_ids:
+            await notification_service.notify_bulk_delivery_request(
+                drivers=eligible_driver_ids,
+                shipments_data=[{"id": str(shipment.id)} for shipment in created]
+            )
+
+    async for number, row in _bulk_rows(request):
+        if number > settings.bulk_shipment_max_rows:
+            results.append({
+                "row": number,
+                "status": "error",
+                "errors": [{"loc": "", "msg": f"Only {settings.bulk_shipment_max_rows} rows are accepted per request"}]
+            })
+            break
+        if isinstance(row, _RowError):
+            results.append({"row": number, "status": "error", "errors": [{"loc": "", "msg": row.msg}]})
+            continue
+        if not isinstance(row, dict):
+            results.append({"row": number, "status": "error", "errors": [{"loc": "", "msg": "Expected an object"}]})
+            continue
+        try:
+            shipment_data = ShipmentCreate.model_validate(row)
+        except ValidationError as e:
+            results.append({
+                "row": number,
+                "status": "error",
+                "errors": [
+                    {"loc": ".".join(str(part) for part in error["loc"]), "msg": error["msg"]}
+                    for error in e.errors()
+                ]
+            })
+            continue
+        batch.append((number, shipment_data.model_dump()))
+        if len(batch) >= settings.bulk_shipment_batch_size:
+            await flush()
+    if batch:
+        await flush()
+
+    results.sort(key=lambda result: result["row"])
+    created_count = sum(1 for result in results if result["status"] == "created")
+    return model_response({
+        "created": created_count,
+        "failed": len(results) - created_count,
+        "published": publish,
+        "results": results,
+    })
 
 @router.get("/", response_model=List[Shipment])
 async def get_user_shipments(
+    request: Request,
     current_user: UserInDB = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    shipment_service: ShipmentService = Depends(get_shipment_service)
 ):
-    shipment_service = ShipmentService(db)
-    
     if current_user.role == "customer":
         shipments = await shipment_service.get_shipments_by_customer(str(current_user.id))
     else:
@@ -65,31 +280,67 @@ async def get_user_shipments(
         vehicle_types = [current_user.vehicle_type] if current_user.vehicle_type else None
         shipments = await shipment_service.get_available_shipments(vehicle_types)
     
-    return shipments
+    return conditional_response(request, shipments)
 
-@router.get("/available", response_model=List[Shipment])
+@router.get("/available", response_model=List[NearbyShipment])
 async def get_available_shipments(
+    request: Request,
+    sort: Optional[Literal["distance"]] = Query(None, description="Sort by distance to the pickup"),
+    max_distance_km: Optional[float] = Query(None, gt=0, description="Only shipments picked up within this distance"),
+    lon: Optional[float] = Query(None, ge=-180, le=180, description="Driver longitude; defaults to the last reported location"),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Driver latitude; defaults to the last reported location"),
+    current_user: UserInDB = Depends(get_current_user),
+    shipment_service: ShipmentService = Depends(get_shipment_service)
+):
+    if current_user.role != "driver":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only drivers can view available shipments"
+        )
+    
+    vehicle_types = [current_user.vehicle_type] if current_user.vehicle_type else None
+    if sort is None and max_distance_km is None:
+        shipments = await shipment_service.get_available_shipments(vehicle_types)
+        return conditional_response(request, shipments)
+
+    origin = [lon, lat] if lon is not None and lat is not None else current_user.current_location
+    if not origin:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Location required: pass lon and lat or report your location first"
+        )
+    nearby = await shipment_service.get_nearby_available_shipments(origin, vehicle_types, max_distance_km)
+    shipments = [
+        NearbyShipment.from_shipment(shipment, None if math.isnan(distance) else round(float(distance), 3))
+        for shipment, distance in nearby
+    ]
+    etag = compute_etag(shipments, salt=f"{origin[0]},{origin[1]},{max_distance_km}")
+    return conditional_response(request, shipments, etag=etag)
+
+@router.get("/available/changes")
+async def get_available_shipment_changes(
+    since: Optional[str] = Query(None, description="Token from the previous poll; omit for the full list"),
     current_user: UserInDB = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    shipment_service: ShipmentService = Depends(get_shipment_service)
 ):
+    """Returns the available shipments changed or removed since the token, plus a new token."""
     if current_user.role != "driver":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only drivers can view available shipments"
         )
     
-    shipment_service = ShipmentService(db)
     vehicle_types = [current_user.vehicle_type] if current_user.vehicle_type else None
-    shipments = await shipment_service.get_available_shipments(vehicle_types)
-    return shipments
+    changes = await shipment_service.get_available_changes(since, vehicle_types)
+    return model_response(changes)
 
 @router.get("/{shipment_id}", response_model=Shipment)
 async def get_shipment(
+    request: Request,
     shipment_id: str,
     current_user: UserInDB = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    shipment_service: ShipmentService = Depends(get_shipment_service)
 ):
-    shipment_service = ShipmentService(db)
     shipment = await shipment_service.get_shipment_by_id(shipment_id)
     
     if not shipment:
@@ -106,16 +357,15 @@ async def get_shipment(
             detail="Access denied"
         )
     
-    return shipment
+    return conditional_response(request, shipment)
 
 @router.put("/{shipment_id}/location", response_model=Shipment)
 async def update_shipment_location(
     shipment_id: str,
-    location_data: dict,
+    location_data: ShipmentUpdate,
     current_user: UserInDB = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    shipment_service: ShipmentService = Depends(get_shipment_service)
 ):
-    shipment_service = ShipmentService(db)
     shipment = await shipment_service.get_shipment_by_id(shipment_id)
     
     if not shipment or str(shipment.customer_id) != str(current_user.id):
@@ -124,17 +374,23 @@ async def update_shipment_location(
             detail="Shipment not found"
         )
     
-    updated_shipment = await shipment_service.update_shipment(shipment_id, location_data)
-    return updated_shipment
+    updated_shipment = await shipment_service.update_shipment(
+        shipment_id, location_data.model_dump(exclude_unset=True)
+    )
+    if not updated_shipment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shipment not found"
+        )
+    return model_response(updated_shipment)
 
 @router.put("/{shipment_id}/receiver", response_model=Shipment)
 async def update_shipment_receiver(
     shipment_id: str,
-    receiver_data: dict,
+    receiver_data: ShipmentUpdate,
     current_user: UserInDB = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    shipment_service: ShipmentService = Depends(get_shipment_service)
 ):
-    shipment_service = ShipmentService(db)
     shipment = await shipment_service.get_shipment_by_id(shipment_id)
     
     if not shipment or str(shipment.customer_id) != str(current_user.id):
@@ -143,17 +399,23 @@ async def update_shipment_receiver(
             detail="Shipment not found"
         )
     
-    updated_shipment = await shipment_service.update_shipment(shipment_id, receiver_data)
-    return updated_shipment
+    updated_shipment = await shipment_service.update_shipment(
+        shipment_id, receiver_data.model_dump(exclude_unset=True)
+    )
+    if not updated_shipment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shipment not found"
+        )
+    return model_response(updated_shipment)
 
 @router.put("/{shipment_id}/vehicle", response_model=Shipment)
 async def update_shipment_vehicle(
     shipment_id: str,
-    vehicle_data: dict,
+    vehicle_data: ShipmentUpdate,
     current_user: UserInDB = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    shipment_service: ShipmentService = Depends(get_shipment_service)
 ):
-    shipment_service = ShipmentService(db)
     shipment = await shipment_service.get_shipment_by_id(shipment_id)
     
     if not shipment or str(shipment.customer_id) != str(current_user.id):
@@ -162,17 +424,23 @@ async def update_shipment_vehicle(
             detail="Shipment not found"
         )
     
-    updated_shipment = await shipment_service.update_shipment(shipment_id, vehicle_data)
-    return updated_shipment
+    updated_shipment = await shipment_service.update_shipment(
+        shipment_id, vehicle_data.model_dump(exclude_unset=True)
+    )
+    if not updated_shipment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shipment not found"
+        )
+    return model_response(updated_shipment)
 
 @router.put("/{shipment_id}/schedule", response_model=Shipment)
 async def update_shipment_schedule(
     shipment_id: str,
-    schedule_data: dict,
+    schedule_data: ShipmentUpdate,
     current_user: UserInDB = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    shipment_service: ShipmentService = Depends(get_shipment_service)
 ):
-    shipment_service = ShipmentService(db)
     shipment = await shipment_service.get_shipment_by_id(shipment_id)
     
     if not shipment or str(shipment.customer_id) != str(current_user.id):
@@ -181,17 +449,23 @@ async def update_shipment_schedule(
             detail="Shipment not found"
         )
     
-    updated_shipment = await shipment_service.update_shipment(shipment_id, schedule_data)
-    return updated_shipment
+    updated_shipment = await shipment_service.update_shipment(
+        shipment_id, schedule_data.model_dump(exclude_unset=True)
+    )
+    if not updated_shipment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shipment not found"
+        )
+    return model_response(updated_shipment)
 
 @router.put("/{shipment_id}/photos", response_model=Shipment)
 async def update_shipment_photos(
     shipment_id: str,
-    photos_data: dict,
+    photos_data: ShipmentUpdate,
     current_user: UserInDB = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    shipment_service: ShipmentService = Depends(get_shipment_service)
 ):
-    shipment_service = ShipmentService(db)
     shipment = await shipment_service.get_shipment_by_id(shipment_id)
     
     if not shipment or str(shipment.customer_id) != str(current_user.id):
@@ -200,16 +474,22 @@ async def update_shipment_photos(
             detail="Shipment not found"
         )
     
-    updated_shipment = await shipment_service.update_shipment(shipment_id, photos_data)
-    return updated_shipment
+    updated_shipment = await shipment_service.update_shipment(
+        shipment_id, photos_data.model_dump(exclude_unset=True)
+    )
+    if not updated_shipment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shipment not found"
+        )
+    return model_response(updated_shipment)
 
 @router.post("/{shipment_id}/publish", response_model=Shipment)
 async def publish_shipment(
     shipment_id: str,
     current_user: UserInDB = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    shipment_service: ShipmentService = Depends(get_shipment_service)
 ):
-    shipment_service = ShipmentService(db)
     shipment = await shipment_service.get_shipment_by_id(shipment_id)
     
     if not shipment or str(shipment.customer_id) != str(current_user.id):
@@ -225,14 +505,19 @@ async def publish_shipment(
         )
     
     updated_shipment = await shipment_service.publish_shipment(shipment_id)
-    return updated_shipment
+    if not updated_shipment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shipment not found"
+        )
+    return model_response(updated_shipment)
 
 @router.post("/{shipment_id}/upload-photo", response_model=Shipment)
 async def upload_shipment_photo(
     shipment_id: str,
     file: UploadFile = File(...),
     current_user: UserInDB = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    shipment_service: ShipmentService = Depends(get_shipment_service)
 ):
     if current_user.role != "customer":
         raise HTTPException(
@@ -240,7 +525,6 @@ async def upload_shipment_photo(
             detail="Only customers can upload photos for their shipments"
         )
     
-    shipment_service = ShipmentService(db)
     shipment = await shipment_service.get_shipment_by_id(shipment_id)
     
     if not shipment or str(shipment.customer_id) != str(current_user.id):
@@ -262,9 +546,15 @@ async def upload_shipment_photo(
     os.remove(file_location)
     
     # Update shipment with new photo URL
-    updated_photos = shipment.photos if shipment.photos else []
+    # Copy: the shipment may be shared through the service cache
+    updated_photos = list(shipment.photos) if shipment.photos else []
     updated_photos.append(image_url)
     
     updated_shipment = await shipment_service.update_shipment(shipment_id, {"photos": updated_photos})
-    return updated_shipment
+    if not updated_shipment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shipment not found"
+        )
+    return model_response(updated_shipment)
 
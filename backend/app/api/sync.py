@@ -0,0 +1,25 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from ..core.responses import model_response
+from ..models.user import UserInDB
+from ..services.sync_service import SyncService
+from ..services.container import get_sync_service
+from ..api.auth import get_current_user
+
+router = APIRouter()
+
+@router.get("/")
+async def sync(
+    since: Optional[str] = Query(None, description="Token from the previous sync; omit for a full sync"),
+    current_user: UserInDB = Depends(get_current_user),
+    sync_service: SyncService = Depends(get_sync_service)
+):
+    """Returns the caller's shipments, bids and notifications changed since the token, plus a new token."""
+    try:
+        changes = await sync_service.changes_since(current_user, since)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return model_response(changes)
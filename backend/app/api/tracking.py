@@ -0,0 +1,100 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from ..core.responses import model_response
+from ..models.user import UserInDB
+from ..models.tracking import PositionUpdate
+from ..services.shipment_service import ShipmentService
+from ..services.tracking_service import TrackingService, TRACKABLE_STATUSES
+from ..services.container import get_shipment_service, get_tracking_service
+from ..api.auth import get_current_user
+
+router = APIRouter()
+
+@router.post("/{shipment_id}")
+async def update_tracking(
+    shipment_id: str,
+    update: PositionUpdate,
+    current_user: UserInDB = Depends(get_current_user),
+    shipment_service: ShipmentService = Depends(get_shipment_service),
+    tracking_service: TrackingService = Depends(get_tracking_service)
+):
+    """Reports the assigned driver's position; watchers of `shipment:<id>` receive it over the WebSocket."""
+    shipment = await shipment_service.get_shipment_by_id(shipment_id)
+    if not shipment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shipment not found"
+        )
+
+    driver_id = await tracking_service.assigned_driver_id(shipment)
+    if current_user.role != "driver" or driver_id is None or str(driver_id) != str(current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only the assigned driver can report this shipment's position"
+        )
+
+    if shipment.status not in TRACKABLE_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Shipment is not being delivered"
+        )
+
+    position = await tracking_service.record_position(shipment, str(current_user.id), update)
+    return model_response(position)
+
+async def get_watchable_shipment(
+    shipment_id: str,
+    current_user: UserInDB,
+    shipment_service: ShipmentService,
+    tracking_service: TrackingService
+):
+    """The shipment, if the user owns it, drives it or is an admin"""
+    shipment = await shipment_service.get_shipment_by_id(shipment_id)
+    if not shipment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shipment not found"
+        )
+
+    if current_user.role == "customer" and str(shipment.customer_id) != str(current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    if current_user.role == "driver":
+        driver_id = await tracking_service.assigned_driver_id(shipment)
+        if driver_id is None or str(driver_id) != str(current_user.id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied"
+            )
+    return shipment
+
+@router.get("/{shipment_id}")
+async def get_tracking(
+    shipment_id: str,
+    current_user: UserInDB = Depends(get_current_user),
+    shipment_service: ShipmentService = Depends(get_shipment_service),
+    tracking_service: TrackingService = Depends(get_tracking_service)
+):
+    """Returns the latest known position of the shipment's driver."""
+    shipment = await get_watchable_shipment(shipment_id, current_user, shipment_service, tracking_service)
+    position = await tracking_service.latest_position(shipment)
+    if position is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No position reported yet"
+        )
+    return model_response(position)
+
+@router.get("/{shipment_id}/track")
+async def get_track(
+    shipment_id: str,
+    tolerance_m: float = Query(0.0, ge=0, description="Simplify to this many metres (0 for every stored point)"),
+    current_user: UserInDB = Depends(get_current_user),
+    shipment_service: ShipmentService = Depends(get_shipment_service),
+    tracking_service: TrackingService = Depends(get_tracking_service)
+):
+    """Returns the route the driver took, at the requested resolution."""
+    shipment = await get_watchable_shipment(shipment_id, current_user, shipment_service, tracking_service)
+    track = await tracking_service.get_track(shipment, tolerance_m)
+    return model_response(track)
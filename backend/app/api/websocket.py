@@ -1,41 +1,96 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import List
+from typing import Optional
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from ..core.security import verify_token
+from ..models.user import UserInDB
+from ..services.realtime import manager, broker, parse_command
+from ..services.user_service import UserService
+from ..services.shipment_service import ShipmentService
+from ..services.tracking_service import TrackingService
+from ..services.container import get_user_service, get_shipment_service, get_tracking_service
+from .tracking import get_watchable_shipment
 
 router = APIRouter()
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+async def authenticate(token: Optional[str], user_service: UserService) -> Optional[UserInDB]:
+    """The user an access token belongs to, or None; same checks as get_current_user"""
+    payload = verify_token(token) if token else None
+    phone = payload.get("sub") if payload else None
+    if phone is None:
+        return None
+    return await user_service.get_user_by_phone(phone)
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
-
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+async def topic_access_error(
+    topic: str,
+    user: UserInDB,
+    shipment_service: ShipmentService,
+    tracking_service: TrackingService
+) -> Optional[str]:
+    """Why the user may not subscribe to the topic, or None if they may"""
+    kind, _, shipment_id = topic.partition(":")
+    if kind != "shipment" or not ObjectId.is_valid(shipment_id):
+        return "Unknown topic"
+    try:
+        await get_watchable_shipment(shipment_id, user, shipment_service, tracking_service)
+    except HTTPException as error:
+        return error.detail
+    return None
 
+@router.websocket("/ws/{client_id}")
+async def websocket_endpoint(
+    websocket: WebSocket,
+    client_id: str,
+    token: Optional[str] = Query(None),
+    user_service: UserService = Depends(get_user_service),
+    shipment_service: ShipmentService = Depends(get_shipment_service),
+    tracking_service: TrackingService = Depends(get_tracking_service)
+):
+    """Notifications and topic updates for one user; connect with `?token=<access token>`.
 
-manager = ConnectionManager()
+    Frames are JSON text, or MessagePack when the client offers the
+    `msgpack` subprotocol; either way a frame holds one message or an
+    array of them. Commands are always sent as text.
+    """
+    user = await authenticate(token, user_service)
+    if user is None or str(user.id) != client_id:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if not await manager.connect(websocket, str(user.id)):
+        return
 
-@router.websocket("/ws/{client_id}")
-async def websocket_endpoint(websocket: WebSocket, client_id: str):
-    await manager.connect(websocket)
     try:
         while True:
-            data = await websocket.receive_text()
-            # You can add logic here to handle incoming messages from clients
-            # For now, we'll just echo it back or broadcast
-            await manager.send_personal_message(f"You wrote: {data}", websocket)
-            # await manager.broadcast(f"Client #{client_id} says: {data}")
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", status.WS_1000_NORMAL_CLOSURE))
+            data = message.get("text")
+            if data is None:
+                # Commands are text only; receive_text would fail on a binary frame
+                await websocket.close(code=status.WS_1003_UNSUPPORTED_DATA)
+                break
+            manager.touch(websocket)
+            command = parse_command(data)
+            if command is None:
+                # You can add logic here to handle incoming messages from clients
+                # For now, we'll just echo it back
+                await manager.send_personal_message(f"You wrote: {data}", websocket)
+                continue
+            if command["action"] == "pong":
+                continue
+
+            topic = command["topic"]
+            if command["action"] == "subscribe":
+                error = await topic_access_error(topic, user, shipment_service, tracking_service)
+                if error is not None:
+                    await manager.send_message(websocket, {"type": "error", "topic": topic, "detail": error})
+                    continue
+                broker.subscribe(websocket, topic)
+            else:
+                broker.unsubscribe(websocket, topic)
+            await manager.send_message(websocket, {"type": f"{command['action']}d", "topic": topic})
     except WebSocketDisconnect:
+        pass
+    finally:
+        # Also reached when the reaper closed the socket or a send failed
+        broker.unsubscribe_all(websocket)
         manager.disconnect(websocket)
-        await manager.broadcast(f"Client #{client_id} left the chat")
-
-
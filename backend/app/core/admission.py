@@ -0,0 +1,122 @@
+"""Global limit on HTTP requests handled at once by a worker.
+
+Past the limit a request waits briefly for a slot and is then turned
+away with 503 before any database work, rather than queueing behind
+requests already too slow to finish. The last `reserved` slots only
+admit priority requests (payment callbacks), and freed slots go to
+waiting priority requests first, so callbacks get through a burst of
+app traffic.
+"""
+import asyncio
+from collections import deque
+from typing import Deque
+from .config import settings
+from .metrics import registry
+from .responses import ORJSONResponse
+
+# Payment gateways retry slowly or not at all; their callbacks go first
+PRIORITY_PATHS = {"/api/payments/callback"}
+# Cheap and needed to see the overload
+EXEMPT_PATHS = {"/health", "/metrics"}
+
+class AdmissionController:
+    """Counts requests in flight; waiters are futures resolved in FIFO order.
+
+    Used from a single event loop, so no locking is needed.
+    """
+
+    def __init__(self, limit: int, reserved: int, queue_size: int, timeout: float):
+        self.limit = limit
+        self.reserved = min(reserved, limit - 1)
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.priority_waiters: Deque[asyncio.Future] = deque()
+        self.queued = {False: 0, True: 0}
+
+    def _capacity(self, priority: bool) -> int:
+        return self.limit if priority else self.limit - self.reserved
+
+    async def acquire(self, priority: bool = False) -> bool:
+        """Takes a slot, waiting up to the timeout; False if the request should be shed"""
+        if self.in_flight < self._capacity(priority) and not self.queued[priority]:
+            self.in_flight += 1
+            return True
+        if self.timeout <= 0 or (not priority and self.queued[False] >= self.queue_size):
+            return False
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        (self.priority_waiters if priority else self.waiters).append(future)
+        self.queued[priority] += 1
+        timer = loop.call_later(self.timeout, self._expire, future, priority)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # Client went away while waiting, or just as it was admitted
+            if future.cancelled():
+                self.queued[priority] -= 1
+            elif future.result():
+                self.release()
+            raise
+        finally:
+            timer.cancel()
+
+    def _expire(self, future: asyncio.Future, priority: bool):
+        if not future.done():
+            future.set_result(False)
+            self.queued[priority] -= 1
+
+    def release(self):
+        self.in_flight -= 1
+        for priority, waiters in ((True, self.priority_waiters), (False, self.waiters)):
+            while waiters and self.in_flight < self._capacity(priority):
+                future = waiters.popleft()
+                # Expired and cancelled waiters were already uncounted
+                if future.done():
+                    continue
+                future.set_result(True)
+                self.queued[priority] -= 1
+                self.in_flight += 1
+
+admission = AdmissionController(
+    settings.max_concurrent_requests,
+    settings.admission_reserved_slots,
+    settings.admission_queue_size,
+    settings.admission_queue_timeout_seconds
+)
+
+shed_requests = registry.counter(
+    "http_requests_shed_total", "HTTP requests refused with 503 by admission control", ("priority",)
+)
+registry.callback(
+    "http_admission_in_flight", "HTTP requests holding an admission slot", "gauge", lambda: admission.in_flight
+)
+registry.callback(
+    "http_admission_queued", "HTTP requests waiting for an admission slot", "gauge",
+    lambda: {("true",): admission.queued[True], ("false",): admission.queued[False]}, ("priority",)
+)
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware holding an admission slot for each HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        priority = scope["path"] in PRIORITY_PATHS
+        if not await admission.acquire(priority):
+            shed_requests.inc("true" if priority else "false")
+            response = ORJSONResponse(
+                {"detail": "Server is busy, try again shortly"}, status_code=503, headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release()
@@ -6,6 +6,8 @@ class Settings(BaseSettings):
     secret_key: str = "your-secret-key-here"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    # Refresh tokens lapse after this long unused; each refresh restarts it
+    refresh_token_expire_days: int = 30
     mongodb_url: str = "mongodb://localhost:27017"
     database_name: str = "birtu_logistics"
     cloudinary_cloud_name: Optional[str] = None
@@ -13,6 +15,114 @@ class Settings(BaseSettings):
     cloudinary_api_secret: Optional[str] = None
     firebase_credentials_path: Optional[str] = None
 
+    # Payment reconciliation
+    payment_reconciliation_stale_minutes: int = 15
+    payment_reconciliation_batch_size: int = 500
+    payment_reconciliation_concurrency: int = 50
+
+    # Shipment cache; set the channel to "change_stream" to also invalidate
+    # on writes from other workers (requires a replica set)
+    shipment_cache_size: int = 10000
+    shipment_cache_ttl_seconds: float = 30.0
+    shipment_cache_invalidation_channel: Optional[str] = None
+    # Worker processes serving the API. The in-memory available feed only sees
+    # other workers' writes through the change stream, so with more than one
+    # worker and no change stream, available shipments are read from MongoDB
+    api_workers: int = 1
+    # Single worker without the change stream: reseed the available feed this
+    # often to pick up writes from scripts and other tools (0 disables)
+    available_feed_resync_seconds: float = 15.0
+
+    # Delta sync: re-read this much before each token to catch late commits
+    sync_overlap_seconds: float = 5.0
+
+    # Bulk shipment creation
+    bulk_shipment_batch_size: int = 500
+    bulk_shipment_max_rows: int = 5000
+    # JSON array bodies are parsed whole, so they are capped; NDJSON is read
+    # line by line, each line capped
+    bulk_shipment_max_json_bytes: int = 10 * 1024 * 1024
+    bulk_shipment_max_line_bytes: int = 64 * 1024
+
+    # Dispatch assignment engine: costs are in ETB, distances in km
+    assignment_cost_per_km: float = 10.0
+    assignment_max_pickup_km: float = 50.0
+    # Batches up to this many driver x shipment pairs are solved optimally
+    assignment_optimal_max_cells: int = 4_000_000
+    # Greedy fallback considers each driver's cheapest N shipments
+    assignment_greedy_candidates: int = 25
+
+    # Route estimates: straight-line distance times the detour factor,
+    # driven at the average speed
+    route_detour_factor: float = 1.3
+    average_speed_kmh: float = 30.0
+
+    # WebSocket sessions: every socket is pinged each heartbeat and closed
+    # once nothing has been heard from it for the idle timeout
+    websocket_heartbeat_seconds: float = 25.0
+    websocket_idle_timeout_seconds: float = 60.0
+    websocket_send_timeout_seconds: float = 5.0
+    websocket_max_connections: int = 50000
+    websocket_max_connections_per_user: int = 5
+    # Messages queued for a socket within this window go out as one frame
+    websocket_batch_window_ms: float = 20.0
+
+    # Live tracking: most position updates per second sent to each watcher
+    tracking_max_updates_per_second: float = 1.0
+    # Stored tracks: one document per shipment per window, simplified to
+    # this tolerance once the delivery completes
+    track_bucket_minutes: int = 15
+    track_compaction_tolerance_m: float = 5.0
+
+    # MongoDB monitoring: commands slower than this are logged with the
+    # calling service method
+    mongodb_slow_query_ms: float = 100.0
+    # Turns the database profiler on for operations slower than this (0 for
+    # all) and collects docs examined vs returned from it; None leaves it off
+    mongodb_profile_slow_ms: Optional[int] = None
+    mongodb_profile_poll_seconds: float = 15.0
+
+    # Worker threads for blocking library calls (password hashing, Cloudinary)
+    blocking_executor_workers: int = 4
+    # If set, /metrics requires `Authorization: Bearer <metrics_token>`
+    metrics_token: Optional[str] = None
+    # Request tracing: "file" or "memory" turns it on for this fraction of
+    # requests; None leaves every request untraced
+    tracing_exporter: Optional[str] = None
+    tracing_sample_rate: float = 0.01
+    tracing_file_path: str = "traces.jsonl"
+    # Admin sampling profiler; off unless enabled, and each capture or
+    # request-sampling session is capped at the max duration
+    profiler_enabled: bool = False
+    profiler_interval_ms: float = 10.0
+    profiler_max_seconds: float = 300.0
+
+    # Rate limits: token buckets of `burst` requests refilled at the per-minute
+    # rate, per user or per IP. The "mongo" store shares them between workers
+    rate_limit_enabled: bool = True
+    rate_limit_store: str = "memory"
+    # Only behind a proxy that sets X-Forwarded-For; clients can forge it otherwise
+    rate_limit_trust_forwarded_for: bool = False
+    rate_limit_default_per_minute: float = 300.0
+    rate_limit_default_burst: float = 100.0
+    rate_limit_login_per_minute: float = 10.0
+    rate_limit_login_burst: float = 10.0
+    rate_limit_refresh_per_minute: float = 120.0
+    rate_limit_refresh_burst: float = 60.0
+    rate_limit_bids_per_minute: float = 30.0
+    rate_limit_bids_burst: float = 10.0
+    rate_limit_polling_per_minute: float = 60.0
+    rate_limit_polling_burst: float = 20.0
+    # Admission control: requests past the limit wait up to the timeout for a
+    # slot, then get a 503 (0 disables). Reserved slots are for payment callbacks
+    max_concurrent_requests: int = 256
+    admission_reserved_slots: int = 16
+    admission_queue_size: int = 512
+    admission_queue_timeout_seconds: float = 1.0
+
+    # Admin exports
+    export_batch_size: int = 1000
+
     class Config:
         env_file = ".env"
 
@@ -1,5 +1,7 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING
 from .config import settings
+from .mongo_monitor import command_monitor
 
 class Database:
     client: AsyncIOMotorClient = None
@@ -12,10 +14,55 @@ async def get_database():
 
 async def connect_to_mongo():
     """Create database connection"""
-    db.client = AsyncIOMotorClient(settings.mongodb_url)
+    db.client = AsyncIOMotorClient(settings.mongodb_url, event_listeners=[command_monitor])
     db.database = db.client[settings.database_name]
+    await create_indexes(db.database)
+    if settings.mongodb_profile_slow_ms is not None:
+        try:
+            await db.database.command("profile", 1, slowms=settings.mongodb_profile_slow_ms)
+        except Exception as e:
+            print(f"Enabling the database profiler failed: {e}")
 
 async def close_mongo_connection():
     """Close database connection"""
     db.client.close()
 
+async def create_indexes(database):
+    """Create the indexes the services rely on (no-op if they already exist)"""
+    # Stale pending transactions are scanned by the reconciliation worker
+    await database.payment_transactions.create_index(
+        [("status", ASCENDING), ("updated_at", ASCENDING)]
+    )
+
+    # Seeding the available-shipments feed
+    await database.shipments.create_index([("status", ASCENDING)])
+    # Polls for available-shipment changes read everything written after a token
+    await database.shipments.create_index([("updated_at", ASCENDING)])
+
+    # Date-range scans for the admin exports
+    await database.payment_transactions.create_index([("initiated_at", ASCENDING)])
+    await database.shipments.create_index([("created_at", ASCENDING)])
+    await database.bids.create_index([("bid_time", ASCENDING)])
+
+    # Delta sync reads each user's documents changed after a token
+    await database.shipments.create_index([("customer_id", ASCENDING), ("updated_at", ASCENDING)])
+    await database.shipments.create_index([("bids.driver_id", ASCENDING), ("updated_at", ASCENDING)])
+    await database.bids.create_index([("driver_id", ASCENDING), ("updated_at", ASCENDING)])
+    await database.bids.create_index([("shipment_id", ASCENDING), ("updated_at", ASCENDING)])
+    await database.notifications.create_index([("user_id", ASCENDING), ("created_at", ASCENDING)])
+
+    # Delivery track windows, read in order per shipment
+    await database.tracks.create_index([("shipment_id", ASCENDING), ("start", ASCENDING)])
+
+    # Driver lookups for notifications and dispatch
+    await database.users.create_index([("role", ASCENDING), ("verification_status", ASCENDING)])
+
+    # Refresh-token sessions: looked up by token hash (and the recent previous ones,
+    # to catch replays), listed per user, and dropped by MongoDB once expired
+    await database.sessions.create_index([("token_hash", ASCENDING)], unique=True)
+    await database.sessions.create_index([("previous_hashes", ASCENDING)], sparse=True)
+    await database.sessions.create_index([("user_id", ASCENDING), ("last_used_at", ASCENDING)])
+    await database.sessions.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+
+    # Rate limit buckets shared between workers, dropped once refilled
+    await database.rate_limits.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
@@ -0,0 +1,50 @@
+import hashlib
+from typing import Any
+from fastapi import Request, Response
+from .responses import model_response
+
+def _version(item: Any) -> str:
+    # id + last-write time identify a stored document's representation;
+    # status is included for bids written before they carried updated_at
+    return f"{getattr(item, 'id', '')}:{getattr(item, 'updated_at', '')}:{getattr(item, 'status', '')}"
+
+def compute_etag(content: Any, salt: str = "") -> str:
+    """Strong ETag for a model or list of models, from ids and update times only.
+
+    `salt` covers request-specific inputs the representation depends on.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(salt.encode())
+    if isinstance(content, (list, tuple)):
+        digest.update(f"list:{len(content)}".encode())
+        for item in content:
+            digest.update(b"|")
+            digest.update(_version(item).encode())
+    else:
+        digest.update(_version(content).encode())
+    return f'"{digest.hexdigest()}"'
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison is what RFC 9110 asks for on If-None-Match
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+def conditional_response(request: Request, content: Any, etag: str = None) -> Response:
+    """Returns 304 if the client's If-None-Match matches, otherwise the serialized content.
+
+    The ETag is derived without serializing, so unchanged resources skip
+    serialization entirely.
+    """
+    etag = etag or compute_etag(content)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return model_response(content, headers=headers)
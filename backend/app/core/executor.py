@@ -0,0 +1,66 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+from .config import settings
+from .metrics import registry
+
+executor_wait = registry.histogram(
+    "executor_wait_seconds", "Time blocking calls waited for a free worker thread", ("executor",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+executor_run = registry.histogram(
+    "executor_run_seconds", "Time blocking calls ran on a worker thread", ("executor",)
+)
+
+class BlockingExecutor:
+    """Thread pool for blocking library calls (bcrypt, the Cloudinary SDK) made from async code.
+
+    Keeps them off the event loop, and tracks how many calls are waiting
+    for a thread and for how long.
+    """
+    instances = {}
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        # Submitted and not yet finished; only touched from the event loop
+        self.pending = 0
+        BlockingExecutor.instances[name] = self
+
+    @property
+    def queue_depth(self) -> int:
+        """Calls waiting for a worker thread"""
+        return self.pool._work_queue.qsize()
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        submitted = time.perf_counter()
+
+        def call():
+            started = time.perf_counter()
+            return started, fn(*args, **kwargs), time.perf_counter() - started
+
+        self.pending += 1
+        try:
+            started, result, elapsed = await asyncio.get_running_loop().run_in_executor(self.pool, call)
+        finally:
+            self.pending -= 1
+        executor_wait.observe(started - submitted, self.name)
+        executor_run.observe(elapsed, self.name)
+        return result
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
+
+registry.callback(
+    "executor_queue_depth", "Blocking calls waiting for a worker thread", "gauge",
+    lambda: {(name,): executor.queue_depth for name, executor in BlockingExecutor.instances.items()},
+    ("executor",)
+)
+registry.callback(
+    "executor_pending_calls", "Blocking calls submitted and not yet finished", "gauge",
+    lambda: {(name,): executor.pending for name, executor in BlockingExecutor.instances.items()},
+    ("executor",)
+)
+
+blocking_executor = BlockingExecutor("blocking", max_workers=settings.blocking_executor_workers)
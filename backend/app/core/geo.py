@@ -0,0 +1,106 @@
+"""Vectorized great-circle distances.
+
+Coordinates follow the models' convention of [longitude, latitude] in
+degrees. Every function takes arrays (or anything numpy can broadcast)
+so whole lists of points are handled in one pass instead of per-row
+Python math.
+"""
+from typing import Optional, Sequence
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+def as_coordinates(points: Sequence[Optional[Sequence[float]]]) -> np.ndarray:
+    """(n, 2) float array of [lon, lat] rows; missing or malformed points become NaN"""
+    coordinates = np.full((len(points), 2), np.nan)
+    for index, point in enumerate(points):
+        if point is not None and len(point) >= 2:
+            coordinates[index] = point[0], point[1]
+    return coordinates
+
+def haversine_km(lon1, lat1, lon2, lat2) -> np.ndarray:
+    """Great-circle distance in km between points given in degrees, broadcasting like numpy"""
+    lon1, lat1, lon2, lat2 = (np.radians(np.asarray(value, dtype=float)) for value in (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def distance_matrix_km(origins: np.ndarray, destinations: np.ndarray) -> np.ndarray:
+    """(n, m) distances in km from each of n origins to each of m destinations ([lon, lat] rows)"""
+    origins = np.asarray(origins, dtype=float).reshape(-1, 2)
+    destinations = np.asarray(destinations, dtype=float).reshape(-1, 2)
+    return haversine_km(
+        origins[:, 0:1], origins[:, 1:2],
+        destinations[:, 0][np.newaxis, :], destinations[:, 1][np.newaxis, :]
+    )
+
+def route_estimates(pickups: np.ndarray, dropoffs: np.ndarray, detour_factor: float, speed_kmh: float):
+    """Road distance (km) and drive time (minutes) estimates for rows of pickup/dropoff pairs.
+
+    Straight-line distance scaled by `detour_factor` for the road network;
+    NaN where either point is missing.
+    """
+    pickups = np.asarray(pickups, dtype=float).reshape(-1, 2)
+    dropoffs = np.asarray(dropoffs, dtype=float).reshape(-1, 2)
+    distances = haversine_km(pickups[:, 0], pickups[:, 1], dropoffs[:, 0], dropoffs[:, 1]) * detour_factor
+    return distances, distances / speed_kmh * 60
+
+def rank_by_distance(origin: Sequence[float], points: np.ndarray, max_distance_km: Optional[float] = None):
+    """Indices of `points` nearest-first, with every point's distance from `origin` in km.
+
+    Points with unknown coordinates sort last, and are dropped when a
+    maximum distance is given.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    distances = haversine_km(points[:, 0], points[:, 1], origin[0], origin[1])
+    if max_distance_km is None:
+        # argsort puts NaN last
+        return np.argsort(distances, kind="stable"), distances
+    within = np.flatnonzero(distances <= max_distance_km)
+    return within[np.argsort(distances[within], kind="stable")], distances
+
+def project_meters(coordinates: np.ndarray) -> np.ndarray:
+    """Equirectangular projection of [lon, lat] rows to metres around the first point.
+
+    Accurate to well under a percent over the extent of one delivery.
+    """
+    coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+    if not len(coordinates):
+        return coordinates
+    origin = coordinates[0]
+    scale = np.radians(EARTH_RADIUS_KM * 1000)
+    return np.column_stack((
+        (coordinates[:, 0] - origin[0]) * scale * np.cos(np.radians(origin[1])),
+        (coordinates[:, 1] - origin[1]) * scale,
+    ))
+
+def douglas_peucker(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Boolean mask of the points Douglas-Peucker keeps for a polyline of (x, y) rows.
+
+    Iterative, with each segment's point distances computed in one numpy
+    pass; the endpoints are always kept.
+    """
+    points = np.asarray(points, dtype=float)
+    keep = np.zeros(len(points), dtype=bool)
+    if len(points) <= 2:
+        keep[:] = True
+        return keep
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = points[end] - points[start]
+        offsets = points[start + 1:end] - points[start]
+        length = np.hypot(segment[0], segment[1])
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return keep
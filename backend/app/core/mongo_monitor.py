@@ -0,0 +1,177 @@
+"""MongoDB command timing, slow-query logging and profiler statistics.
+
+`command_monitor` is registered on the Motor client in `connect_to_mongo`
+and times every command by collection and operation. Service classes
+decorated with `instrument_service` record which of their methods is
+running in a context variable; Motor copies the context onto the thread
+that runs the command, so slow commands are logged with the method that
+issued them. The same decorator opens a tracing span per method call, and
+sampled requests get a span per command.
+
+Docs examined vs returned are only known to the server. With
+`mongodb_profile_slow_ms` set, the database profiler is switched on and
+`ProfileCollector` folds new `system.profile` entries into the metrics.
+"""
+import asyncio
+import functools
+import inspect
+import logging
+import threading
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from pymongo import monitoring
+from .config import settings
+from .metrics import registry
+from .tracing import Span, current_span, tracer
+
+logger = logging.getLogger(__name__)
+
+# "ShipmentService.get_available_shipments" while that method is running
+service_method: ContextVar[Optional[str]] = ContextVar("service_method", default=None)
+
+mongodb_command_duration = registry.histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency by collection and command",
+    ("collection", "command"),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+mongodb_commands = registry.counter(
+    "mongodb_commands_total", "MongoDB commands by collection, command and outcome",
+    ("collection", "command", "outcome")
+)
+mongodb_slow_commands = registry.counter(
+    "mongodb_slow_commands_total", "MongoDB commands over the slow-query threshold by calling service method",
+    ("collection", "command", "method")
+)
+mongodb_docs_examined = registry.counter(
+    "mongodb_profiled_docs_examined_total", "Documents examined by profiled operations", ("collection", "op")
+)
+mongodb_keys_examined = registry.counter(
+    "mongodb_profiled_keys_examined_total", "Index keys examined by profiled operations", ("collection", "op")
+)
+mongodb_docs_returned = registry.counter(
+    "mongodb_profiled_docs_returned_total", "Documents returned by profiled operations", ("collection", "op")
+)
+
+def instrument_service(cls):
+    """Class decorator: each coroutine method sets `service_method` to its name while it runs,
+    and runs in a tracing span of that name."""
+    for name, attribute in list(vars(cls).items()):
+        if name.startswith("__") or not inspect.iscoroutinefunction(attribute):
+            continue
+        setattr(cls, name, _named(f"{cls.__name__}.{name}", attribute))
+    return cls
+
+def _named(label: str, method):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        token = service_method.set(label)
+        try:
+            with tracer.span(label):
+                return await method(*args, **kwargs)
+        finally:
+            service_method.reset(token)
+    return wrapper
+
+def _command_collection(command_name: str, command) -> str:
+    collection = command.get("collection") if command_name == "getMore" else command.get(command_name)
+    return collection if isinstance(collection, str) else ""
+
+def _command_shape(command_name: str, command) -> str:
+    """Field names and stages of the command, without values, for the slow-query log"""
+    if command_name == "aggregate":
+        return "[" + ", ".join(next(iter(stage), "?") for stage in command.get("pipeline", ())) + "]"
+    query = command.get("filter") or command.get("query")
+    if query is None and command_name in ("update", "delete"):
+        statements = command.get("updates") or command.get("deletes") or ()
+        query = statements[0].get("q") if statements else None
+    if not query:
+        return "{}"
+    return "{" + ", ".join(query) + "}"
+
+class CommandMonitor(monitoring.CommandListener):
+    """Times MongoDB commands and logs those slower than `slow_ms`.
+
+    pymongo calls the listener on whichever thread runs the command, so
+    metric updates are serialized with a lock.
+    """
+
+    def __init__(self, slow_ms: float):
+        self.slow_ms = slow_ms
+        self.lock = threading.Lock()
+        # request id -> (collection, calling method, command shape, span if the request is traced)
+        self.inflight: Dict[int, Tuple[str, Optional[str], str, Optional[Span]]] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        command_name = event.command_name
+        collection = _command_collection(command_name, event.command)
+        shape = _command_shape(command_name, event.command)
+        parent = current_span.get()
+        span = None
+        if parent is not None:
+            span = parent.child(f"mongodb.{command_name}", {"db.collection": collection, "db.filter": shape})
+        self.inflight[event.request_id] = (collection, service_method.get(), shape, span)
+
+    def _finished(self, event, outcome: str):
+        collection, method, shape, span = self.inflight.pop(event.request_id, ("", None, "", None))
+        seconds = event.duration_micros / 1e6
+        if span is not None:
+            if outcome == "error":
+                span.error = event.failure.get("codeName") or "error"
+            span.finish(span.start_ns + event.duration_micros * 1000)
+        with self.lock:
+            mongodb_command_duration.observe(seconds, collection, event.command_name)
+            mongodb_commands.inc(collection, event.command_name, outcome)
+            if seconds * 1000 >= self.slow_ms:
+                mongodb_slow_commands.inc(collection, event.command_name, method or "unknown")
+        if seconds * 1000 >= self.slow_ms:
+            logger.warning(
+                "Slow MongoDB %s on %s took %.1f ms in %s, filter %s",
+                event.command_name, collection or event.database_name, seconds * 1000, method or "unknown", shape
+            )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finished(event, "success")
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finished(event, "error")
+
+class ProfileCollector:
+    """Folds new `system.profile` entries into the docs/keys examined and returned counters."""
+
+    def __init__(self, database, batch_size: int = 1000):
+        self.collection = database["system.profile"]
+        self.batch_size = batch_size
+        self.last_seen: Optional[datetime] = None
+
+    async def collect(self) -> int:
+        """Reads the entries written since the last call; returns how many were read."""
+        if self.last_seen is None:
+            # Start from the newest entry rather than replaying the whole profile
+            latest = await self.collection.find_one({}, {"ts": 1}, sort=[("ts", -1)])
+            self.last_seen = latest["ts"] if latest else datetime.min
+            return 0
+        entries = await self.collection.find(
+            {"ts": {"$gt": self.last_seen}},
+            {"ts": 1, "ns": 1, "op": 1, "docsExamined": 1, "keysExamined": 1, "nreturned": 1}
+        ).sort("ts", 1).to_list(self.batch_size)
+        for entry in entries:
+            collection = entry.get("ns", "").partition(".")[2]
+            op = entry.get("op", "")
+            mongodb_docs_examined.inc(collection, op, amount=entry.get("docsExamined", 0))
+            mongodb_keys_examined.inc(collection, op, amount=entry.get("keysExamined", 0))
+            mongodb_docs_returned.inc(collection, op, amount=entry.get("nreturned", 0))
+        if entries:
+            self.last_seen = entries[-1]["ts"]
+        return len(entries)
+
+    async def run(self, interval: float):
+        while True:
+            try:
+                while await self.collect() == self.batch_size:
+                    pass
+            except Exception as e:
+                logger.warning("Profiler collection failed: %s", e)
+            await asyncio.sleep(interval)
+
+command_monitor = CommandMonitor(slow_ms=settings.mongodb_slow_query_ms)
@@ -0,0 +1,203 @@
+"""On-demand statistical profiler for a running worker.
+
+A sampler thread reads every thread's stack with `sys._current_frames`
+at a fixed interval and counts identical stacks. Output is the folded
+format flamegraph.pl, speedscope and inferno read: one line per stack,
+frames root first separated by `;`, then the sample count.
+
+Two modes, one at a time, each time-boxed:
+
+- `capture` samples the whole process for a few seconds.
+- `sample_requests` samples the event loop thread only while it runs the
+  task of a selected request: one in `every` requests, optionally only
+  those matching a route template. `ProfilingMiddleware` marks the
+  tasks; it is only installed when `profiler_enabled` is set.
+
+Only code running on a CPU shows up: a request awaiting MongoDB has no
+frames on any thread. The sampler needs the GIL to read stacks, so a
+thread running pure Python is sampled at most once per interpreter
+switch interval (5 ms by default) whatever the configured interval.
+Samples are per process, so with several workers each one profiles
+only what it serves.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Optional, Set
+from starlette.routing import Match
+
+def _fold(frame, thread_name: str) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+        frame = frame.f_back
+    names.append(thread_name)
+    names.reverse()
+    return ";".join(names)
+
+def _route_template(scope) -> Optional[str]:
+    """The template of the route the router will pick, matched the same way it does"""
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return None
+
+class Profile:
+    """Folded stack counts from one capture or request-sampling session"""
+
+    def __init__(self, mode: str, interval: float, duration: float, selector: Optional["RequestSelector"] = None):
+        self.mode = mode
+        self.selector = selector
+        self.interval = interval
+        self.duration = duration
+        self.started_at = time.time()
+        self.stopped_at: Optional[float] = None
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        # Held by the sampler thread while it adds samples
+        self.lock = threading.Lock()
+
+    def add(self, stack: str):
+        with self.lock:
+            self.stacks[stack] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        with self.lock:
+            stacks = self.stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def summary(self) -> Dict:
+        with self.lock:
+            samples, distinct_stacks = self.samples, len(self.stacks)
+        summary = {
+            "mode": self.mode,
+            "interval_ms": self.interval * 1000,
+            "duration_seconds": self.duration,
+            "running": self.stopped_at is None,
+            "elapsed_seconds": round((self.stopped_at or time.time()) - self.started_at, 3),
+            "samples": samples,
+            "distinct_stacks": distinct_stacks,
+        }
+        if self.selector is not None:
+            summary.update(
+                route=self.selector.route, every=self.selector.every, selected_requests=self.selector.selected
+            )
+        return summary
+
+class RequestSelector:
+    """Picks one in `every` requests, counting only those matching `route` if given"""
+
+    def __init__(self, every: int, route: Optional[str]):
+        self.every = every
+        self.route = route
+        self.seen = 0
+        self.selected = 0
+        # Tasks of the selected requests still being handled
+        self.tasks: Set[asyncio.Task] = set()
+
+    def selects(self, scope) -> bool:
+        if self.route is not None and _route_template(scope) != self.route:
+            return False
+        self.seen += 1
+        if self.seen % self.every:
+            return False
+        self.selected += 1
+        return True
+
+class SamplingProfiler:
+    def __init__(self):
+        self.profile: Optional[Profile] = None
+        self.selector: Optional[RequestSelector] = None
+        self.stop_event: Optional[threading.Event] = None
+        self.done: Optional[asyncio.Future] = None
+
+    @property
+    def running(self) -> bool:
+        return self.profile is not None and self.profile.stopped_at is None
+
+    def _start(self, profile: Profile, should_sample: Callable[[int], bool]) -> asyncio.Future:
+        """Runs the sampler thread until the profile's duration is up or `stop` is called"""
+        if self.running:
+            raise RuntimeError("A profile is already being collected")
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+        stop_event = threading.Event()
+        self.profile, self.stop_event, self.done = profile, stop_event, done
+
+        def sample():
+            own_thread = threading.get_ident()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            deadline = time.monotonic() + profile.duration
+            while not stop_event.wait(profile.interval) and time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread or not should_sample(thread_id):
+                        continue
+                    if thread_id not in names:
+                        names = {thread.ident: thread.name for thread in threading.enumerate()}
+                    profile.add(_fold(frame, names.get(thread_id, str(thread_id))))
+            profile.stopped_at = time.time()
+            loop.call_soon_threadsafe(lambda: done.done() or done.set_result(profile))
+
+        threading.Thread(target=sample, name="profiler", daemon=True).start()
+        return done
+
+    async def capture(self, seconds: float, interval: float) -> Profile:
+        """Samples every thread for `seconds`"""
+        profile = Profile("capture", interval, seconds)
+        return await self._start(profile, lambda thread_id: True)
+
+    def sample_requests(self, every: int, route: Optional[str], seconds: float, interval: float) -> Profile:
+        """Starts sampling selected requests for `seconds`; results accumulate in `self.profile`"""
+        selector = RequestSelector(every, route)
+        loop = asyncio.get_running_loop()
+        loop_thread = threading.get_ident()
+
+        def should_sample(thread_id: int) -> bool:
+            return thread_id == loop_thread and asyncio.current_task(loop) in selector.tasks
+
+        profile = Profile("requests", interval, seconds, selector)
+        done = self._start(profile, should_sample)
+        self.selector = selector
+        done.add_done_callback(lambda _: self._clear_selector(selector))
+        return profile
+
+    def _clear_selector(self, selector: RequestSelector):
+        if self.selector is selector:
+            self.selector = None
+
+    async def stop(self) -> Optional[Profile]:
+        """Stops the running profile, if any, once the sampler thread has finished"""
+        self.selector = None
+        if self.stop_event is not None:
+            self.stop_event.set()
+            await asyncio.shield(self.done)
+        return self.profile
+
+profiler = SamplingProfiler()
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware marking the tasks of requests picked for sampling.
+
+    Outside a request-sampling session it costs one attribute lookup.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        selector = profiler.selector
+        if selector is None or scope["type"] != "http" or not selector.selects(scope):
+            await self.app(scope, receive, send)
+            return
+        task = asyncio.current_task()
+        selector.tasks.add(task)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            selector.tasks.discard(task)
@@ -0,0 +1,259 @@
+"""Token-bucket rate limiting per route policy, keyed by user or client IP.
+
+Each policy gives a caller `burst` requests at once, refilled at
+`per_minute`. Requests are matched to a policy by method and path before
+routing: exact paths first, then templates in declaration order. Those
+that match none fall under the default policy, and exempt paths are
+never limited.
+
+Authenticated callers are keyed by the `user_id` claim of a valid access
+token, everyone else by IP; verified tokens are cached so the signature
+is not checked on every request. Buckets live in the worker by default.
+With `rate_limit_store = "mongo"` they are shared by all workers through
+one atomic upsert per request; callers already refused are then turned
+away locally until they may retry, without a round trip.
+"""
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from starlette.routing import compile_path
+from .cache import TTLCache
+from .config import settings
+from .metrics import registry
+from .responses import ORJSONResponse
+from .security import verify_token
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class RatePolicy:
+    name: str
+    per_minute: float
+    burst: float
+    # "user" falls back to the IP for anonymous requests
+    key: str = "user"
+
+    @property
+    def rate(self) -> float:
+        """Tokens refilled per second"""
+        return self.per_minute / 60
+
+class MemoryBucketStore:
+    """Buckets of this worker, updated without locks.
+
+    All access happens on the event loop thread with no await in between,
+    so each take is atomic. Once there are more than `max_keys` buckets,
+    those refilled to full (same as no bucket) are dropped; if an attack
+    keeps them all partly drained, the oldest are dropped too.
+    """
+
+    def __init__(self, max_keys: int = 100000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        # key -> (tokens, updated at, full at)
+        self.buckets: Dict[str, Tuple[float, float, float]] = {}
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        """Takes a token; returns 0 if one was available, else seconds until one is"""
+        return self.take_now(key, rate, burst)
+
+    def take_now(self, key: str, rate: float, burst: float) -> float:
+        now = self.clock()
+        bucket = self.buckets.get(key)
+        tokens = burst if bucket is None else min(burst, bucket[0] + (now - bucket[1]) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self.buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+        if bucket is None and len(self.buckets) > self.max_keys:
+            self._sweep(now)
+        return wait
+
+    def _sweep(self, now: float):
+        self.buckets = {key: bucket for key, bucket in self.buckets.items() if bucket[2] > now}
+        excess = len(self.buckets) - self.max_keys * 3 // 4
+        if excess > 0:
+            for key in list(self.buckets)[:excess]:
+                del self.buckets[key]
+
+class MongoBucketStore:
+    """Buckets shared by every worker, one document per key.
+
+    Refill and take happen in a single pipeline upsert timed by the
+    server's clock, so workers never race each other or disagree on time.
+    Documents expire through the TTL index once they would be full again.
+    If MongoDB is unreachable requests are let through.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        # key -> monotonic time until which the caller is refused
+        self.refused_until: Dict[str, float] = {}
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        until = self.refused_until.get(key)
+        if until is not None:
+            if until > now:
+                return until - now
+            del self.refused_until[key]
+
+        pipeline = [
+            {"$set": {
+                "tokens": {"$min": [burst, {"$add": [
+                    {"$ifNull": ["$tokens", burst]},
+                    {"$multiply": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, rate / 1000]}
+                ]}]},
+                "updated_at": "$$NOW",
+            }},
+            {"$set": {"taken": {"$gte": ["$tokens", 1]}}},
+            {"$set": {
+                "tokens": {"$cond": ["$taken", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                "expires_at": {"$add": ["$$NOW", math.ceil(burst / rate * 1000)]},
+            }},
+        ]
+        try:
+            try:
+                bucket = await self.collection.find_one_and_update(
+                    {"_id": key}, pipeline, upsert=True, return_document=ReturnDocument.AFTER
+                )
+            except DuplicateKeyError:
+                # Another worker created the bucket first; it exists now
+                bucket = await self.collection.find_one_and_update(
+                    {"_id": key}, pipeline, return_document=ReturnDocument.AFTER
+                )
+        except PyMongoError as e:
+            logger.warning("Rate limit check failed, allowing the request: %s", e)
+            return 0.0
+        if bucket is None or bucket["taken"]:
+            return 0.0
+        wait = (1 - bucket["tokens"]) / rate
+        self.refused_until[key] = now + wait
+        if len(self.refused_until) > 100000:
+            self.refused_until = {k: v for k, v in self.refused_until.items() if v > now}
+        return wait
+
+rate_limited_requests = registry.counter(
+    "http_rate_limited_total", "HTTP requests refused with 429 by rate limit policy", ("policy",)
+)
+
+class RateLimiter:
+    def __init__(self, default: RatePolicy, store=None):
+        self.default = default
+        self.store = store or MemoryBucketStore()
+        self.exact: Dict[Tuple[str, str], Optional[RatePolicy]] = {}
+        self.templates: List[Tuple[str, object, Optional[RatePolicy]]] = []
+        # access token -> user id, or "" if the token is invalid
+        self.identities = TTLCache(maxsize=10000, ttl=60)
+
+    def limit(self, method: str, path: str, policy: Optional[RatePolicy]):
+        """Applies `policy` to the route; None exempts it. `path` may be a route template."""
+        if "{" in path:
+            regex, _, _ = compile_path(path)
+            self.templates.append((method, regex, policy))
+        else:
+            self.exact[(method, path)] = policy
+
+    def policy_for(self, method: str, path: str) -> Optional[RatePolicy]:
+        key = (method, path)
+        if key in self.exact:
+            return self.exact[key]
+        for route_method, regex, policy in self.templates:
+            if route_method == method and regex.match(path):
+                return policy
+        return self.default
+
+    def identity(self, scope, policy: RatePolicy) -> str:
+        if policy.key == "user":
+            user_id = self._user_id(scope)
+            if user_id:
+                return f"user:{user_id}"
+        return f"ip:{client_ip(scope)}"
+
+    def _user_id(self, scope) -> str:
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() != "bearer" or not token:
+                    return ""
+                user_id = self.identities.get(token)
+                if user_id is None:
+                    payload = verify_token(token)
+                    user_id = str(payload.get("user_id") or "") if payload else ""
+                    self.identities.set(token, user_id)
+                return user_id
+        return ""
+
+    async def check(self, scope) -> Tuple[Optional[RatePolicy], float]:
+        """The request's policy and how long it must wait; 0 means it may go ahead"""
+        policy = self.policy_for(scope["method"], scope["path"])
+        if policy is None:
+            return None, 0.0
+        key = f"{policy.name}:{self.identity(scope, policy)}"
+        return policy, await self.store.take(key, policy.rate, policy.burst)
+
+    def connect(self, database):
+        """Switches to buckets shared through MongoDB if configured"""
+        if settings.rate_limit_store == "mongo":
+            self.store = MongoBucketStore(database.rate_limits)
+
+def client_ip(scope) -> str:
+    if settings.rate_limit_trust_forwarded_for:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+def _policy(name: str, key: str = "user") -> RatePolicy:
+    return RatePolicy(
+        name, getattr(settings, f"rate_limit_{name}_per_minute"), getattr(settings, f"rate_limit_{name}_burst"), key
+    )
+
+rate_limiter = RateLimiter(_policy("default"))
+
+# Credential endpoints, limited by IP against brute force
+credentials = _policy("login", key="ip")
+for path in ("/api/auth/login", "/api/auth/register", "/api/auth/verify-otp"):
+    rate_limiter.limit("POST", path, credentials)
+# Refresh tokens can't be guessed, so refreshing only needs a flood guard; its
+# own looser bucket keeps users behind one NAT from locking each other out
+rate_limiter.limit("POST", "/api/auth/refresh", _policy("refresh", key="ip"))
+
+rate_limiter.limit("POST", "/api/bids/", _policy("bids"))
+
+# Endpoints drivers and the app poll
+polling = _policy("polling")
+for path in ("/api/shipments/available", "/api/shipments/available/changes", "/api/sync/", "/api/tracking/{shipment_id}"):
+    rate_limiter.limit("GET", path, polling)
+
+# Payment gateways and monitoring are never limited
+rate_limiter.limit("POST", "/api/payments/callback", None)
+rate_limiter.limit("GET", "/metrics", None)
+rate_limiter.limit("GET", "/health", None)
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware answering 429 with `Retry-After` to callers over their policy"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        policy, wait = await rate_limiter.check(scope)
+        if wait <= 0:
+            await self.app(scope, receive, send)
+            return
+        rate_limited_requests.inc(policy.name)
+        response = ORJSONResponse(
+            {"detail": "Too many requests"}, status_code=429, headers={"Retry-After": str(math.ceil(wait))}
+        )
+        await response(scope, receive, send)
@@ -0,0 +1,39 @@
+from decimal import Decimal
+from typing import Any
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+def _default(value: Any):
+    # orjson handles dict/list/str/int/float/bool/None, datetime and Enum
+    # natively; only the types it doesn't know end up here.
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(by_alias=True)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson, with native ObjectId/datetime handling."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def model_response(content: Any, status_code: int = 200, headers: dict = None) -> ORJSONResponse:
+    """Serializes trusted service output directly.
+
+    Returning a Response from a route makes FastAPI skip re-validating the
+    value against `response_model`; the model stays on the route for the
+    OpenAPI schema only. Use this for models the services built themselves,
+    never for raw client input.
+    """
+    return ORJSONResponse(content, status_code=status_code, headers=headers)
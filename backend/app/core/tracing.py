@@ -0,0 +1,209 @@
+"""Request tracing: a span per HTTP request with child spans for service
+methods, MongoDB commands and external calls.
+
+Only a sampled fraction of requests is traced. For the rest no span is
+created, and each instrumented layer stops at one context variable
+lookup, so tracing costs next to nothing at full traffic. A trace is
+handed to the exporter as a whole when its request span ends.
+
+Exporters are any object with `export(spans)`, taking the trace's spans
+as dicts. `InMemoryExporter` keeps recent traces for tests and local
+debugging; `FileExporter` appends them to a JSON lines file.
+"""
+import logging
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+import orjson
+from .config import settings
+from .metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+class Trace:
+    __slots__ = ("trace_id", "spans")
+
+    def __init__(self):
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.spans: List["Span"] = []
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attributes", "start_ns", "end_ns", "error")
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str] = None, attributes: Optional[Dict] = None):
+        self.trace = trace
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+        # Spans may finish on Motor's threads; list.append is atomic
+        trace.spans.append(self)
+
+    def child(self, name: str, attributes: Optional[Dict] = None) -> "Span":
+        return Span(self.trace, name, self.span_id, attributes)
+
+    def finish(self, end_ns: Optional[int] = None):
+        self.end_ns = end_ns or time.time_ns()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": None if self.end_ns is None else (self.end_ns - self.start_ns) / 1e6,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+# The innermost open span of the sampled request being handled, if any
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+class InMemoryExporter:
+    """Keeps the last `max_traces` traces, each a list of span dicts"""
+
+    def __init__(self, max_traces: int = 1000):
+        self.traces = deque(maxlen=max_traces)
+
+    def export(self, spans: List[Dict]):
+        self.traces.append(spans)
+
+    def clear(self):
+        self.traces.clear()
+
+class FileExporter:
+    """Appends one JSON line per span to `path`.
+
+    Writes are small and buffered by the OS, so they're made from the
+    event loop; keep the sample rate low enough that this stays true.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+
+    def export(self, spans: List[Dict]):
+        if self.file is None:
+            self.file = open(self.path, "ab")
+        self.file.write(b"".join(orjson.dumps(span) + b"\n" for span in spans))
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+class _SpanScope:
+    """`with tracer.span(...)`: a child of the current span, current while the block runs"""
+    __slots__ = ("parent", "name", "attributes", "span", "token")
+
+    def __init__(self, parent: Span, name: str, attributes: Optional[Dict]):
+        self.parent = parent
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self) -> Span:
+        self.span = self.parent.child(self.name, self.attributes)
+        self.token = current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        current_span.reset(self.token)
+        if exc_type is not None:
+            self.span.error = exc_type.__name__
+        self.span.finish()
+        return False
+
+class _NoSpan:
+    """Stands in for `_SpanScope` when the request isn't sampled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+class Tracer:
+    def __init__(self, sample_rate: float, exporter=None):
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    def start_trace(self, name: str, attributes: Optional[Dict] = None) -> Optional[Span]:
+        """The root span of a new trace, or None if this one isn't sampled"""
+        if self.exporter is None or random.random() >= self.sample_rate:
+            return None
+        return Span(Trace(), name, attributes=attributes)
+
+    def end_trace(self, root: Span):
+        root.finish()
+        try:
+            self.exporter.export([span.to_dict() for span in root.trace.spans])
+        except Exception as e:
+            logger.warning("Exporting trace %s failed: %s", root.trace.trace_id, e)
+
+    def span(self, name: str, attributes: Optional[Dict] = None):
+        parent = current_span.get()
+        if parent is None:
+            return _NO_SPAN
+        return _SpanScope(parent, name, attributes)
+
+    def close(self):
+        close = getattr(self.exporter, "close", None)
+        if close is not None:
+            close()
+
+def _configured_exporter():
+    if settings.tracing_exporter == "file":
+        return FileExporter(settings.tracing_file_path)
+    if settings.tracing_exporter == "memory":
+        return InMemoryExporter()
+    return None
+
+tracer = Tracer(settings.tracing_sample_rate, _configured_exporter())
+
+class TracingMiddleware:
+    """Pure ASGI middleware opening the root span of sampled HTTP requests.
+
+    The span is renamed to the route template once the router has matched,
+    and its trace id is returned in the `X-Trace-Id` response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        root = tracer.start_trace(scope["method"])
+        if root is None:
+            await self.app(scope, receive, send)
+            return
+        root.attributes.update({"http.method": scope["method"], "http.target": scope["path"]})
+
+        trace_header = (b"x-trace-id", root.trace.trace_id.encode())
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                message["headers"] = list(message.get("headers", ())) + [trace_header]
+            await send(message)
+
+        token = current_span.set(root)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            root.error = type(e).__name__
+            raise
+        finally:
+            current_span.reset(token)
+            root.name = f"{scope['method']} {route_template(scope)}"
+            tracer.end_trace(root)
@@ -1,15 +1,37 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .core.database import connect_to_mongo, close_mongo_connection
-from .api import auth, shipments, bids, websocket, payments
+from .core.database import db, connect_to_mongo, close_mongo_connection
+from .core.responses import ORJSONResponse
+from .core.metrics import MetricsMiddleware
+from .core.tracing import TracingMiddleware, tracer
+from .core.profiler import ProfilingMiddleware
+from .core.rate_limit import RateLimitMiddleware, rate_limiter
+from .core.admission import AdmissionMiddleware
+from .core.config import settings
+from .core.executor import blocking_executor
+from .services.container import container
+from .api import auth, shipments, bids, websocket, payments, exports, admin, sync, tracking, metrics, profiling
 
 app = FastAPI(
     title="Birtu Logistics API",
     description="API for Birtu Logistics platform",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
-# CORS middleware
+# Middleware added later wraps what was added before it
+if settings.profiler_enabled:
+    app.add_middleware(ProfilingMiddleware)
+# Sheds excess requests before anything else touches the database
+if settings.max_concurrent_requests > 0:
+    app.add_middleware(AdmissionMiddleware)
+# Outside admission, so callers over their limit never hold or wait for a slot
+if settings.rate_limit_enabled:
+    app.add_middleware(RateLimitMiddleware)
+app.add_middleware(TracingMiddleware)
+# Times everything below, including refused requests
+app.add_middleware(MetricsMiddleware)
+# CORS middleware; outermost, so 429 and 503 responses carry the CORS headers too
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # In production, specify actual origins
@@ -22,17 +44,29 @@ app.add_middleware(
 @app.on_event("startup")
 async def startup_db_client():
     await connect_to_mongo()
+    rate_limiter.connect(db.database)
+    container.init(db.database)
+    await container.start()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await container.stop()
     await close_mongo_connection()
+    blocking_executor.shutdown()
+    tracer.close()
 
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["authentication"])
 app.include_router(shipments.router, prefix="/api/shipments", tags=["shipments"])
 app.include_router(bids.router, prefix="/api/bids", tags=["bids"])
 app.include_router(payments.router, prefix="/api/payments", tags=["payments"])
+app.include_router(tracking.router, prefix="/api/tracking", tags=["tracking"])
+app.include_router(sync.router, prefix="/api/sync", tags=["sync"])
+app.include_router(exports.router, prefix="/api/admin/exports", tags=["admin"])
+app.include_router(profiling.router, prefix="/api/admin/profile", tags=["admin"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 app.include_router(websocket.router)
+app.include_router(metrics.router, tags=["monitoring"])
 
 @app.get("/")
 async def root():
@@ -0,0 +1,23 @@
+from typing import List, Literal, Optional
+from bson import ObjectId
+from pydantic import BaseModel, Field
+from .user import PyObjectId
+
+class DispatchRequest(BaseModel):
+    center: Optional[List[float]] = Field(None, min_length=2, max_length=2, description="Region center [longitude, latitude]; all regions if omitted")
+    radius_km: Optional[float] = Field(None, gt=0, description="Region radius around the center")
+    no_bid_cost: Optional[float] = Field(None, ge=0, description="Price assumed for drivers who haven't bid; if omitted only bidders are assigned")
+    method: Literal["auto", "optimal", "greedy"] = Field("auto", description="Solver; auto picks greedy for very large batches")
+    apply: bool = Field(False, description="Accept the assigned bids instead of only returning the plan")
+
+class Assignment(BaseModel):
+    shipment_id: PyObjectId = Field(..., description="Shipment ID")
+    driver_id: PyObjectId = Field(..., description="Driver's user ID")
+    bid_id: Optional[PyObjectId] = Field(None, description="Driver's bid on the shipment, if any")
+    amount: Optional[float] = Field(None, description="Bid amount in ETB")
+    pickup_distance_km: float = Field(..., description="Driver to pickup distance")
+    cost: float = Field(..., description="Assignment cost the solver minimized")
+
+    class Config:
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
@@ -0,0 +1,23 @@
+from typing import Any, Dict
+from datetime import datetime
+from bson import ObjectId
+from pydantic import BaseModel, Field
+from .user import PyObjectId
+from .trusted import decode_trusted
+
+class NotificationInDB(BaseModel):
+    id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    user_id: PyObjectId = Field(..., description="Recipient user ID")
+    data: Dict[str, Any] = Field(..., description="Notification payload (title, message, type, ...)")
+    read: bool = Field(default=False, description="Whether the user has seen it")
+    created_at: datetime = Field(..., description="When the notification was sent")
+
+    class Config:
+        allow_population_by_field_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+
+    @classmethod
+    def from_mongo(cls, document: dict) -> "NotificationInDB":
+        """Builds the model from a stored document without re-validating it"""
+        return decode_trusted(cls, document)
@@ -0,0 +1,8 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+
+class RequestProfileSettings(BaseModel):
+    every: int = Field(1, ge=1, description="Sample one in this many (matching) requests")
+    route: Optional[str] = Field(None, description="Route template to sample, e.g. /api/bids/{bid_id}/accept; all routes if omitted")
+    seconds: float = Field(60, gt=0, description="Stop sampling after this long")
+    interval_ms: Optional[float] = Field(None, ge=1, description="Time between stack samples; the configured default if omitted")
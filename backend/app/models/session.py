@@ -0,0 +1,21 @@
+from datetime import datetime
+from typing import Optional
+from bson import ObjectId
+from pydantic import BaseModel, Field
+from .user import PyObjectId
+
+class RefreshRequest(BaseModel):
+    refresh_token: str = Field(..., description="Refresh token from login or the last refresh")
+
+class Session(BaseModel):
+    id: PyObjectId = Field(..., alias="_id")
+    device: Optional[str] = Field(None, description="Device name given at login, or its User-Agent")
+    created_at: datetime = Field(..., description="When the user signed in on this device")
+    last_used_at: datetime = Field(..., description="Last login or refresh")
+    expires_at: datetime = Field(..., description="When the refresh token lapses unless used")
+    current: bool = Field(False, description="Whether this is the session of the requesting access token")
+
+    class Config:
+        allow_population_by_field_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
@@ -5,6 +5,8 @@ from pydantic_core import core_schema
 from bson import ObjectId
 from enum import Enum
 from datetime import datetime
+from .trusted import decode_trusted
+from .user import DriverSummary
 
 class PyObjectId(ObjectId):
     @classmethod
@@ -20,8 +22,10 @@ class PyObjectId(ObjectId):
                     core_schema.no_info_plain_validator_function(cls.validate),
                 ])
             ]),
+            # ObjectIds stay native in python-mode dumps; the ORJSON response
+            # class and JSON-mode dumps turn them into strings
             serialization=core_schema.plain_serializer_function_ser_schema(
-                lambda x: str(x)
+                str, when_used="json"
             ),
         )
 
@@ -41,6 +45,7 @@ class ShipmentStatus(str, Enum):
     DRAFT = "draft"
     BIDDING = "bidding"
     ACCEPTED = "accepted"
+    PAID = "paid"
     IN_TRANSIT = "in_transit"
     DELIVERED = "delivered"
     CANCELLED = "cancelled"
@@ -110,6 +115,8 @@ class ShipmentInDB(ShipmentBase):
     bids: List[Bid] = Field(default_factory=list, description="Bids from drivers")
     accepted_bid_id: Optional[PyObjectId] = Field(None, description="ID of accepted bid")
     delivery_confirmation: Optional[DeliveryConfirmation] = Field(None, description="Delivery confirmation details")
+    estimated_distance: Optional[float] = Field(None, description="Estimated road distance pickup to dropoff (km)")
+    estimated_duration_minutes: Optional[float] = Field(None, description="Estimated drive time pickup to dropoff")
     created_at: datetime = Field(default_factory=datetime.utcnow, description="Creation timestamp")
     updated_at: datetime = Field(default_factory=datetime.utcnow, description="Last update timestamp")
 
@@ -118,6 +125,11 @@ class ShipmentInDB(ShipmentBase):
         arbitrary_types_allowed = True
         json_encoders = {ObjectId: str, datetime: str}
 
+    @classmethod
+    def from_mongo(cls, document: dict) -> "ShipmentInDB":
+        """Builds the model from a stored document without re-validating it"""
+        return decode_trusted(cls, document)
+
 class Shipment(ShipmentBase):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
     customer_id: PyObjectId = Field(..., description="Customer's user ID")
@@ -125,6 +137,8 @@ class Shipment(ShipmentBase):
     bids: List[Bid] = Field(default_factory=list, description="Bids from drivers")
     accepted_bid_id: Optional[PyObjectId] = Field(None, description="ID of accepted bid")
     delivery_confirmation: Optional[DeliveryConfirmation] = Field(None, description="Delivery confirmation details")
+    estimated_distance: Optional[float] = Field(None, description="Estimated road distance pickup to dropoff (km)")
+    estimated_duration_minutes: Optional[float] = Field(None, description="Estimated drive time pickup to dropoff")
     created_at: datetime = Field(default_factory=datetime.utcnow, description="Creation timestamp")
     updated_at: datetime = Field(default_factory=datetime.utcnow, description="Last update timestamp")
 
@@ -133,6 +147,17 @@ class Shipment(ShipmentBase):
         arbitrary_types_allowed = True
         json_encoders = {ObjectId: str, datetime: str}
 
+class NearbyShipment(ShipmentInDB):
+    pickup_distance_km: Optional[float] = Field(None, description="Distance from the driver to the pickup (km)")
+
+    @classmethod
+    def from_shipment(cls, shipment: ShipmentInDB, pickup_distance_km: Optional[float]) -> "NearbyShipment":
+        return cls.model_construct(
+            _fields_set=shipment.model_fields_set | {"pickup_distance_km"},
+            **shipment.__dict__,
+            pickup_distance_km=pickup_distance_km
+        )
+
 class BidCreate(BaseModel):
     shipment_id: PyObjectId = Field(..., description="Shipment ID")
     amount: float = Field(..., description="Bid amount in ETB")
@@ -144,9 +169,23 @@ class BidResponse(BaseModel):
     amount: float = Field(..., description="Bid amount in ETB")
     status: BidStatus = Field(..., description="Bid status")
     bid_time: datetime = Field(..., description="When the bid was placed")
+    updated_at: Optional[datetime] = Field(None, description="Last update timestamp")
 
     class Config:
         allow_population_by_field_name = True
         arbitrary_types_allowed = True
         json_encoders = {ObjectId: str, datetime: str}
 
+    @classmethod
+    def from_mongo(cls, document: dict) -> "BidResponse":
+        """Builds the model from a stored document without re-validating it"""
+        return decode_trusted(cls, document)
+
+class BidWithDriver(BidResponse):
+    driver: Optional[DriverSummary] = Field(None, description="Bidding driver's public details")
+
+    @classmethod
+    def from_bid(cls, bid: BidResponse, driver: Optional[DriverSummary]) -> "BidWithDriver":
+        return cls.model_construct(
+            _fields_set=bid.model_fields_set | {"driver"}, **bid.__dict__, driver=driver
+        )
@@ -0,0 +1,17 @@
+from typing import List, Optional
+from datetime import datetime
+from pydantic import BaseModel, Field, field_validator
+
+class PositionUpdate(BaseModel):
+    coordinates: List[float] = Field(..., min_length=2, max_length=2, description="[longitude, latitude]")
+    speed_kmh: Optional[float] = Field(None, ge=0, description="Ground speed reported by the device")
+    heading: Optional[float] = Field(None, ge=0, lt=360, description="Heading in degrees from north")
+    recorded_at: Optional[datetime] = Field(None, description="Device time of the fix; server time if omitted")
+
+    @field_validator("coordinates")
+    @classmethod
+    def check_range(cls, v):
+        longitude, latitude = v
+        if not (-180 <= longitude <= 180 and -90 <= latitude <= 90):
+            raise ValueError("Coordinates out of range")
+        return v
@@ -0,0 +1,92 @@
+"""Trusted-read construction of models from documents we wrote ourselves.
+
+Documents coming back from MongoDB were validated on the way in, so running
+full validation again on every read (ObjectId checks, nested Location/Bid
+models, enum lookups) is wasted work. `decode_trusted` instead builds the
+model the way `model_construct` does, from a plan of its fields worked out
+once per model: nested models and lists of models are decoded the same way,
+enum values are mapped back to members, and everything else (ObjectIds,
+datetimes, scalars) is passed through.
+
+Never use this for client input - that must keep going through validation.
+"""
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, TypeVar, Union, get_args, get_origin
+from pydantic import BaseModel
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# (field name, document key, converter or None, required, default, default factory)
+_FieldPlan = Tuple[str, str, Optional[Callable[[Any], Any]], bool, Any, Optional[Callable[[], Any]]]
+
+_plans: Dict[type, List[_FieldPlan]] = {}
+_object_setattr = object.__setattr__
+_MISSING = object()
+
+def _converter(annotation: Any) -> Optional[Callable[[Any], Any]]:
+    """Returns a function converting a stored value for the annotation, or None to pass it through."""
+    origin = get_origin(annotation)
+
+    if origin is Union:
+        members = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return _converter(members[0]) if len(members) == 1 else None
+
+    if origin in (list, List):
+        args = get_args(annotation)
+        convert_item = _converter(args[0]) if args else None
+        if convert_item is None:
+            return None
+        return lambda items: [convert_item(item) for item in items]
+
+    if isinstance(annotation, type):
+        if issubclass(annotation, BaseModel):
+            # Looked up on use, so self-referencing models work
+            return lambda document: decode_trusted(annotation, document)
+        if issubclass(annotation, Enum):
+            # Unknown values are kept as-is rather than raising on a read
+            members = annotation._value2member_map_
+            return lambda value: members.get(value, value)
+
+    return None
+
+def _plan(model_cls: Type[BaseModel]) -> List[_FieldPlan]:
+    plan = _plans.get(model_cls)
+    if plan is None:
+        plan = _plans[model_cls] = [
+            (
+                name, field.alias or name, _converter(field.annotation), field.is_required(),
+                field.default, field.default_factory
+            )
+            for name, field in model_cls.model_fields.items()
+        ]
+    return plan
+
+def decode_trusted(model_cls: Type[ModelT], document: dict) -> ModelT:
+    """Builds `model_cls` from a trusted MongoDB document without re-validating it."""
+    values = {}
+    fields_set = set()
+    for name, key, convert, required, default, default_factory in _plan(model_cls):
+        value = document.get(key, _MISSING)
+        if value is _MISSING and key != name:
+            value = document.get(name, _MISSING)
+        if value is _MISSING:
+            if required:
+                # Not a document we wrote - let validation report it
+                return model_cls.model_validate(document)
+            # Defaults aren't part of the fields set, same as after validation
+            values[name] = default_factory() if default_factory is not None else default
+            continue
+        values[name] = value if convert is None or value is None else convert(value)
+        fields_set.add(name)
+
+    if model_cls.__pydantic_post_init__ or model_cls.__pydantic_root_model__ \
+            or model_cls.model_config.get("extra") == "allow":
+        # Models with private attributes/post-init hooks need the full constructor
+        return model_cls.model_construct(_fields_set=fields_set, **values)
+    # Same end state as model_construct, without its per-field default lookups
+    instance = model_cls.__new__(model_cls)
+    _object_setattr(instance, "__dict__", values)
+    _object_setattr(instance, "__pydantic_fields_set__", fields_set)
+    _object_setattr(instance, "__pydantic_extra__", None)
+    _object_setattr(instance, "__pydantic_private__", None)
+    return instance
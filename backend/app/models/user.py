@@ -1,9 +1,11 @@
 from typing import Optional, List, Any
-from pydantic import BaseModel, EmailStr, Field, GetJsonSchemaHandler
+from pydantic import BaseModel, EmailStr, Field, GetJsonSchemaHandler, field_validator
 from pydantic.json_schema import JsonSchemaValue
 from pydantic_core import core_schema
 from bson import ObjectId
 from enum import Enum
+from datetime import datetime
+from .trusted import decode_trusted
 
 class PyObjectId(ObjectId):
     @classmethod
@@ -19,8 +21,10 @@ class PyObjectId(ObjectId):
                     core_schema.no_info_plain_validator_function(cls.validate),
                 ])
             ]),
+            # ObjectIds stay native in python-mode dumps; the ORJSON response
+            # class and JSON-mode dumps turn them into strings
             serialization=core_schema.plain_serializer_function_ser_schema(
-                lambda x: str(x)
+                str, when_used="json"
             ),
         )
 
@@ -73,6 +77,8 @@ class UserUpdate(BaseModel):
 class UserInDB(UserBase):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
     hashed_password: str = Field(..., description="Hashed password")
+    current_location: Optional[List[float]] = Field(None, description="Last reported [longitude, latitude] (drivers only)")
+    location_updated_at: Optional[datetime] = Field(None, description="When current_location was reported")
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
 
@@ -81,8 +87,15 @@ class UserInDB(UserBase):
         arbitrary_types_allowed = True
         json_encoders = {ObjectId: str}
 
+    @classmethod
+    def from_mongo(cls, document: dict) -> "UserInDB":
+        """Builds the model from a stored document without re-validating it"""
+        return decode_trusted(cls, document)
+
 class User(UserBase):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    current_location: Optional[List[float]] = Field(None, description="Last reported [longitude, latitude] (drivers only)")
+    location_updated_at: Optional[datetime] = Field(None, description="When current_location was reported")
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
 
@@ -91,9 +104,39 @@ class User(UserBase):
         arbitrary_types_allowed = True
         json_encoders = {ObjectId: str}
 
+class LocationUpdate(BaseModel):
+    coordinates: List[float] = Field(..., min_length=2, max_length=2, description="[longitude, latitude]")
+
+    @field_validator("coordinates")
+    @classmethod
+    def check_range(cls, v):
+        longitude, latitude = v
+        if not (-180 <= longitude <= 180 and -90 <= latitude <= 90):
+            raise ValueError("Coordinates out of range")
+        return v
+
+class DriverSummary(BaseModel):
+    """Public driver details embedded in bid listings"""
+    id: PyObjectId = Field(..., alias="_id")
+    name: str = Field(..., description="Full name")
+    rating: float = Field(default=0.0, description="User rating")
+    vehicle_type: Optional[VehicleType] = Field(None, description="Vehicle type")
+
+    class Config:
+        allow_population_by_field_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+
+    @classmethod
+    def from_user(cls, user: UserInDB) -> "DriverSummary":
+        return cls.model_construct(
+            id=user.id, name=user.name, rating=user.rating, vehicle_type=user.vehicle_type
+        )
+
 class UserLogin(BaseModel):
     phone: str = Field(..., description="Phone number")
     password: str = Field(..., description="Password")
+    device: Optional[str] = Field(None, max_length=200, description="Name of the device signing in, shown in the session list")
 
 class Token(BaseModel):
     access_token: str
@@ -0,0 +1,255 @@
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from ..core.config import settings
+from ..core.geo import as_coordinates, distance_matrix_km, haversine_km
+from ..models.dispatch import Assignment
+from ..models.shipment import ShipmentInDB
+from ..models.user import UserInDB
+from .shipment_service import ShipmentService
+from .notification_service import notification_service
+from ..core.mongo_monitor import instrument_service
+
+# Cost of a pair that must never be assigned. Finite, because the optimal
+# solver rejects matrices where no complete matching has finite cost.
+INFEASIBLE = 1e12
+
+# How much each km to the pickup counts for, relative to medium urgency
+URGENCY_DISTANCE_FACTOR = {"low": 0.5, "medium": 1.0, "high": 2.0}
+
+# Shipments a driver is still busy with
+ACTIVE_STATUSES = ["accepted", "paid", "in_transit"]
+
+def _value(value):
+    return getattr(value, "value", value)
+
+def build_cost_matrix(
+    driver_coordinates: np.ndarray,
+    driver_vehicle_types: Sequence[Optional[str]],
+    pickup_coordinates: np.ndarray,
+    vehicle_requirements: Sequence[Sequence[str]],
+    urgency_factors: np.ndarray,
+    bid_amounts: np.ndarray,
+    cost_per_km: float,
+    max_pickup_km: float,
+    no_bid_cost: Optional[float] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """(drivers x shipments) assignment costs in ETB, plus the pickup distances.
+
+    A pair costs the driver's bid (or `no_bid_cost` if they didn't bid) plus
+    the urgency-weighted distance to the pickup. Pairs whose vehicle doesn't
+    fit, that are too far away, or without a bid when `no_bid_cost` is None
+    cost INFEASIBLE.
+    """
+    distances = distance_matrix_km(driver_coordinates, pickup_coordinates)
+    cost = distances * (cost_per_km * np.asarray(urgency_factors, dtype=float))[np.newaxis, :]
+
+    no_bid = np.isnan(bid_amounts)
+    cost += np.where(no_bid, 0.0 if no_bid_cost is None else no_bid_cost, bid_amounts)
+
+    infeasible = ~(distances <= max_pickup_km)  # also catches NaN (unknown location)
+    if no_bid_cost is None:
+        infeasible |= no_bid
+
+    # Vehicle compatibility, one boolean outer product per vehicle type
+    compatible = np.zeros(cost.shape, dtype=bool)
+    unrestricted = np.array([not requirements for requirements in vehicle_requirements], dtype=bool)
+    compatible[:, unrestricted] = True
+    driver_types = np.array([_value(vehicle_type) or "" for vehicle_type in driver_vehicle_types], dtype=object)
+    for vehicle_type in {_value(vehicle_type) for requirements in vehicle_requirements for vehicle_type in requirements}:
+        requires = np.array([vehicle_type in {_value(item) for item in requirements} for requirements in vehicle_requirements], dtype=bool)
+        compatible |= np.outer(driver_types == vehicle_type, requires)
+    infeasible |= ~compatible
+
+    cost[infeasible] = INFEASIBLE
+    return cost, distances
+
+def solve_assignment(cost: np.ndarray, method: str = "auto") -> Tuple[np.ndarray, np.ndarray, str]:
+    """Returns (driver rows, shipment columns, method used) of feasible assigned pairs.
+
+    "optimal" minimizes the total cost exactly (Jonker-Volgenant, O(n^3));
+    "greedy" repeatedly takes the cheapest remaining pair among each driver's
+    cheapest candidates, which scales to batches the optimal solver can't.
+    """
+    if method == "auto":
+        method = "optimal" if cost.size <= settings.assignment_optimal_max_cells else "greedy"
+    if cost.size == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int), method
+
+    if method == "optimal":
+        rows, cols = linear_sum_assignment(cost)
+    else:
+        rows, cols = _greedy_assignment(cost, settings.assignment_greedy_candidates)
+
+    feasible = cost[rows, cols] < INFEASIBLE
+    return rows[feasible], cols[feasible], method
+
+def _greedy_assignment(cost: np.ndarray, candidates: int) -> Tuple[np.ndarray, np.ndarray]:
+    n_rows, n_cols = cost.shape
+    k = min(candidates, n_cols)
+    # Each driver's k cheapest shipments, then all candidates cheapest first
+    if k < n_cols:
+        candidate_cols = np.argpartition(cost, k - 1, axis=1)[:, :k]
+    else:
+        candidate_cols = np.broadcast_to(np.arange(n_cols), (n_rows, n_cols))
+    candidate_rows = np.repeat(np.arange(n_rows), k)
+    candidate_cols = candidate_cols.ravel()
+    candidate_cost = cost[candidate_rows, candidate_cols]
+    order = np.argsort(candidate_cost, kind="stable")
+    order = order[candidate_cost[order] < INFEASIBLE]
+
+    row_taken = np.zeros(n_rows, dtype=bool)
+    col_taken = np.zeros(n_cols, dtype=bool)
+    rows, cols = [], []
+    for row, col in zip(candidate_rows[order].tolist(), candidate_cols[order].tolist()):
+        if row_taken[row] or col_taken[col]:
+            continue
+        row_taken[row] = col_taken[col] = True
+        rows.append(row)
+        cols.append(col)
+    return np.array(rows, dtype=int), np.array(cols, dtype=int)
+
+@instrument_service
+class AssignmentService:
+    """Batch assignment of bidding shipments to available verified drivers."""
+
+    def __init__(self, database: AsyncIOMotorDatabase, shipment_service: ShipmentService):
+        self.database = database
+        self.shipment_service = shipment_service
+        self.user_service = shipment_service.user_service
+        self.bids_collection = database.bids
+
+    async def _busy_driver_ids(self, driver_ids: List) -> set:
+        accepted = {}
+        async for bid_data in self.bids_collection.find(
+            {"driver_id": {"$in": driver_ids}, "status": "accepted"},
+            {"shipment_id": 1, "driver_id": 1}
+        ):
+            accepted[bid_data["shipment_id"]] = bid_data["driver_id"]
+        busy = set()
+        if accepted:
+            async for shipment_data in self.shipment_service.collection.find(
+                {"_id": {"$in": list(accepted)}, "status": {"$in": ACTIVE_STATUSES}},
+                {"_id": 1}
+            ):
+                busy.add(accepted[shipment_data["_id"]])
+        return busy
+
+    async def _pending_bids(self, shipment_ids: List) -> Dict[Tuple, Dict]:
+        bids = {}
+        async for bid_data in self.bids_collection.find(
+            {"shipment_id": {"$in": shipment_ids}, "status": "pending"},
+            {"shipment_id": 1, "driver_id": 1, "amount": 1}
+        ):
+            bids[(bid_data["driver_id"], bid_data["shipment_id"])] = bid_data
+        return bids
+
+    async def plan(
+        self,
+        center: Optional[List[float]] = None,
+        radius_km: Optional[float] = None,
+        no_bid_cost: Optional[float] = None,
+        method: str = "auto"
+    ) -> Dict:
+        """Computes the cheapest driver for each bidding shipment in the region."""
+        started = time.perf_counter()
+        shipments: List[ShipmentInDB] = [
+            shipment for shipment in await self.shipment_service.get_available_shipments()
+            if shipment.pickup_location is not None
+        ]
+        drivers: List[UserInDB] = await self.user_service.get_located_drivers()
+
+        pickup_coordinates = as_coordinates([shipment.pickup_location.coordinates for shipment in shipments])
+        driver_coordinates = as_coordinates([driver.current_location for driver in drivers])
+        if center is not None and radius_km is not None:
+            in_region = haversine_km(pickup_coordinates[:, 0], pickup_coordinates[:, 1], center[0], center[1]) <= radius_km
+            shipments = [shipment for shipment, keep in zip(shipments, in_region) if keep]
+            pickup_coordinates = pickup_coordinates[in_region]
+            in_region = haversine_km(driver_coordinates[:, 0], driver_coordinates[:, 1], center[0], center[1]) <= radius_km
+            drivers = [driver for driver, keep in zip(drivers, in_region) if keep]
+            driver_coordinates = driver_coordinates[in_region]
+
+        if drivers and shipments:
+            busy = await self._busy_driver_ids([driver.id for driver in drivers])
+            if busy:
+                available = np.array([driver.id not in busy for driver in drivers], dtype=bool)
+                drivers = [driver for driver, keep in zip(drivers, available) if keep]
+                driver_coordinates = driver_coordinates[available]
+
+        bids = await self._pending_bids([shipment.id for shipment in shipments]) if drivers and shipments else {}
+        bid_amounts = np.full((len(drivers), len(shipments)), np.nan)
+        if bids:
+            driver_index = {driver.id: index for index, driver in enumerate(drivers)}
+            shipment_index = {shipment.id: index for index, shipment in enumerate(shipments)}
+            for (driver_id, shipment_id), bid_data in bids.items():
+                if driver_id in driver_index:
+                    bid_amounts[driver_index[driver_id], shipment_index[shipment_id]] = bid_data["amount"]
+
+        cost, distances = build_cost_matrix(
+            driver_coordinates,
+            [driver.vehicle_type for driver in drivers],
+            pickup_coordinates,
+            [shipment.vehicle_requirements for shipment in shipments],
+            np.array([URGENCY_DISTANCE_FACTOR.get(_value(shipment.urgency), 1.0) for shipment in shipments]),
+            bid_amounts,
+            cost_per_km=settings.assignment_cost_per_km,
+            max_pickup_km=settings.assignment_max_pickup_km,
+            no_bid_cost=no_bid_cost
+        )
+        rows, cols, method = solve_assignment(cost, method)
+
+        assignments = []
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            driver, shipment = drivers[row], shipments[col]
+            bid_data = bids.get((driver.id, shipment.id))
+            assignments.append(Assignment(
+                shipment_id=shipment.id,
+                driver_id=driver.id,
+                bid_id=bid_data["_id"] if bid_data else None,
+                amount=bid_data["amount"] if bid_data else None,
+                pickup_distance_km=round(float(distances[row, col]), 3),
+                cost=round(float(cost[row, col]), 2)
+            ))
+
+        return {
+            "method": method,
+            "drivers": len(drivers),
+            "shipments": len(shipments),
+            "assignments": assignments,
+            "total_cost": round(sum(assignment.cost for assignment in assignments), 2),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    async def apply(self, assignments: List[Assignment]) -> int:
+        """Accepts the assigned bids; pairs without a bid are left for the dispatcher."""
+        # The plan may be stale by now; only accept into shipments still open
+        open_pairs = []
+        for assignment in assignments:
+            if assignment.bid_id is None:
+                continue
+            shipment = await self.shipment_service.get_shipment_by_id(str(assignment.shipment_id))
+            if shipment and _value(shipment.status) == "bidding":
+                open_pairs.append((assignment, shipment))
+        customers = await self.user_service.get_users_by_ids(
+            str(shipment.customer_id) for _, shipment in open_pairs
+        )
+
+        applied = 0
+        for assignment, shipment in open_pairs:
+            accepted_bid = await self.shipment_service.accept_bid(str(assignment.bid_id))
+            if not accepted_bid:
+                continue
+            applied += 1
+            customer = customers.get(str(shipment.customer_id))
+            await notification_service.notify_bid_accepted(
+                driver_id=str(accepted_bid.driver_id),
+                bid_data={
+                    "id": str(accepted_bid.id),
+                    "shipment_id": str(accepted_bid.shipment_id),
+                    "amount": accepted_bid.amount,
+                    "customer_name": customer.name if customer else None
+                }
+            )
+        return applied
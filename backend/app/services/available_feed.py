@@ -0,0 +1,131 @@
+from datetime import datetime
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorCollection
+from ..core.geo import as_coordinates, rank_by_distance
+from ..models.shipment import Bid, ShipmentInDB
+from ..core.mongo_monitor import instrument_service
+
+def vehicle_types_of(shipment: ShipmentInDB) -> Set[str]:
+    return {str(getattr(vehicle_type, "value", vehicle_type)) for vehicle_type in shipment.vehicle_requirements}
+
+def is_available(shipment: Optional[ShipmentInDB]) -> bool:
+    return shipment is not None and str(getattr(shipment.status, "value", shipment.status)) == "bidding"
+
+@instrument_service
+class AvailableShipmentFeed:
+    """In-memory view of the shipments open for bidding, bucketed by vehicle type.
+
+    Seeded from MongoDB at startup and updated incrementally by ShipmentService
+    whenever a shipment is written. It only sees other workers' writes through
+    the change stream, so ShipmentService reads from it only when that is on or
+    this is the only worker. Every change bumps `version`, which is local to
+    this process and only keys the pickup index.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.ready = False
+        # id -> (version of last change, shipment), oldest change first
+        self._shipments: "OrderedDict[str, tuple]" = OrderedDict()
+        # vehicle type -> ids of bidding shipments requiring it
+        self._buckets: Dict[str, Set[str]] = {}
+        # Pickup coordinates of all shipments, rebuilt lazily after changes
+        self._pickup_index_version = -1
+        self._pickup_index: Tuple[List[str], List[ShipmentInDB], np.ndarray] = ([], [], np.empty((0, 2)))
+
+    def _upsert(self, shipment_id: str, shipment: ShipmentInDB):
+        self.version += 1
+        previous = self._shipments.pop(shipment_id, None)
+        new_types = vehicle_types_of(shipment)
+        if previous is not None:
+            old_types = vehicle_types_of(previous[1])
+            if old_types != new_types:
+                for vehicle_type in old_types - new_types:
+                    self._buckets.get(vehicle_type, set()).discard(shipment_id)
+        for vehicle_type in new_types:
+            self._buckets.setdefault(vehicle_type, set()).add(shipment_id)
+        self._shipments[shipment_id] = (self.version, shipment)
+
+    def _remove(self, shipment_id: str):
+        previous = self._shipments.pop(shipment_id, None)
+        if previous is None:
+            return
+        self.version += 1
+        for vehicle_type in vehicle_types_of(previous[1]):
+            self._buckets.get(vehicle_type, set()).discard(shipment_id)
+
+    def apply(self, shipment_id, shipment: Optional[ShipmentInDB]):
+        """Brings the feed in line with the current state of a shipment (None if deleted)."""
+        shipment_id = str(shipment_id)
+        if is_available(shipment):
+            self._upsert(shipment_id, shipment)
+        else:
+            self._remove(shipment_id)
+
+    def add_bid(self, shipment_id, bid: Bid, updated_at: datetime):
+        """Mirrors a bid pushed onto a shipment without re-reading it."""
+        shipment_id = str(shipment_id)
+        entry = self._shipments.get(shipment_id)
+        if entry is not None:
+            shipment = entry[1]
+            self._upsert(shipment_id, shipment.model_copy(
+                update={"bids": shipment.bids + [bid], "updated_at": updated_at}
+            ))
+
+    async def seed(self, collection: AsyncIOMotorCollection):
+        """Loads (or reloads) all bidding shipments, recording only the differences."""
+        seen = set()
+        async for shipment_data in collection.find({"status": "bidding"}):
+            shipment = ShipmentInDB.from_mongo(shipment_data)
+            shipment_id = str(shipment.id)
+            seen.add(shipment_id)
+            current = self._shipments.get(shipment_id)
+            if current is None or current[1] != shipment:
+                self._upsert(shipment_id, shipment)
+        for shipment_id in [shipment_id for shipment_id in self._shipments if shipment_id not in seen]:
+            self._remove(shipment_id)
+        self.ready = True
+
+    def _ids_for(self, vehicle_types: Optional[Iterable[str]]) -> Optional[Set[str]]:
+        if not vehicle_types:
+            return None
+        ids = set()
+        for vehicle_type in vehicle_types:
+            ids |= self._buckets.get(str(getattr(vehicle_type, "value", vehicle_type)), set())
+        return ids
+
+    def list(self, vehicle_types: Optional[List[str]] = None) -> List[ShipmentInDB]:
+        """Bidding shipments requiring any of the vehicle types (all of them if None)."""
+        ids = self._ids_for(vehicle_types)
+        if ids is None:
+            return [shipment for _, shipment in self._shipments.values()]
+        return [shipment for shipment_id, (_, shipment) in self._shipments.items() if shipment_id in ids]
+
+    def _pickups(self) -> Tuple[List[str], List[ShipmentInDB], np.ndarray]:
+        if self._pickup_index_version != self.version:
+            ids = list(self._shipments)
+            shipments = [shipment for _, shipment in self._shipments.values()]
+            coordinates = as_coordinates([
+                shipment.pickup_location.coordinates if shipment.pickup_location else None
+                for shipment in shipments
+            ])
+            self._pickup_index = (ids, shipments, coordinates)
+            self._pickup_index_version = self.version
+        return self._pickup_index
+
+    def nearby(
+        self,
+        origin: Sequence[float],
+        vehicle_types: Optional[List[str]] = None,
+        max_distance_km: Optional[float] = None
+    ) -> List[Tuple[ShipmentInDB, float]]:
+        """(shipment, pickup distance in km) nearest first, computed for the whole feed at once"""
+        ids, shipments, coordinates = self._pickups()
+        order, distances = rank_by_distance(origin, coordinates, max_distance_km)
+        allowed = self._ids_for(vehicle_types)
+        return [
+            (shipments[index], distances[index]) for index in order.tolist()
+            if allowed is None or ids[index] in allowed
+        ]
@@ -2,6 +2,8 @@ from typing import Dict
 import cloudinary
 import cloudinary.uploader
 from fastapi import HTTPException, status
+from ..core.executor import blocking_executor
+from ..core.tracing import tracer
 
 class CloudinaryService:
     def __init__(self, cloud_name: str, api_key: str, api_secret: str):
@@ -15,7 +17,8 @@ class CloudinaryService:
     async def upload_image(self, file_path: str, folder: str = "birtu_logistics") -> str:
         """Uploads an image to Cloudinary and returns its URL."""
         try:
-            upload_result = cloudinary.uploader.upload(file_path, folder=folder)
+            with tracer.span("cloudinary.upload", {"folder": folder}):
+                upload_result = await blocking_executor.run(cloudinary.uploader.upload, file_path, folder=folder)
             return upload_result["secure_url"]
         except Exception as e:
             raise HTTPException(
@@ -26,7 +29,8 @@ class CloudinaryService:
     async def delete_image(self, public_id: str) -> Dict:
         """Deletes an image from Cloudinary."""
         try:
-            delete_result = cloudinary.uploader.destroy(public_id)
+            with tracer.span("cloudinary.destroy"):
+                delete_result = await blocking_executor.run(cloudinary.uploader.destroy, public_id)
             return delete_result
         except Exception as e:
             raise HTTPException(
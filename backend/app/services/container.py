@@ -0,0 +1,109 @@
+import asyncio
+from datetime import timedelta
+from typing import List
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from ..core.config import settings
+from ..core.mongo_monitor import ProfileCollector
+from .cloudinary_service import CloudinaryService
+from .user_service import UserService
+from .user_loader import UserLoader
+from .session_service import SessionService
+from .shipment_service import ShipmentService
+from .payment_service import PaymentService
+from .sync_service import SyncService
+from .assignment_service import AssignmentService
+from .tracking_service import TrackingService
+from .notification_service import notification_service
+from .realtime import manager
+
+class ServiceContainer:
+    """Application-lifetime services, built once at startup and shared by all requests."""
+    database: AsyncIOMotorDatabase = None
+    cloudinary_service: CloudinaryService = None
+    user_service: UserService = None
+    session_service: SessionService = None
+    shipment_service: ShipmentService = None
+    payment_service: PaymentService = None
+    sync_service: SyncService = None
+    assignment_service: AssignmentService = None
+    tracking_service: TrackingService = None
+    background_tasks: List[asyncio.Task] = None
+
+    def init(self, database: AsyncIOMotorDatabase):
+        self.database = database
+        # Configures the global cloudinary client once instead of per request
+        self.cloudinary_service = CloudinaryService(
+            cloud_name=settings.cloudinary_cloud_name,
+            api_key=settings.cloudinary_api_key,
+            api_secret=settings.cloudinary_api_secret
+        )
+        self.user_service = UserService(database)
+        self.session_service = SessionService(database, timedelta(days=settings.refresh_token_expire_days))
+        self.shipment_service = ShipmentService(
+            database,
+            user_service=self.user_service,
+            cloudinary_service=self.cloudinary_service
+        )
+        self.payment_service = PaymentService(database, shipment_service=self.shipment_service)
+        self.sync_service = SyncService(database)
+        self.assignment_service = AssignmentService(database, self.shipment_service)
+        self.tracking_service = TrackingService(database, self.shipment_service)
+        self.shipment_service.on_delivered = self.tracking_service.finish_delivery
+        notification_service.use_database(database)
+        self.background_tasks = []
+
+    async def start(self):
+        """Starts the services' background tasks."""
+        change_stream = settings.shipment_cache_invalidation_channel == "change_stream"
+        # An unseeded feed is never read from, so reads fall through to MongoDB
+        if change_stream or settings.api_workers == 1:
+            await self.shipment_service.feed.seed(self.shipment_service.collection)
+        self.background_tasks.append(asyncio.create_task(manager.run_heartbeats(
+            settings.websocket_heartbeat_seconds, settings.websocket_idle_timeout_seconds
+        )))
+        if change_stream:
+            self.background_tasks.append(
+                asyncio.create_task(self.shipment_service.watch_changes())
+            )
+        elif settings.api_workers == 1 and settings.available_feed_resync_seconds:
+            self.background_tasks.append(asyncio.create_task(
+                self.shipment_service.resync_feed(settings.available_feed_resync_seconds)
+            ))
+        if settings.mongodb_profile_slow_ms is not None:
+            self.background_tasks.append(asyncio.create_task(
+                ProfileCollector(self.database).run(settings.mongodb_profile_poll_seconds)
+            ))
+
+    async def stop(self):
+        for task in self.background_tasks:
+            task.cancel()
+        await asyncio.gather(*self.background_tasks, return_exceptions=True)
+        self.background_tasks = []
+
+container = ServiceContainer()
+
+async def get_user_service() -> UserService:
+    return container.user_service
+
+async def get_session_service() -> SessionService:
+    return container.session_service
+
+async def get_user_loader() -> UserLoader:
+    # A fresh loader per request, so memoized users never outlive the request
+    return UserLoader(container.user_service)
+
+async def get_shipment_service() -> ShipmentService:
+    return container.shipment_service
+
+async def get_payment_service() -> PaymentService:
+    return container.payment_service
+
+async def get_sync_service() -> SyncService:
+    return container.sync_service
+
+async def get_assignment_service() -> AssignmentService:
+    return container.assignment_service
+
+async def get_tracking_service() -> TrackingService:
+    return container.tracking_service
+
@@ -1,27 +1,62 @@
-import json
 from typing import Dict, List, Optional
 from datetime import datetime
-from ..api.websocket import manager
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from ..core.metrics import registry
+from ..core.mongo_monitor import instrument_service
+from .realtime import manager
 
+notifications_sent = registry.counter(
+    "notifications_total", "Notification recipients by whether they had a socket open", ("outcome",)
+)
+
+@instrument_service
 class NotificationService:
     def __init__(self):
         self.user_connections: Dict[str, List] = {}
+        # Set by the service container once the database is connected
+        self.collection: Optional[AsyncIOMotorCollection] = None
+
+    def use_database(self, database: AsyncIOMotorDatabase):
+        self.collection = database.notifications
+
+    async def store_notifications(self, user_ids: List[str], notification: Dict, created_at: datetime):
+        """Persist a notification for each recipient so offline clients get it on their next sync"""
+        if self.collection is None or not user_ids:
+            return
+        await self.collection.insert_many([
+            {
+                "user_id": ObjectId(user_id),
+                "data": notification,
+                "read": False,
+                "created_at": created_at
+            }
+            for user_id in user_ids
+        ], ordered=False)
     
     async def send_notification(self, user_id: str, notification: Dict):
         """Send notification to a specific user"""
+        await self.send_to_users([user_id], notification)
+
+    async def send_to_users(self, user_ids: List[str], notification: Dict):
+        """Send the same notification to many users, storing it with a single write"""
+        now = datetime.utcnow()
         notification_data = {
             "type": "notification",
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": now.isoformat(),
             "data": notification
         }
         
-        # In a real implementation, you would:
-        # 1. Store the notification in the database
-        # 2. Send via WebSocket if user is online
-        # 3. Send push notification if user is offline
+        # In a real implementation, you would also send a push notification
+        # to users who are offline
+        await self.store_notifications(user_ids, notification, now)
         
-        # For now, we'll just broadcast via WebSocket
-        await manager.broadcast(json.dumps(notification_data))
+        # Only the recipients' own sockets get it, batched with whatever else
+        # they are sent in the same window; offline users catch up on sync
+        manager.queue(user_ids, notification_data)
+        offline = sum(1 for user_id in user_ids if str(user_id) not in manager.user_sockets)
+        notifications_sent.inc("online", amount=len(user_ids) - offline)
+        notifications_sent.inc("offline", amount=offline)
     
     async def notify_new_bid(self, customer_id: str, bid_data: Dict):
         """Notify customer about a new bid"""
@@ -90,8 +125,17 @@ class NotificationService:
         }
         
         # Send to all eligible drivers
-        for driver_id in drivers:
-            await self.send_notification(driver_id, notification)
+        await self.send_to_users(drivers, notification)
+
+    async def notify_bulk_delivery_request(self, drivers: List[str], shipments_data: List[Dict]):
+        """Notify drivers once about a whole batch of new shipments"""
+        notification = {
+            "title": "New Shipments Available",
+            "message": f"{len(shipments_data)} new shipments are available for bidding",
+            "type": "new_shipments",
+            "shipment_ids": [shipment_data["id"] for shipment_data in shipments_data]
+        }
+        await self.send_to_users(drivers, notification)
 
 # Global notification service instance
 notification_service = NotificationService()
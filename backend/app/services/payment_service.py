@@ -5,13 +5,33 @@ from datetime import datetime
 from ..models.shipment import ShipmentInDB
 from ..models.user import UserInDB
 from .shipment_service import ShipmentService
+from ..core.mongo_monitor import instrument_service
 
+class PaymentGateway:
+    """Calls to the payment gateways; needs no database, so workers can use it alone."""
+
+    async def query_status(self, transaction: Dict) -> str:
+        """Asks the payment gateway for the current status of a transaction."""
+        payment_method = transaction.get("payment_method")
+
+        if payment_method == "telebirr":
+            # In a real scenario, this would call Telebirr's transaction query API
+            # with the transaction ID and map their status to ours.
+            return "success" # For simulation, assume the payment went through
+        elif payment_method == "cbe_birr":
+            # In a real scenario, this would call CBE Birr's transaction query API
+            return "success" # For simulation, assume the payment went through
+        else:
+            raise ValueError("Unsupported payment method")
+
+@instrument_service
 class PaymentService:
-    def __init__(self, database: AsyncIOMotorDatabase):
+    def __init__(self, database: AsyncIOMotorDatabase, shipment_service: Optional[ShipmentService] = None):
         self.database = database
         self.shipment_collection = database.shipments
         self.payment_transactions_collection = database.payment_transactions
-        self.shipment_service = ShipmentService(database)
+        self.shipment_service = shipment_service or ShipmentService(database)
+        self.gateway = PaymentGateway()
 
     async def initiate_payment(
         self, 
@@ -104,6 +124,10 @@ class PaymentService:
 
         return {"message": "Callback processed successfully"}
 
+    async def query_gateway_status(self, transaction: Dict) -> str:
+        """Asks the payment gateway for the current status of a transaction."""
+        return await self.gateway.query_status(transaction)
+
     async def get_payment_status(self, transaction_id: str) -> Optional[Dict]:
         """Retrieves the status of a payment transaction."""
         transaction = await self.payment_transactions_collection.find_one({"_id": ObjectId(transaction_id)})
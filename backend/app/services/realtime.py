@@ -0,0 +1,403 @@
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
+import msgpack
+from fastapi import WebSocket, status
+from ..core.cache import TTLCache
+from ..core.config import settings
+from ..core.metrics import registry
+from ..core.responses import dumps
+
+# Clients offering this subprotocol get MessagePack binary frames instead of JSON text
+MSGPACK_SUBPROTOCOL = "msgpack"
+
+# Sent to every socket each heartbeat; clients answer with {"type": "pong"}
+PING = {"type": "ping"}
+
+Frame = Union[str, bytes]
+# Sends messages to a socket as one frame, returning False once the socket is gone
+Sender = Callable[[WebSocket, List[dict]], Awaitable[bool]]
+
+def encode_message(message: dict, binary: bool) -> Frame:
+    if binary:
+        return msgpack.packb(message, default=str)
+    return dumps(message).decode()
+
+def _msgpack_array_header(length: int) -> bytes:
+    if length < 16:
+        return bytes((0x90 | length,))
+    if length < 1 << 16:
+        return b"\xdc" + length.to_bytes(2, "big")
+    return b"\xdd" + length.to_bytes(4, "big")
+
+def encode_frame(encoded: List[Frame], binary: bool) -> Frame:
+    """One frame for already encoded messages: the message itself, or an array of them"""
+    if len(encoded) == 1:
+        return encoded[0]
+    if binary:
+        return _msgpack_array_header(len(encoded)) + b"".join(encoded)
+    return "[" + ",".join(encoded) + "]"
+
+PING_FRAMES = {binary: encode_message(PING, binary) for binary in (False, True)}
+
+class Connection:
+    """An authenticated socket, its encoding and when its client was last heard from."""
+    __slots__ = ("websocket", "user_id", "binary", "connected_at", "last_seen", "outbox")
+
+    def __init__(self, websocket: WebSocket, user_id: str, binary: bool = False):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.binary = binary
+        self.connected_at = self.last_seen = time.monotonic()
+        # Messages waiting for the next flush; None while there are none
+        self.outbox: Optional[List[dict]] = None
+
+class ConnectionManager:
+    """Open sockets per user, kept honest by heartbeats.
+
+    Clients can vanish without a close frame (a phone losing signal), so
+    every socket is pinged on a fixed interval and any socket that has not
+    sent anything for longer than the idle timeout is closed and dropped.
+    One reaper task serves all connections.
+
+    Queued messages are not sent one frame each: everything queued for a
+    socket within `batch_window` seconds goes out as a single frame, an
+    array when there is more than one message. Each message is encoded
+    once per encoding however many sockets it goes to.
+    """
+
+    def __init__(self, max_connections: int, max_per_user: int, send_timeout: float, batch_window: float = 0.0):
+        self.max_connections = max_connections
+        self.max_per_user = max_per_user
+        self.send_timeout = send_timeout
+        self.batch_window = batch_window
+        self.connections: Dict[WebSocket, Connection] = {}
+        self.user_sockets: Dict[str, Dict[WebSocket, None]] = {}
+        self.dirty: List[Connection] = []
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.flush_task: Optional[asyncio.Task] = None
+        self.reaped = 0
+        self.rejected = 0
+        self.frames_sent = 0
+        self.messages_sent = 0
+        # Queued or sent messages lost with a socket that failed or closed
+        self.messages_dropped = 0
+
+    @property
+    def active_connections(self):
+        return list(self.connections)
+
+    async def connect(self, websocket: WebSocket, user_id: str) -> bool:
+        """Accepts the socket unless the server is full; a user over their cap loses their oldest socket."""
+        if len(self.connections) >= self.max_connections:
+            self.rejected += 1
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            return False
+        sockets = self.user_sockets.setdefault(user_id, {})
+        while len(sockets) >= self.max_per_user:
+            # The oldest is the likeliest to be a dead connection the client already replaced
+            await self.close(next(iter(sockets)), code=status.WS_1008_POLICY_VIOLATION)
+        binary = MSGPACK_SUBPROTOCOL in websocket.scope.get("subprotocols", ())
+        await websocket.accept(subprotocol=MSGPACK_SUBPROTOCOL if binary else None)
+        self.connections[websocket] = Connection(websocket, user_id, binary)
+        self.user_sockets.setdefault(user_id, {})[websocket] = None
+        return True
+
+    def disconnect(self, websocket: WebSocket):
+        connection = self.connections.pop(websocket, None)
+        if connection is None:
+            return
+        if connection.outbox:
+            self.messages_dropped += len(connection.outbox)
+        connection.outbox = None
+        sockets = self.user_sockets.get(connection.user_id)
+        if sockets is not None:
+            sockets.pop(websocket, None)
+            if not sockets:
+                del self.user_sockets[connection.user_id]
+
+    def touch(self, websocket: WebSocket):
+        connection = self.connections.get(websocket)
+        if connection is not None:
+            connection.last_seen = time.monotonic()
+
+    async def close(self, websocket: WebSocket, code: int = status.WS_1000_NORMAL_CLOSURE):
+        self.disconnect(websocket)
+        try:
+            await asyncio.wait_for(websocket.close(code=code), self.send_timeout)
+        except Exception:
+            pass
+
+    async def _send_frame(self, connection: Connection, frame: Frame):
+        if connection.binary:
+            await connection.websocket.send_bytes(frame)
+        else:
+            await connection.websocket.send_text(frame)
+        self.frames_sent += 1
+
+    async def _deliver(self, frames: List[Tuple[Connection, Frame]], chunk_size: int = 1000) -> List[Connection]:
+        """Sends each connection its frame, a chunk at a time under one deadline.
+
+        Sockets whose send failed or timed out are closed and returned.
+        """
+        closed = []
+        for start in range(0, len(frames), chunk_size):
+            # One task per send and one deadline per chunk, rather than a wait_for per send
+            chunk = {
+                asyncio.ensure_future(self._send_frame(connection, frame)): connection
+                for connection, frame in frames[start:start + chunk_size]
+            }
+            done, pending = await asyncio.wait(chunk, timeout=self.send_timeout)
+            for task in pending:
+                task.cancel()
+            failed = [chunk[task] for task in done if task.exception() is not None]
+            for connection in failed + [chunk[task] for task in pending]:
+                await self.close(connection.websocket, code=status.WS_1011_INTERNAL_ERROR)
+                closed.append(connection)
+        return closed
+
+    async def send_now(self, websocket: WebSocket, messages: List[dict]) -> bool:
+        """Sends the messages straight away as one frame; False if the socket is gone or the send failed."""
+        connection = self.connections.get(websocket)
+        if connection is None or not messages:
+            return False
+        frame = encode_frame([encode_message(message, connection.binary) for message in messages], connection.binary)
+        try:
+            await asyncio.wait_for(self._send_frame(connection, frame), self.send_timeout)
+        except Exception:
+            self.messages_dropped += len(messages)
+            await self.close(websocket, code=status.WS_1011_INTERNAL_ERROR)
+            return False
+        self.messages_sent += len(messages)
+        return True
+
+    async def send_message(self, websocket: WebSocket, message: dict) -> bool:
+        return await self.send_now(websocket, [message])
+
+    async def send_personal_message(self, message: str, websocket: WebSocket):
+        await websocket.send_text(message)
+
+    def queue(self, user_ids: List[str], message: dict) -> int:
+        """Queues the message for each of the users' open sockets; returns how many it will go to."""
+        queued = 0
+        for user_id in user_ids:
+            for websocket in self.user_sockets.get(str(user_id), ()):
+                connection = self.connections[websocket]
+                if connection.outbox is None:
+                    connection.outbox = []
+                    self.dirty.append(connection)
+                connection.outbox.append(message)
+                queued += 1
+        if queued and self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(self.batch_window, self._start_flush)
+        return queued
+
+    def _start_flush(self):
+        self.flush_handle = None
+        self.flush_task = asyncio.ensure_future(self.flush())
+
+    async def flush(self) -> int:
+        """Sends everything queued, one frame per socket; returns the frames delivered."""
+        dirty, self.dirty = self.dirty, []
+        # id(message) -> (message, encoded) per encoding; the message is kept so its id can't be reused
+        encoded: Dict[bool, Dict[int, Tuple[dict, Frame]]] = {False: {}, True: {}}
+        frames = []
+        counts: Dict[Connection, int] = {}
+        for connection in dirty:
+            messages, connection.outbox = connection.outbox, None
+            if not messages:
+                continue
+            cache = encoded[connection.binary]
+            parts = []
+            for message in messages:
+                cached = cache.get(id(message))
+                if cached is None:
+                    cached = cache[id(message)] = (message, encode_message(message, connection.binary))
+                parts.append(cached[1])
+            frames.append((connection, encode_frame(parts, connection.binary)))
+            counts[connection] = len(messages)
+        failed = await self._deliver(frames)
+        dropped = sum(counts[connection] for connection in failed)
+        self.messages_sent += sum(counts.values()) - dropped
+        self.messages_dropped += dropped
+        return len(frames) - len(failed)
+
+    async def send_to_user(self, user_id: str, message: dict) -> int:
+        """Queues the message for each of the user's open sockets; returns how many it will go to."""
+        return self.queue([user_id], message)
+
+    async def broadcast(self, message: dict):
+        self.queue(list(self.user_sockets), message)
+
+    async def heartbeat(self, idle_timeout: float) -> int:
+        """Closes sockets silent for longer than `idle_timeout` and pings the rest; returns how many were closed."""
+        now = time.monotonic()
+        idle = [
+            connection.websocket for connection in self.connections.values()
+            if now - connection.last_seen > idle_timeout
+        ]
+        for websocket in idle:
+            await self.close(websocket, code=status.WS_1001_GOING_AWAY)
+        self.reaped += len(idle)
+
+        await self._deliver([
+            (connection, PING_FRAMES[connection.binary]) for connection in self.connections.values()
+        ])
+        return len(idle)
+
+    async def run_heartbeats(self, interval: float, idle_timeout: float):
+        while True:
+            await asyncio.sleep(interval)
+            await self.heartbeat(idle_timeout)
+
+
+manager = ConnectionManager(
+    max_connections=settings.websocket_max_connections,
+    max_per_user=settings.websocket_max_connections_per_user,
+    send_timeout=settings.websocket_send_timeout_seconds,
+    batch_window=settings.websocket_batch_window_ms / 1000
+)
+
+class Subscriber:
+    """One socket's topic subscriptions, delivered latest-value-wins at a capped rate.
+
+    Publishing only overwrites the pending message for the topic; a single
+    sender task drains whatever is pending at most `max_rate` times per
+    second. A slow client therefore only ever gets the freshest value per
+    topic, never a backlog. Everything pending goes out as one frame.
+    """
+
+    def __init__(self, websocket: WebSocket, max_rate: float, send: Sender):
+        self.websocket = websocket
+        self.min_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.send = send
+        self.topics: Set[str] = set()
+        self.pending: Dict[str, dict] = {}
+        self.wakeup = asyncio.Event()
+        self.sent = 0
+        self.coalesced = 0
+        self.task = asyncio.create_task(self._send_loop())
+
+    def offer(self, topic: str, message: dict):
+        if topic in self.pending:
+            self.coalesced += 1
+        self.pending[topic] = message
+        self.wakeup.set()
+
+    async def _send_loop(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            started = time.monotonic()
+            pending, self.pending = self.pending, {}
+            if not await self.send(self.websocket, list(pending.values())):
+                # The receive loop notices the dead socket and cleans up
+                return
+            self.sent += len(pending)
+            # Anything published meanwhile waits for the next slot
+            await asyncio.sleep(max(0.0, self.min_interval - (time.monotonic() - started)))
+
+    def close(self):
+        self.task.cancel()
+
+class TopicBroker:
+    """In-process pub/sub of messages to WebSocket subscribers, e.g. `shipment:<id>`."""
+
+    def __init__(self, max_rate: float, send: Sender):
+        self.max_rate = max_rate
+        self.send = send
+        self.subscribers: Dict[WebSocket, Subscriber] = {}
+        self.topics: Dict[str, Set[Subscriber]] = {}
+        # Latest message per topic, sent to new subscribers straight away.
+        # Bounded because not every topic is forgotten (shipments delivered on
+        # another worker, or abandoned); after the TTL a position isn't live
+        self.last_values = TTLCache(maxsize=100000, ttl=3600)
+
+    def subscribe(self, websocket: WebSocket, topic: str):
+        subscriber = self.subscribers.get(websocket)
+        if subscriber is None:
+            subscriber = self.subscribers[websocket] = Subscriber(websocket, self.max_rate, self.send)
+        subscriber.topics.add(topic)
+        self.topics.setdefault(topic, set()).add(subscriber)
+        message = self.last_values.get(topic)
+        if message is not None:
+            subscriber.offer(topic, message)
+
+    def unsubscribe(self, websocket: WebSocket, topic: str):
+        subscriber = self.subscribers.get(websocket)
+        if subscriber is None:
+            return
+        subscriber.topics.discard(topic)
+        subscriber.pending.pop(topic, None)
+        self._drop(topic, subscriber)
+
+    def unsubscribe_all(self, websocket: WebSocket):
+        subscriber = self.subscribers.pop(websocket, None)
+        if subscriber is None:
+            return
+        subscriber.close()
+        for topic in subscriber.topics:
+            self._drop(topic, subscriber)
+
+    def _drop(self, topic: str, subscriber: Subscriber):
+        subscribers = self.topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.topics[topic]
+
+    def publish(self, topic: str, message: dict) -> int:
+        """Queues the message for every subscriber of the topic; never blocks on a socket."""
+        self.last_values.set(topic, message)
+        subscribers = self.topics.get(topic, ())
+        for subscriber in subscribers:
+            subscriber.offer(topic, message)
+        return len(subscribers)
+
+    def last_value(self, topic: str) -> Optional[dict]:
+        message = self.last_values.get(topic)
+        return dict(message) if message is not None else None
+
+    def forget(self, topic: str):
+        """Drops a topic's last value, e.g. once a delivery is finished."""
+        self.last_values.invalidate(topic)
+
+
+broker = TopicBroker(max_rate=settings.tracking_max_updates_per_second, send=manager.send_now)
+
+for name, documentation, kind, collect in (
+    ("websocket_connections", "Open WebSocket connections", "gauge", lambda: len(manager.connections)),
+    ("websocket_users", "Users with at least one open WebSocket", "gauge", lambda: len(manager.user_sockets)),
+    ("websocket_subscribers", "WebSockets subscribed to at least one topic", "gauge", lambda: len(broker.subscribers)),
+    ("websocket_frames_sent_total", "WebSocket frames sent, pings included", "counter", lambda: manager.frames_sent),
+    ("websocket_messages_sent_total", "Messages delivered over WebSockets", "counter", lambda: manager.messages_sent),
+    ("websocket_messages_dropped_total", "Messages lost with a failed or closed WebSocket", "counter",
+     lambda: manager.messages_dropped),
+    ("websocket_connections_rejected_total", "WebSockets refused because the server was full", "counter",
+     lambda: manager.rejected),
+    ("websocket_connections_reaped_total", "WebSockets closed for missing heartbeats", "counter",
+     lambda: manager.reaped),
+):
+    registry.callback(name, documentation, kind, collect)
+
+def parse_command(data: str) -> Optional[dict]:
+    """Reads `{"action": "subscribe", "topic": ...}` or the plain-text form `subscribe <topic>`.
+
+    Heartbeat replies (`{"type": "pong"}` or `pong`) come back as `{"action": "pong"}`.
+    """
+    if data == "pong":
+        return {"action": "pong"}
+    try:
+        command = json.loads(data)
+    except ValueError:
+        parts = data.split()
+        if len(parts) == 2 and parts[0] in ("subscribe", "unsubscribe"):
+            return {"action": parts[0], "topic": parts[1]}
+        return None
+    if isinstance(command, dict) and command.get("type") == "pong":
+        return {"action": "pong"}
+    if isinstance(command, dict) and command.get("action") in ("subscribe", "unsubscribe") \
+            and isinstance(command.get("topic"), str):
+        return command
+    return None
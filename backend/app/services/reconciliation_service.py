@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from datetime import datetime, timedelta
+from ..core.config import settings
+from .payment_service import PaymentGateway
+from ..core.mongo_monitor import instrument_service
+
+logger = logging.getLogger(__name__)
+
+# Gateway statuses that settle a transaction
+FINAL_STATUSES = {"success", "failed", "cancelled", "expired"}
+
+@instrument_service
+class ReconciliationService:
+    def __init__(
+        self,
+        database: AsyncIOMotorDatabase,
+        gateway: Optional[PaymentGateway] = None,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        stale_minutes: Optional[int] = None
+    ):
+        self.database = database
+        self.payment_transactions_collection = database.payment_transactions
+        self.shipment_collection = database.shipments
+        # Only the gateway is needed; a full PaymentService would also build the
+        # shipment service and its Cloudinary client
+        self.gateway = gateway or PaymentGateway()
+        self.batch_size = settings.payment_reconciliation_batch_size if batch_size is None else batch_size
+        self.concurrency = settings.payment_reconciliation_concurrency if concurrency is None else concurrency
+        self.stale_minutes = settings.payment_reconciliation_stale_minutes if stale_minutes is None else stale_minutes
+        if self.batch_size < 1 or self.concurrency < 1:
+            raise ValueError("batch_size and concurrency must be at least 1")
+
+    async def reconcile_pending(self, limit: Optional[int] = None) -> Dict:
+        """Reconciles stale pending transactions against the gateways and returns a report."""
+        started = time.perf_counter()
+        cutoff = datetime.utcnow() - timedelta(minutes=self.stale_minutes)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        report = {
+            "started_at": datetime.utcnow().isoformat(),
+            "cutoff": cutoff.isoformat(),
+            "scanned": 0,
+            "batches": 0,
+            "settled": {},
+            "still_pending": 0,
+            "gateway_errors": 0,
+            "transactions_modified": 0,
+            "shipments_modified": 0,
+            "write_errors": 0,
+        }
+
+        cursor = self.payment_transactions_collection.find(
+            {"status": "pending", "updated_at": {"$lt": cutoff}},
+            {"_id": 1, "shipment_id": 1, "payment_method": 1, "amount": 1}
+        ).sort("updated_at", 1).batch_size(self.batch_size)
+        if limit:
+            cursor = cursor.limit(limit)
+
+        batch = []
+        async for transaction in cursor:
+            batch.append(transaction)
+            if len(batch) >= self.batch_size:
+                await self._reconcile_batch(batch, semaphore, report)
+                batch = []
+        if batch:
+            await self._reconcile_batch(batch, semaphore, report)
+
+        elapsed = time.perf_counter() - started
+        report["finished_at"] = datetime.utcnow().isoformat()
+        report["elapsed_seconds"] = round(elapsed, 3)
+        report["transactions_per_second"] = round(report["scanned"] / elapsed, 1) if elapsed else 0.0
+        return report
+
+    async def _query_status(self, transaction: Dict, semaphore: asyncio.Semaphore) -> Optional[str]:
+        async with semaphore:
+            try:
+                return await self.gateway.query_status(transaction)
+            except Exception as e:
+                logger.warning("Gateway status query failed for transaction %s: %s", transaction["_id"], e)
+                return None
+
+    async def _reconcile_batch(self, batch: List[Dict], semaphore: asyncio.Semaphore, report: Dict):
+        statuses = await asyncio.gather(
+            *(self._query_status(transaction, semaphore) for transaction in batch)
+        )
+        now = datetime.utcnow()
+        transaction_ops = []
+        shipment_ops = []
+
+        for transaction, new_status in zip(batch, statuses):
+            if new_status is None:
+                report["gateway_errors"] += 1
+                continue
+
+            if new_status not in FINAL_STATUSES:
+                report["still_pending"] += 1
+                # Leave updated_at alone so the transaction stays stale for the next run
+                transaction_ops.append(UpdateOne(
+                    {"_id": transaction["_id"], "status": "pending"},
+                    {"$set": {"last_reconciled_at": now}, "$inc": {"reconcile_attempts": 1}}
+                ))
+                continue
+
+            report["settled"][new_status] = report["settled"].get(new_status, 0) + 1
+            # Guard on status so a callback that arrived meanwhile wins
+            transaction_ops.append(UpdateOne(
+                {"_id": transaction["_id"], "status": "pending"},
+                {
+                    "$set": {"status": new_status, "updated_at": now, "last_reconciled_at": now},
+                    "$inc": {"reconcile_attempts": 1}
+                }
+            ))
+            if new_status == "success":
+                shipment_ops.append(UpdateOne(
+                    {"_id": transaction["shipment_id"], "status": "accepted"},
+                    {"$set": {
+                        "status": "paid",
+                        "payment_transaction_id": transaction["_id"],
+                        "updated_at": now
+                    }}
+                ))
+
+        report["scanned"] += len(batch)
+        report["batches"] += 1
+        report["transactions_modified"] += await self._bulk_write(
+            self.payment_transactions_collection, transaction_ops, report
+        )
+        report["shipments_modified"] += await self._bulk_write(
+            self.shipment_collection, shipment_ops, report
+        )
+
+    async def _bulk_write(self, collection, operations: List[UpdateOne], report: Dict) -> int:
+        if not operations:
+            return 0
+        try:
+            result = await collection.bulk_write(operations, ordered=False)
+            return result.modified_count
+        except BulkWriteError as e:
+            report["write_errors"] += len(e.details.get("writeErrors", []))
+            return e.details.get("nModified", 0)
@@ -0,0 +1,92 @@
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from ..core.mongo_monitor import instrument_service
+from ..models.user import UserInDB
+
+# Rotated-away token hashes kept per session to recognize replays; a token
+# older than this many rotations is just rejected without ending the session
+REPLAY_HISTORY = 10
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+@instrument_service
+class SessionService:
+    """Refresh-token sessions, one per signed-in device.
+
+    Only a SHA-256 of each refresh token is stored. The tokens are 256
+    random bits, so a fast hash is enough, and a refresh is one indexed
+    update with no bcrypt. Every refresh rotates the token; presenting one
+    that was already rotated away (one of the last `REPLAY_HISTORY`) means
+    it was copied, so that session is revoked. Expired sessions are
+    removed by the TTL index on `expires_at`.
+    """
+
+    def __init__(self, database: AsyncIOMotorDatabase, lifetime: timedelta):
+        self.collection = database.sessions
+        self.lifetime = lifetime
+
+    async def create_session(self, user: UserInDB, device: Optional[str]) -> Tuple[str, dict]:
+        """Starts a session for the user; returns the refresh token and the stored session"""
+        token = secrets.token_urlsafe(32)
+        now = datetime.utcnow()
+        session = {
+            "user_id": ObjectId(user.id),
+            # Access tokens identify users by phone; kept here so a refresh needs no user lookup
+            "phone": user.phone,
+            "device": device,
+            "token_hash": hash_token(token),
+            "created_at": now,
+            "last_used_at": now,
+            "expires_at": now + self.lifetime,
+        }
+        result = await self.collection.insert_one(session)
+        session["_id"] = result.inserted_id
+        return token, session
+
+    async def rotate(self, token: str) -> Optional[Tuple[str, dict]]:
+        """Swaps a live refresh token for a new one; None if it's unknown, expired or already used"""
+        token_hash = hash_token(token)
+        new_token = secrets.token_urlsafe(32)
+        now = datetime.utcnow()
+        session = await self.collection.find_one_and_update(
+            {"token_hash": token_hash, "expires_at": {"$gt": now}},
+            {
+                "$set": {
+                    "token_hash": hash_token(new_token),
+                    "last_used_at": now,
+                    "expires_at": now + self.lifetime,
+                },
+                "$push": {"previous_hashes": {"$each": [token_hash], "$slice": -REPLAY_HISTORY}},
+            },
+            return_document=ReturnDocument.AFTER
+        )
+        if session is None:
+            # A rotated-away token is being replayed; whoever holds it, end the session
+            await self.collection.delete_one({"previous_hashes": token_hash})
+            return None
+        return new_token, session
+
+    async def list_sessions(self, user_id: str) -> List[dict]:
+        """The user's live sessions, most recently used first"""
+        return await self.collection.find(
+            {"user_id": ObjectId(user_id), "expires_at": {"$gt": datetime.utcnow()}},
+            {"device": 1, "created_at": 1, "last_used_at": 1, "expires_at": 1}
+        ).sort("last_used_at", -1).to_list(None)
+
+    async def revoke(self, user_id: str, session_id: str) -> bool:
+        result = await self.collection.delete_one({"_id": ObjectId(session_id), "user_id": ObjectId(user_id)})
+        return result.deleted_count > 0
+
+    async def revoke_token(self, token: str) -> bool:
+        result = await self.collection.delete_one({"token_hash": hash_token(token)})
+        return result.deleted_count > 0
+
+    async def revoke_all(self, user_id: str) -> int:
+        result = await self.collection.delete_many({"user_id": ObjectId(user_id)})
+        return result.deleted_count
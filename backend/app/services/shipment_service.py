@@ -1,40 +1,182 @@
-from typing import Optional, List
+import asyncio
+import math
+from typing import Awaitable, Callable, Optional, List, Tuple
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
-from datetime import datetime
+from pymongo.errors import BulkWriteError
+from datetime import datetime, timedelta
 from ..models.shipment import ShipmentInDB, ShipmentCreate, ShipmentUpdate, Bid, BidCreate, BidResponse
 from ..services.notification_service import notification_service
 from .user_service import UserService
 from ..services.cloudinary_service import CloudinaryService
 from ..core.config import settings
+from ..core.cache import TTLCache
+from ..core.geo import as_coordinates, rank_by_distance, route_estimates
+from .available_feed import AvailableShipmentFeed, is_available, vehicle_types_of
+from .sync_service import decode_sync_token, encode_sync_token
+from ..core.mongo_monitor import instrument_service
 
+@instrument_service
 class ShipmentService:
-    def __init__(self, database: AsyncIOMotorDatabase):
+    def __init__(
+        self,
+        database: AsyncIOMotorDatabase,
+        user_service: Optional[UserService] = None,
+        cloudinary_service: Optional[CloudinaryService] = None
+    ):
         self.database = database
         self.collection = database.shipments
         self.bids_collection = database.bids
-        self.user_service = UserService(database)
-        self.cloudinary_service = CloudinaryService(
-            cloud_name=settings.CLOUDINARY_CLOUD_NAME,
-            api_key=settings.CLOUDINARY_API_KEY,
-            api_secret=settings.CLOUDINARY_API_SECRET
+        self.user_service = user_service or UserService(database)
+        self.cloudinary_service = cloudinary_service or CloudinaryService(
+            cloud_name=settings.cloudinary_cloud_name,
+            api_key=settings.cloudinary_api_key,
+            api_secret=settings.cloudinary_api_secret
         )
+        # Read-through cache of shipments by id; every write below invalidates
+        self.cache = TTLCache(
+            maxsize=settings.shipment_cache_size,
+            ttl=settings.shipment_cache_ttl_seconds
+        )
+        # Bidding shipments by vehicle type, kept current by the writes below
+        self.feed = AvailableShipmentFeed()
+        # Called with the shipment id after a delivery completes (set by the container)
+        self.on_delivered: Optional[Callable[[str], Awaitable]] = None
+
+    @staticmethod
+    def _coordinates(location) -> Optional[List[float]]:
+        if isinstance(location, dict):
+            return location.get("coordinates")
+        return getattr(location, "coordinates", None)
+
+    def _estimate_routes(self, shipments_data: List[dict]):
+        """Sets estimated_distance/estimated_duration_minutes on each document, in one vectorized pass.
+
+        Both are None unless the document has pickup and dropoff coordinates.
+        """
+        if not shipments_data:
+            return
+        distances, minutes = route_estimates(
+            as_coordinates([self._coordinates(data.get("pickup_location")) for data in shipments_data]),
+            as_coordinates([self._coordinates(data.get("dropoff_location")) for data in shipments_data]),
+            detour_factor=settings.route_detour_factor,
+            speed_kmh=settings.average_speed_kmh
+        )
+        for data, distance, duration in zip(shipments_data, distances.tolist(), minutes.tolist()):
+            known = not math.isnan(distance)
+            data["estimated_distance"] = round(distance, 2) if known else None
+            data["estimated_duration_minutes"] = round(duration, 1) if known else None
+
     async def create_shipment(self, shipment_data: dict, customer_id: str) -> ShipmentInDB:
         shipment_data["customer_id"] = ObjectId(customer_id)
         shipment_data["created_at"] = datetime.utcnow()
         shipment_data["updated_at"] = datetime.utcnow()
+        self._estimate_routes([shipment_data])
         
         result = await self.collection.insert_one(shipment_data)
         shipment_data["_id"] = result.inserted_id
         return ShipmentInDB(**shipment_data)
 
+    async def create_shipments(
+        self,
+        shipments_data: List[dict],
+        customer_id: str,
+        publish: bool = False
+    ) -> List[Optional[ShipmentInDB]]:
+        """Inserts a batch of shipments with one unordered insert_many.
+
+        Returns the created shipments in input order, with None for documents
+        the database rejected; one failure doesn't stop the rest of the batch.
+        """
+        now = datetime.utcnow()
+        for shipment_data in shipments_data:
+            shipment_data["customer_id"] = ObjectId(customer_id)
+            shipment_data["status"] = "bidding" if publish else "draft"
+            shipment_data["created_at"] = now
+            shipment_data["updated_at"] = now
+        self._estimate_routes(shipments_data)
+
+        failed = set()
+        try:
+            # insert_many assigns each document's _id in place
+            await self.collection.insert_many(shipments_data, ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+
+        shipments = []
+        for index, shipment_data in enumerate(shipments_data):
+            if index in failed:
+                shipments.append(None)
+                continue
+            shipment = ShipmentInDB.from_mongo(shipment_data)
+            if publish:
+                self.feed.apply(shipment.id, shipment)
+            shipments.append(shipment)
+        return shipments
+
     async def get_shipment_by_id(self, shipment_id: str) -> Optional[ShipmentInDB]:
+        # Concurrent misses for the same id share one find_one
+        return await self.cache.get_or_load(
+            str(shipment_id), lambda: self._fetch_shipment(shipment_id)
+        )
+
+    async def _fetch_shipment(self, shipment_id: str) -> Optional[ShipmentInDB]:
         shipment_data = await self.collection.find_one({"_id": ObjectId(shipment_id)})
         if shipment_data:
-            return ShipmentInDB(**shipment_data)
+            return ShipmentInDB.from_mongo(shipment_data)
         return None
 
+    def invalidate_shipment(self, shipment_id: str):
+        """Drops a shipment from the cache after it was written."""
+        self.cache.invalidate(str(shipment_id))
+
+    async def watch_changes(self):
+        """Applies shipment writes made by other workers, via a MongoDB change stream.
+
+        Invalidates the cache and updates the available feed. Change streams need
+        a replica set; without one, the cache TTL and periodic feed resyncs bound
+        staleness instead.
+        """
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+        while True:
+            try:
+                async with self.collection.watch(pipeline, full_document="updateLookup") as stream:
+                    async for change in stream:
+                        shipment_id = change["documentKey"]["_id"]
+                        self.invalidate_shipment(shipment_id)
+                        document = change.get("fullDocument")
+                        self.feed.apply(shipment_id, ShipmentInDB.from_mongo(document) if document else None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Shipment change stream failed, restarting: {e}")
+                # Anything may have changed while we weren't listening
+                self.cache.clear()
+                await self.feed.seed(self.collection)
+                await asyncio.sleep(5)
+
+    async def resync_feed(self, interval: float):
+        """Periodically reseeds the available feed to pick up other workers' writes."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.feed.seed(self.collection)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Available feed resync failed: {e}")
+
     async def update_shipment(self, shipment_id: str, update_data: dict) -> Optional[ShipmentInDB]:
+        if "pickup_location" in update_data or "dropoff_location" in update_data:
+            # Re-estimate the route from the new location and the stored other one
+            current = await self.get_shipment_by_id(shipment_id)
+            route = {
+                field: update_data[field] if field in update_data else getattr(current, field, None)
+                for field in ("pickup_location", "dropoff_location")
+            }
+            self._estimate_routes([route])
+            update_data["estimated_distance"] = route["estimated_distance"]
+            update_data["estimated_duration_minutes"] = route["estimated_duration_minutes"]
         update_data["updated_at"] = datetime.utcnow()
         result = await self.collection.update_one(
             {"_id": ObjectId(shipment_id)},
@@ -42,17 +184,80 @@ class ShipmentService:
         )
         
         if result.modified_count:
-            return await self.get_shipment_by_id(shipment_id)
+            self.invalidate_shipment(shipment_id)
+            shipment = await self.get_shipment_by_id(shipment_id)
+            self.feed.apply(shipment_id, shipment)
+            return shipment
         return None
 
     async def get_shipments_by_customer(self, customer_id: str) -> List[ShipmentInDB]:
         cursor = self.collection.find({"customer_id": ObjectId(customer_id)})
         shipments = []
         async for shipment_data in cursor:
-            shipments.append(ShipmentInDB(**shipment_data))
+            shipments.append(ShipmentInDB.from_mongo(shipment_data))
         return shipments
 
     async def get_available_shipments(self, vehicle_types: List[str] = None) -> List[ShipmentInDB]:
+        if self.feed.ready:
+            return self.feed.list(vehicle_types)
+        return await self._query_available_shipments(vehicle_types)
+
+    async def get_nearby_available_shipments(
+        self,
+        origin: List[float],
+        vehicle_types: List[str] = None,
+        max_distance_km: Optional[float] = None
+    ) -> List[Tuple[ShipmentInDB, float]]:
+        """Available shipments nearest pickup first, with their distance from `origin` in km."""
+        if self.feed.ready:
+            return self.feed.nearby(origin, vehicle_types, max_distance_km)
+        shipments = await self._query_available_shipments(vehicle_types)
+        order, distances = rank_by_distance(
+            origin,
+            as_coordinates([self._coordinates(shipment.pickup_location) for shipment in shipments]),
+            max_distance_km
+        )
+        return [(shipments[index], distances[index]) for index in order.tolist()]
+
+    async def get_available_changes(self, since: Optional[str], vehicle_types: List[str] = None) -> dict:
+        """Available shipments changed, and ids no longer available to the driver, since a token.
+
+        Tokens are sync tokens: the server time the previous poll started at,
+        so they mean the same on every worker. Changes are read from MongoDB
+        by `updated_at` with the same overlap window as delta sync; without a
+        token, or with one that isn't valid, the full list comes back with
+        `reset: True`.
+        """
+        started_at = datetime.utcnow()
+        try:
+            cutoff = decode_sync_token(since) - timedelta(seconds=settings.sync_overlap_seconds) if since else None
+        except ValueError:
+            cutoff = None
+        if cutoff is None:
+            return {
+                "token": encode_sync_token(started_at),
+                "reset": True,
+                "shipments": await self.get_available_shipments(vehicle_types),
+                "removed": [],
+            }
+
+        wanted = {str(getattr(vehicle_type, "value", vehicle_type)) for vehicle_type in vehicle_types or ()}
+        changed, removed = [], []
+        async for document in self.collection.find({"updated_at": {"$gte": cutoff}}).sort("updated_at", 1):
+            shipment = ShipmentInDB.from_mongo(document)
+            if is_available(shipment) and (not wanted or wanted & vehicle_types_of(shipment)):
+                changed.append(shipment)
+            else:
+                # Left bidding, or no longer needs the driver's vehicle
+                removed.append(str(shipment.id))
+        return {
+            "token": encode_sync_token(started_at),
+            "reset": False,
+            "shipments": changed,
+            "removed": removed,
+        }
+
+    async def _query_available_shipments(self, vehicle_types: List[str] = None) -> List[ShipmentInDB]:
         query = {"status": "bidding"}
         if vehicle_types:
             query["vehicle_requirements"] = {"$in": vehicle_types}
@@ -60,7 +265,7 @@ class ShipmentService:
         cursor = self.collection.find(query)
         shipments = []
         async for shipment_data in cursor:
-            shipments.append(ShipmentInDB(**shipment_data))
+            shipments.append(ShipmentInDB.from_mongo(shipment_data))
         return shipments
 
     async def publish_shipment(self, shipment_id: str) -> Optional[ShipmentInDB]:
@@ -81,7 +286,10 @@ class ShipmentService:
             "status": "delivered",
             "delivery_confirmation": delivery_data
         }
-        return await self.update_shipment(shipment_id, update_data)
+        shipment = await self.update_shipment(shipment_id, update_data)
+        if shipment and self.on_delivered:
+            await self.on_delivered(shipment_id)
+        return shipment
 
     async def cancel_shipment(self, shipment_id: str) -> Optional[ShipmentInDB]:
         return await self.update_shipment(shipment_id, {"status": "cancelled"})
@@ -90,6 +298,7 @@ class ShipmentService:
     async def create_bid(self, bid_data: dict, driver_id: str) -> BidResponse:
         bid_data["driver_id"] = ObjectId(driver_id)
         bid_data["bid_time"] = datetime.utcnow()
+        bid_data["updated_at"] = bid_data["bid_time"]
         bid_data["status"] = "pending"
         
         result = await self.bids_collection.insert_one(bid_data)
@@ -103,36 +312,42 @@ class ShipmentService:
                 "amount": bid_data["amount"],
                 "status": "pending",
                 "bid_time": bid_data["bid_time"]
-            }}}
+            }}, "$set": {"updated_at": bid_data["bid_time"]}}
         )
+        self.invalidate_shipment(bid_data["shipment_id"])
+        self.feed.add_bid(bid_data["shipment_id"], Bid(
+            driver_id=bid_data["driver_id"],
+            amount=bid_data["amount"],
+            bid_time=bid_data["bid_time"]
+        ), updated_at=bid_data["bid_time"])
         
         return BidResponse(**bid_data)
 
     async def get_bid_by_id(self, bid_id: str) -> Optional[BidResponse]:
         bid_data = await self.bids_collection.find_one({"_id": ObjectId(bid_id)})
         if bid_data:
-            return BidResponse(**bid_data)
+            return BidResponse.from_mongo(bid_data)
         return None
 
     async def get_bids_by_shipment(self, shipment_id: str) -> List[BidResponse]:
         cursor = self.bids_collection.find({"shipment_id": ObjectId(shipment_id)})
         bids = []
         async for bid_data in cursor:
-            bids.append(BidResponse(**bid_data))
+            bids.append(BidResponse.from_mongo(bid_data))
         return bids
 
     async def get_bids_by_driver(self, driver_id: str) -> List[BidResponse]:
         cursor = self.bids_collection.find({"driver_id": ObjectId(driver_id)})
         bids = []
         async for bid_data in cursor:
-            bids.append(BidResponse(**bid_data))
+            bids.append(BidResponse.from_mongo(bid_data))
         return bids
 
     async def accept_bid(self, bid_id: str) -> Optional[BidResponse]:
         # Update bid status
         result = await self.bids_collection.update_one(
             {"_id": ObjectId(bid_id)},
-            {"$set": {"status": "accepted"}}
+            {"$set": {"status": "accepted", "updated_at": datetime.utcnow()}}
         )
         
         if result.modified_count:
@@ -147,7 +362,7 @@ class ShipmentService:
                         "shipment_id": bid.shipment_id,
                         "_id": {"$ne": ObjectId(bid_id)}
                     },
-                    {"$set": {"status": "rejected"}}
+                    {"$set": {"status": "rejected", "updated_at": datetime.utcnow()}}
                 )
                 
                 return bid
@@ -156,11 +371,15 @@ class ShipmentService:
     async def reject_bid(self, bid_id: str) -> Optional[BidResponse]:
         result = await self.bids_collection.update_one(
             {"_id": ObjectId(bid_id)},
-            {"$set": {"status": "rejected"}}
+            {"$set": {"status": "rejected", "updated_at": datetime.utcnow()}}
         )
         
         if result.modified_count:
-            return await self.get_bid_by_id(bid_id)
+            bid = await self.get_bid_by_id(bid_id)
+            if bid:
+                # Bid changes are synced through their shipment's updated_at
+                await self.update_shipment(str(bid.shipment_id), {})
+            return bid
         return None
 
 
@@ -0,0 +1,87 @@
+import base64
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from ..core.config import settings
+from ..models.user import UserInDB
+from ..models.shipment import ShipmentInDB, BidResponse
+from ..models.notification import NotificationInDB
+from ..core.mongo_monitor import instrument_service
+
+_TOKEN_PREFIX = "v1:"
+
+def encode_sync_token(timestamp: datetime) -> str:
+    millis = int((timestamp - datetime(1970, 1, 1)).total_seconds() * 1000)
+    return base64.urlsafe_b64encode(f"{_TOKEN_PREFIX}{millis}".encode()).decode().rstrip("=")
+
+def decode_sync_token(token: str) -> datetime:
+    """Returns the time a sync token was issued at; raises ValueError for malformed tokens."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+    except Exception:
+        raise ValueError("Malformed sync token")
+    if not raw.startswith(_TOKEN_PREFIX) or not raw[len(_TOKEN_PREFIX):].isdigit():
+        raise ValueError("Malformed sync token")
+    return datetime(1970, 1, 1) + timedelta(milliseconds=int(raw[len(_TOKEN_PREFIX):]))
+
+@instrument_service
+class SyncService:
+    """Changes to a user's shipments, bids and notifications since a sync token.
+
+    Tokens are opaque to clients and encode the server time the previous sync
+    started at. Writes stamped just before that time may commit after it, so
+    every sync re-reads a short overlap window; clients upsert by id and
+    tolerate seeing a document twice.
+    """
+
+    def __init__(self, database: AsyncIOMotorDatabase):
+        self.shipments = database.shipments
+        self.bids = database.bids
+        self.notifications = database.notifications
+
+    async def changes_since(self, user: UserInDB, since: Optional[str] = None) -> Dict:
+        started_at = datetime.utcnow()
+        cutoff = None
+        if since:
+            cutoff = decode_sync_token(since) - timedelta(seconds=settings.sync_overlap_seconds)
+
+        def changed(query: dict, field: str = "updated_at") -> dict:
+            if cutoff is not None:
+                query[field] = {"$gte": cutoff}
+            return query
+
+        if user.role == "driver":
+            shipments = await self._find_shipments(changed({"bids.driver_id": user.id}))
+            bids = await self._find_bids(changed({"driver_id": user.id}))
+        else:
+            shipments = await self._find_shipments(changed({"customer_id": user.id}))
+            # Every bid write also bumps its shipment's updated_at, so only
+            # shipments that changed can have changed bids
+            shipment_ids = [shipment.id for shipment in shipments]
+            bids = await self._find_bids(changed({"shipment_id": {"$in": shipment_ids}})) if shipment_ids else []
+
+        notifications = []
+        async for document in self.notifications.find(
+            changed({"user_id": user.id}, "created_at")
+        ).sort("created_at", 1):
+            notifications.append(NotificationInDB.from_mongo(document))
+
+        return {
+            "token": encode_sync_token(started_at),
+            "full": cutoff is None,
+            "shipments": shipments,
+            "bids": bids,
+            "notifications": notifications,
+        }
+
+    async def _find_shipments(self, query: dict) -> List[ShipmentInDB]:
+        shipments = []
+        async for document in self.shipments.find(query).sort("updated_at", 1):
+            shipments.append(ShipmentInDB.from_mongo(document))
+        return shipments
+
+    async def _find_bids(self, query: dict) -> List[BidResponse]:
+        bids = []
+        async for document in self.bids.find(query).sort("updated_at", 1):
+            bids.append(BidResponse.from_mongo(document))
+        return bids
@@ -0,0 +1,155 @@
+from typing import Optional
+from datetime import datetime, timedelta
+import numpy as np
+from bson import Binary, ObjectId
+from pymongo.errors import DuplicateKeyError
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from ..core.cache import TTLCache
+from ..core.config import settings
+from ..core.geo import douglas_peucker, project_meters
+from ..core.track_codec import COORDINATE_SCALE, decode_track, encode_track
+from ..core.mongo_monitor import instrument_service
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _epoch_ms(timestamp: datetime) -> int:
+    return int((timestamp - _EPOCH).total_seconds() * 1000)
+
+def simplify(points: np.ndarray, tolerance_m: float) -> np.ndarray:
+    """Douglas-Peucker simplification of encoded track rows to the given tolerance in metres"""
+    if tolerance_m <= 0 or len(points) <= 2:
+        return points
+    keep = douglas_peucker(project_meters(points[:, :2] / COORDINATE_SCALE), tolerance_m)
+    return points[keep]
+
+@instrument_service
+class TrackStore:
+    """Delivery tracks as one document per shipment and time window.
+
+    The open window's document holds the first point and a flat array of
+    delta-encoded [lon, lat, ms] integers that each position pushes onto.
+    A push only applies if the stored last point is the one its delta was
+    taken from, so appends from several workers stay consistent; the cached
+    last point just saves the read when nobody else has written.
+    Once a newer window starts, the previous one is sealed into the packed
+    varint form of track_codec; on delivery the whole track is simplified
+    and rewritten as a single compacted document.
+    """
+
+    def __init__(self, database: AsyncIOMotorDatabase):
+        self.collection = database.tracks
+        self.bucket = timedelta(minutes=settings.track_bucket_minutes)
+        # shipment id -> (open window start, last point), so appends don't read first
+        self._open = TTLCache(maxsize=10000, ttl=self.bucket.total_seconds() * 2)
+
+    def _window(self, timestamp: datetime) -> datetime:
+        return _EPOCH + (timestamp - _EPOCH) // self.bucket * self.bucket
+
+    async def append(self, shipment_id, longitude: float, latitude: float, recorded_at: datetime):
+        shipment_id = ObjectId(shipment_id)
+        point = [round(longitude * COORDINATE_SCALE), round(latitude * COORDINATE_SCALE), _epoch_ms(recorded_at)]
+        # Windows follow server time so late or skewed device clocks can't reopen sealed ones
+        now = datetime.utcnow()
+        start = self._window(now)
+
+        state = self._open.get(str(shipment_id))
+        if state is not None and state[0] != start:
+            await self.seal(shipment_id, state[0])
+            state = None
+
+        while True:
+            if state is None:
+                bucket = await self.collection.find_one(
+                    {"shipment_id": shipment_id, "start": start, "deltas": {"$exists": True}}, {"last": 1}
+                )
+                if bucket is None:
+                    try:
+                        await self.collection.insert_one({
+                            # One open document per window, whichever worker opens it
+                            "_id": f"{shipment_id}:{_epoch_ms(start)}",
+                            "shipment_id": shipment_id,
+                            "start": start,
+                            "end": now,
+                            "count": 1,
+                            "origin": point,
+                            "last": point,
+                            "deltas": [],
+                        })
+                        break
+                    except DuplicateKeyError:
+                        continue
+                state = (start, bucket["last"])
+
+            # Only push if `last` is still the point the delta was taken from
+            delta = [value - previous for value, previous in zip(point, state[1])]
+            result = await self.collection.update_one(
+                {"shipment_id": shipment_id, "start": start, "last": state[1]},
+                {"$push": {"deltas": {"$each": delta}}, "$set": {"last": point, "end": now}, "$inc": {"count": 1}}
+            )
+            if result.matched_count:
+                break
+            # Another worker, or a concurrent append here, moved it on; re-read
+            state = None
+        self._open.set(str(shipment_id), (start, point))
+
+    @staticmethod
+    def _bucket_points(bucket: dict) -> np.ndarray:
+        if "packed" in bucket:
+            return decode_track(bytes(bucket["packed"]))
+        deltas = np.asarray(bucket.get("deltas", []), dtype=np.int64).reshape(-1, 3)
+        return np.cumsum(np.vstack((np.asarray(bucket["origin"], dtype=np.int64), deltas)), axis=0)
+
+    async def seal(self, shipment_id, start: datetime):
+        """Packs a finished window's delta array into its binary form."""
+        bucket = await self.collection.find_one(
+            {"shipment_id": ObjectId(shipment_id), "start": start, "deltas": {"$exists": True}}
+        )
+        if bucket is None:
+            return
+        await self.collection.update_one(
+            {"_id": bucket["_id"]},
+            {
+                "$set": {"packed": Binary(encode_track(self._bucket_points(bucket)))},
+                "$unset": {"deltas": "", "origin": "", "last": ""}
+            }
+        )
+
+    async def load(self, shipment_id) -> np.ndarray:
+        """All stored points, oldest first, as [lon * 1e6, lat * 1e6, epoch ms] rows."""
+        buckets = [bucket async for bucket in self.collection.find(
+            {"shipment_id": ObjectId(shipment_id)}
+        ).sort("start", 1)]
+        compacted = [bucket for bucket in buckets if bucket.get("compacted")]
+        if compacted:
+            # A compaction may be halfway through replacing the raw windows
+            buckets = compacted[-1:]
+        if not buckets:
+            return np.empty((0, 3), dtype=np.int64)
+        return np.concatenate([self._bucket_points(bucket) for bucket in buckets])
+
+    async def is_compacted(self, shipment_id) -> bool:
+        return await self.collection.find_one(
+            {"shipment_id": ObjectId(shipment_id), "compacted": True}, {"_id": 1}
+        ) is not None
+
+    async def compact(self, shipment_id, tolerance_m: Optional[float] = None) -> int:
+        """Replaces a finished track with one simplified, packed document; returns the points kept."""
+        tolerance_m = settings.track_compaction_tolerance_m if tolerance_m is None else tolerance_m
+        shipment_id = ObjectId(shipment_id)
+        self._open.invalidate(str(shipment_id))
+        points = await self.load(shipment_id)
+        if not len(points):
+            return 0
+        simplified = simplify(points, tolerance_m)
+        result = await self.collection.insert_one({
+            "shipment_id": shipment_id,
+            "start": _EPOCH + timedelta(milliseconds=int(points[0, 2])),
+            "end": _EPOCH + timedelta(milliseconds=int(points[-1, 2])),
+            "count": len(simplified),
+            "raw_count": len(points),
+            "tolerance_m": tolerance_m,
+            "packed": Binary(encode_track(simplified)),
+            "compacted": True,
+        })
+        await self.collection.delete_many({"shipment_id": shipment_id, "_id": {"$ne": result.inserted_id}})
+        return len(simplified)
@@ -0,0 +1,101 @@
+from typing import Dict, Optional
+from datetime import datetime, timezone
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from .realtime import broker
+from ..core.cache import TTLCache
+from ..models.shipment import ShipmentInDB
+from ..models.tracking import PositionUpdate
+from .shipment_service import ShipmentService
+from .track_store import TrackStore, simplify
+from ..core.track_codec import COORDINATE_SCALE
+from ..core.mongo_monitor import instrument_service
+
+# Shipments whose driver is on the way and can be tracked
+TRACKABLE_STATUSES = {"accepted", "paid", "in_transit"}
+
+def shipment_topic(shipment_id) -> str:
+    return f"shipment:{shipment_id}"
+
+@instrument_service
+class TrackingService:
+    """Live driver positions for shipments, published to `shipment:<id>` topics."""
+
+    def __init__(self, database: AsyncIOMotorDatabase, shipment_service: ShipmentService):
+        self.database = database
+        self.shipment_service = shipment_service
+        self.user_service = shipment_service.user_service
+        # An accepted bid never changes hands, so the driver per shipment can
+        # be cached for as long as the delivery lasts
+        self.assigned_drivers = TTLCache(maxsize=10000, ttl=3600)
+        self.tracks = TrackStore(database)
+
+    async def assigned_driver_id(self, shipment: ShipmentInDB) -> Optional[ObjectId]:
+        if shipment.accepted_bid_id is None:
+            return None
+
+        async def load():
+            bid = await self.shipment_service.get_bid_by_id(str(shipment.accepted_bid_id))
+            return bid.driver_id if bid else None
+
+        return await self.assigned_drivers.get_or_load(str(shipment.id), load)
+
+    async def record_position(self, shipment: ShipmentInDB, driver_id: str, update: PositionUpdate) -> Dict:
+        """Stores the driver's position and publishes it to the shipment's watchers."""
+        recorded_at = update.recorded_at or datetime.utcnow()
+        if recorded_at.tzinfo is not None:
+            recorded_at = recorded_at.astimezone(timezone.utc).replace(tzinfo=None)
+        position = {
+            "type": "location",
+            "shipment_id": str(shipment.id),
+            "coordinates": update.coordinates,
+            "speed_kmh": update.speed_kmh,
+            "heading": update.heading,
+            "recorded_at": recorded_at.isoformat(),
+        }
+        await self.user_service.update_location(driver_id, update.coordinates)
+        await self.tracks.append(shipment.id, update.coordinates[0], update.coordinates[1], recorded_at)
+        broker.publish(shipment_topic(shipment.id), position)
+        return position
+
+    async def latest_position(self, shipment: ShipmentInDB) -> Optional[Dict]:
+        """Last published position, or the assigned driver's last reported location."""
+        position = broker.last_value(shipment_topic(shipment.id))
+        if position is not None:
+            return position
+        driver_id = await self.assigned_driver_id(shipment)
+        driver = await self.user_service.get_user_by_id(str(driver_id)) if driver_id else None
+        if driver is None or not driver.current_location:
+            return None
+        return {
+            "type": "location",
+            "shipment_id": str(shipment.id),
+            "coordinates": driver.current_location,
+            "speed_kmh": None,
+            "heading": None,
+            "recorded_at": driver.location_updated_at.isoformat() if driver.location_updated_at else None,
+        }
+
+    async def finish_delivery(self, shipment_id) -> int:
+        """Compacts a delivered shipment's track and stops serving its live position."""
+        broker.forget(shipment_topic(shipment_id))
+        return await self.tracks.compact(shipment_id)
+
+    async def get_track(self, shipment: ShipmentInDB, tolerance_m: float = 0.0) -> Dict:
+        """The shipment's recorded track, simplified to `tolerance_m` metres (0 for all stored points)."""
+        if shipment.status == "delivered" and not await self.tracks.is_compacted(shipment.id):
+            # Delivered without the hook running (e.g. on another worker)
+            await self.finish_delivery(shipment.id)
+        stored = await self.tracks.load(shipment.id)
+        points = simplify(stored, tolerance_m)
+        coordinates = points[:, :2] / COORDINATE_SCALE
+        return {
+            "shipment_id": str(shipment.id),
+            "tolerance_m": tolerance_m,
+            "stored_points": len(stored),
+            # [longitude, latitude, epoch milliseconds]
+            "points": [
+                [longitude, latitude, timestamp]
+                for (longitude, latitude), timestamp in zip(coordinates.tolist(), points[:, 2].tolist())
+            ],
+        }
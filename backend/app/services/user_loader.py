@@ -0,0 +1,56 @@
+import asyncio
+from typing import Dict, Iterable, List, Optional, Set
+from ..models.user import UserInDB
+from .user_service import UserService
+
+class UserLoader:
+    """Request-scoped batching of user lookups by id.
+
+    `load` calls made within the same event-loop tick are resolved together
+    with a single `$in` query, and results are memoized for the rest of the
+    request. Create one per request; it never sees later writes.
+    """
+
+    def __init__(self, user_service: UserService):
+        self.user_service = user_service
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._pending: List[str] = []
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+
+    def load(self, user_id) -> "asyncio.Future[Optional[UserInDB]]":
+        key = str(user_id)
+        future = self._futures.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._futures[key] = loop.create_future()
+            if not self._pending:
+                # Everything requested before the loop runs again joins this batch
+                loop.call_soon(self._dispatch)
+            self._pending.append(key)
+        return future
+
+    async def load_many(self, user_ids: Iterable) -> List[Optional[UserInDB]]:
+        return list(await asyncio.gather(*(self.load(user_id) for user_id in user_ids)))
+
+    def _dispatch(self):
+        keys, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._resolve(keys))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, keys: List[str]):
+        self.batches += 1
+        try:
+            users = await self.user_service.get_users_by_ids(keys)
+        except Exception as e:
+            for key in keys:
+                # Forget failures so a later load can retry
+                future = self._futures.pop(key)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key in keys:
+            future = self._futures[key]
+            if not future.done():
+                future.set_result(users.get(key))
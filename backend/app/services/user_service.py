@@ -1,9 +1,11 @@
-from typing import Optional, List
+from typing import Optional, List, Dict, Iterable
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 from datetime import datetime
 from ..models.user import UserInDB, UserCreate, UserUpdate
+from ..core.mongo_monitor import instrument_service
 
+@instrument_service
 class UserService:
     def __init__(self, database: AsyncIOMotorDatabase):
         self.database = database
@@ -17,19 +19,30 @@ class UserService:
     async def get_user_by_id(self, user_id: str) -> Optional[UserInDB]:
         user_data = await self.collection.find_one({"_id": ObjectId(user_id)})
         if user_data:
-            return UserInDB(**user_data)
+            return UserInDB.from_mongo(user_data)
         return None
 
+    async def get_users_by_ids(self, user_ids: Iterable[str]) -> Dict[str, UserInDB]:
+        """Fetches many users with one query, keyed by string id (missing ids are absent)"""
+        object_ids = list({ObjectId(user_id) for user_id in user_ids})
+        users = {}
+        if not object_ids:
+            return users
+        async for user_data in self.collection.find({"_id": {"$in": object_ids}}):
+            user = UserInDB.from_mongo(user_data)
+            users[str(user.id)] = user
+        return users
+
     async def get_user_by_phone(self, phone: str) -> Optional[UserInDB]:
         user_data = await self.collection.find_one({"phone": phone})
         if user_data:
-            return UserInDB(**user_data)
+            return UserInDB.from_mongo(user_data)
         return None
 
     async def get_user_by_email(self, email: str) -> Optional[UserInDB]:
         user_data = await self.collection.find_one({"email": email})
         if user_data:
-            return UserInDB(**user_data)
+            return UserInDB.from_mongo(user_data)
         return None
 
     async def update_user(self, user_id: str, update_data: dict) -> Optional[UserInDB]:
@@ -51,9 +64,33 @@ class UserService:
         cursor = self.collection.find({"role": role})
         users = []
         async for user_data in cursor:
-            users.append(UserInDB(**user_data))
+            users.append(UserInDB.from_mongo(user_data))
         return users
 
+    async def update_location(self, user_id: str, coordinates: List[float]) -> bool:
+        """Records a driver's current position.
+
+        Deliberately leaves updated_at alone: positions change every few
+        seconds and would otherwise invalidate profile ETags and delta syncs.
+        """
+        result = await self.collection.update_one(
+            {"_id": ObjectId(user_id)},
+            {"$set": {"current_location": coordinates, "location_updated_at": datetime.utcnow()}}
+        )
+        return result.matched_count > 0
+
+    async def get_located_drivers(self) -> List[UserInDB]:
+        """Verified drivers that have reported a position"""
+        cursor = self.collection.find({
+            "role": "driver",
+            "verification_status": "verified",
+            "current_location": {"$ne": None}
+        })
+        drivers = []
+        async for driver_data in cursor:
+            drivers.append(UserInDB.from_mongo(driver_data))
+        return drivers
+
     async def get_drivers_by_vehicle_type(self, vehicle_type: str) -> List[UserInDB]:
         cursor = self.collection.find({
             "role": "driver",
@@ -62,6 +99,6 @@ class UserService:
         })
         drivers = []
         async for driver_data in cursor:
-            drivers.append(UserInDB(**driver_data))
+            drivers.append(UserInDB.from_mongo(driver_data))
         return drivers
 
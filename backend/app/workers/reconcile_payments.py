@@ -0,0 +1,45 @@
+"""Reconciles payment transactions left pending by lost gateway callbacks.
+
+Run from the backend directory, e.g. on a schedule:
+
+    python -m app.workers.reconcile_payments --stale-minutes 15 --report report.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+from ..core.database import db, connect_to_mongo, close_mongo_connection
+from ..services.reconciliation_service import ReconciliationService
+
+async def run(args) -> dict:
+    await connect_to_mongo()
+    try:
+        service = ReconciliationService(
+            db.database,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            stale_minutes=args.stale_minutes
+        )
+        return await service.reconcile_pending(limit=args.limit)
+    finally:
+        await close_mongo_connection()
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile stale pending payment transactions")
+    parser.add_argument("--batch-size", type=int, default=None, help="Transactions per cursor batch / bulk write")
+    parser.add_argument("--concurrency", type=int, default=None, help="Max concurrent gateway status queries")
+    parser.add_argument("--stale-minutes", type=int, default=None, help="Only reconcile transactions pending for longer than this")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many transactions")
+    parser.add_argument("--report", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    if args.report:
+        with open(args.report, "w") as report_file:
+            report_file.write(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Dispatch assignment engine at batch scale.
+
+Builds the driver x shipment cost matrix for synthetic drivers and
+bidding shipments around Addis Ababa (every driver may take any shipment
+at an assumed price, so the matrix is dense), then solves it optimally
+and greedily. Also prints how much more the greedy plan costs.
+"""
+import random
+import numpy as np
+from app.core.geo import as_coordinates
+from app.services.assignment_service import (
+    URGENCY_DISTANCE_FACTOR, build_cost_matrix, solve_assignment
+)
+from .common import bench, parse_args, report
+from .fixtures import make_shipment_doc, make_user_doc
+
+def main():
+    args = parse_args(__doc__, lambda parser: parser.add_argument(
+        "--size", type=int, default=2000, help="Drivers and shipments in the batch"
+    ))
+    rng = random.Random(42)
+    drivers = [make_user_doc(rng) for _ in range(args.size)]
+    shipments = [make_shipment_doc(rng, bids=0) for _ in range(args.size)]
+    for driver in drivers:
+        driver["current_location"] = [38.76 + rng.uniform(-0.2, 0.2), 9.01 + rng.uniform(-0.2, 0.2)]
+
+    driver_coordinates = as_coordinates([driver["current_location"] for driver in drivers])
+    pickup_coordinates = as_coordinates([shipment["pickup_location"]["coordinates"] for shipment in shipments])
+    urgency = np.array([URGENCY_DISTANCE_FACTOR[shipment["urgency"]] for shipment in shipments])
+    # A bid from roughly one driver in ten on each shipment
+    np_rng = np.random.default_rng(42)
+    bid_amounts = np.where(
+        np_rng.random((args.size, args.size)) < 0.1,
+        np_rng.uniform(300, 3000, (args.size, args.size)),
+        np.nan
+    )
+
+    def build():
+        return build_cost_matrix(
+            driver_coordinates,
+            [driver["vehicle_type"] for driver in drivers],
+            pickup_coordinates,
+            [shipment["vehicle_requirements"] for shipment in shipments],
+            urgency,
+            bid_amounts,
+            cost_per_km=10.0,
+            max_pickup_km=50.0,
+            no_bid_cost=1500.0
+        )
+
+    cost, _ = build()
+    cells = args.size * args.size
+    label = f"{args.size}x{args.size}"
+    results = [
+        bench(f"build cost matrix {label}", build, repeat=args.repeat, number=1, items=cells),
+        bench(f"optimal assignment {label}", lambda: solve_assignment(cost, "optimal"), repeat=args.repeat, number=1, items=cells),
+        bench(f"greedy assignment {label}", lambda: solve_assignment(cost, "greedy"), repeat=args.repeat, number=1, items=cells),
+    ]
+    report(results, args.json)
+
+    for method in ("optimal", "greedy"):
+        rows, cols, _ = solve_assignment(cost, method)
+        print(f"{method}: {len(rows)} assigned, total cost {cost[rows, cols].sum():,.0f} ETB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""ConnectionManager fan-out cost by audience size, with fake sockets.
+
+One notification queued for `N` users and flushed, for JSON and
+MessagePack sockets; one heartbeat round over the same sockets; and
+direct `send_now` calls, the path topic updates take. The fake sockets
+complete every send immediately, so the figures are the manager's own
+work: encoding, frame building and task scheduling.
+"""
+import asyncio
+import random
+from app.services.realtime import ConnectionManager
+from .bench_websocket_frames import CountingSocket, notifications
+from .common import bench, parse_args, report
+
+SIZES = [10, 100, 1000, 10000]
+
+class MsgpackSocket(CountingSocket):
+    scope = {"subprotocols": ["msgpack"]}
+
+def main():
+    args = parse_args(__doc__)
+    loop = asyncio.new_event_loop()
+    message = notifications(1, random.Random(42))[0]
+    results = []
+
+    for binary in (False, True):
+        encoding = "msgpack" if binary else "json"
+        for size in SIZES:
+            manager = ConnectionManager(max_connections=size, max_per_user=1, send_timeout=5.0)
+            sockets = [(MsgpackSocket if binary else CountingSocket)() for _ in range(size)]
+            for index, websocket in enumerate(sockets):
+                loop.run_until_complete(manager.connect(websocket, str(index)))
+            users = [str(index) for index in range(size)]
+
+            async def fan_out():
+                manager.queue(users, message)
+                await manager.flush()
+
+            async def heartbeat():
+                await manager.heartbeat(idle_timeout=3600)
+
+            results.append(bench(f"queue+flush {encoding}[{size}]", lambda: loop.run_until_complete(fan_out()),
+                                 repeat=args.repeat, items=size))
+            results.append(bench(f"heartbeat {encoding}[{size}]", lambda: loop.run_until_complete(heartbeat()),
+                                 repeat=args.repeat, items=size))
+            if manager.flush_handle is not None:
+                manager.flush_handle.cancel()
+
+        manager = ConnectionManager(max_connections=1, max_per_user=1, send_timeout=5.0)
+        websocket = (MsgpackSocket if binary else CountingSocket)()
+        loop.run_until_complete(manager.connect(websocket, "0"))
+        results.append(bench(f"send_now {encoding}", lambda: loop.run_until_complete(manager.send_now(websocket, [message])),
+                             repeat=args.repeat))
+
+    loop.close()
+    report(results, args.json)
+
+if __name__ == "__main__":
+    main()
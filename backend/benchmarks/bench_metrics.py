@@ -0,0 +1,65 @@
+"""Per-request cost of the metrics middleware and of a /metrics scrape.
+
+Drives a bare ASGI app that answers immediately, with and without
+MetricsMiddleware in front, so the difference is the middleware's own
+overhead. The scrape benchmark renders a registry holding `--routes`
+routes' worth of counters and histograms.
+"""
+import asyncio
+from app.core.metrics import MetricsMiddleware, Registry, http_request_duration, http_requests, registry
+from .common import bench, parse_args, report
+
+class Route:
+    def __init__(self, path: str):
+        self.path = path
+
+ROUTE = Route("/api/shipments/{shipment_id}")
+
+async def endpoint(scope, receive, send):
+    scope["route"] = ROUTE
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+async def send(message):
+    pass
+
+def main():
+    args = parse_args(__doc__, lambda parser: parser.add_argument(
+        "--routes", type=int, default=40, help="Distinct routes in the scraped registry"
+    ))
+    loop = asyncio.new_event_loop()
+    wrapped = MetricsMiddleware(endpoint)
+    requests = 1000
+
+    def run(app):
+        async def requests_batch():
+            for _ in range(requests):
+                await app({"type": "http", "method": "GET", "path": "/api/shipments/1"}, receive, send)
+        return lambda: loop.run_until_complete(requests_batch())
+
+    scraped = Registry()
+    counter = scraped.counter("http_requests_total", "", ("method", "route", "status"))
+    histogram = scraped.histogram("http_request_duration_seconds", "", ("method", "route"))
+    for index in range(args.routes):
+        for method in ("GET", "POST"):
+            counter.inc(method, f"/api/route{index}", "200")
+            histogram.observe(index / 1000, method, f"/api/route{index}")
+
+    results = [
+        bench("bare ASGI app", run(endpoint), repeat=args.repeat, items=requests),
+        bench("with MetricsMiddleware", run(wrapped), repeat=args.repeat, items=requests),
+        bench("Counter.inc", lambda: http_requests.inc("GET", "/bench", "200"), repeat=args.repeat),
+        bench("Histogram.observe", lambda: http_request_duration.observe(0.012, "GET", "/bench"), repeat=args.repeat),
+        bench(f"render {args.routes * 2} route series", scraped.render, repeat=args.repeat),
+        bench("render app registry", registry.render, repeat=args.repeat),
+    ]
+    loop.close()
+    report(results, args.json)
+    overhead = results[1]["per_item_ns"] - results[0]["per_item_ns"]
+    print(f"\nmiddleware overhead: {overhead / 1000:.2f} us per request")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Per-call cost of the model operations on every request.
+
+Single documents rather than batches: validating a `PyObjectId` from a
+path parameter or stored ObjectId, building `ShipmentInDB`/`UserInDB`
+from one stored document (validated and trusted), parsing a create
+request body, and dumping one model back out.
+"""
+from bson import ObjectId
+from pydantic import TypeAdapter
+from app.models.shipment import ShipmentCreate, ShipmentInDB
+from app.models.user import PyObjectId, UserInDB
+from .common import bench, parse_args, report
+from .fixtures import make_shipment_docs, make_user_docs
+
+CREATE_BODY = b"""{
+    "pickup_location": {"coordinates": [38.76, 9.01], "address": "12 Bole Road, Addis Ababa"},
+    "dropoff_location": {"coordinates": [38.79, 9.03], "address": "300 Churchill Avenue, Addis Ababa"},
+    "receiver_info": {"name": "Abebe Kebede", "phone": "+251911000000"},
+    "vehicle_requirements": ["truck"],
+    "shipment_date": "2030-01-01T10:00:00",
+    "item_description": "Household items",
+    "weight_kg": 120.5,
+    "urgency": "high"
+}"""
+
+def main():
+    args = parse_args(__doc__)
+    object_ids = TypeAdapter(PyObjectId)
+    oid = ObjectId()
+    oid_text = str(oid)
+    shipment_doc = make_shipment_docs(1)[0]
+    user_doc = make_user_docs(1)[0]
+    shipment = ShipmentInDB(**shipment_doc)
+    user = UserInDB(**user_doc)
+
+    results = [
+        bench("PyObjectId from str", lambda: object_ids.validate_python(oid_text), repeat=args.repeat),
+        bench("PyObjectId from ObjectId", lambda: object_ids.validate_python(oid), repeat=args.repeat),
+        bench("ObjectId.is_valid(str)", lambda: ObjectId.is_valid(oid_text), repeat=args.repeat),
+        bench("ShipmentInDB(**doc)", lambda: ShipmentInDB(**shipment_doc), repeat=args.repeat),
+        bench("ShipmentInDB.from_mongo", lambda: ShipmentInDB.from_mongo(shipment_doc), repeat=args.repeat),
+        bench("UserInDB(**doc)", lambda: UserInDB(**user_doc), repeat=args.repeat),
+        bench("UserInDB.from_mongo", lambda: UserInDB.from_mongo(user_doc), repeat=args.repeat),
+        bench("ShipmentCreate from JSON body", lambda: ShipmentCreate.model_validate_json(CREATE_BODY), repeat=args.repeat),
+        bench("ShipmentInDB.model_dump", lambda: shipment.model_dump(by_alias=True), repeat=args.repeat),
+        bench("ShipmentInDB.model_dump(json)", lambda: shipment.model_dump(mode="json", by_alias=True), repeat=args.repeat),
+        bench("UserInDB.model_dump", lambda: user.model_dump(by_alias=True, exclude={"hashed_password"}), repeat=args.repeat),
+    ]
+    report(results, args.json)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Per-request cost of rate limiting and admission control.
+
+The in-worker bucket store for a caller within and over their limit,
+policy lookup for an exact path, a route template and the default, and
+the identity of an authenticated caller (a cached token) and an
+anonymous one. The middleware part drives a bare ASGI app through
+RateLimitMiddleware and AdmissionMiddleware with generous limits, so
+every request is let through.
+"""
+import asyncio
+from datetime import timedelta
+from app.core.admission import AdmissionMiddleware
+from app.core.rate_limit import MemoryBucketStore, RateLimitMiddleware, RatePolicy, rate_limiter
+from app.core.security import create_access_token
+from .bench_tracing import endpoint, receive, send
+from .common import bench, parse_args, report
+
+def main():
+    args = parse_args(__doc__)
+    loop = asyncio.new_event_loop()
+    store = MemoryBucketStore()
+    store.take_now("drained", 1 / 60, 1)
+    token = create_access_token({"sub": "+251911000000", "user_id": "6ad5e6146257bccd0d7b074e"}, timedelta(minutes=30))
+    authenticated = {"headers": [(b"authorization", f"Bearer {token}".encode())], "client": ("10.0.0.1", 5000)}
+    anonymous = {"headers": [], "client": ("10.0.0.1", 5000)}
+    calls = 1000
+
+    # Nobody is ever refused, so each request takes the full allowed path
+    rate_limiter.store = MemoryBucketStore()
+    rate_limiter.default = RatePolicy("default", per_minute=1e12, burst=1e12)
+    def requests(app):
+        scope = {"type": "http", "method": "GET", "path": "/api/shipments/", **authenticated}
+        async def batch():
+            for _ in range(calls):
+                await app(scope, receive, send)
+        return lambda: loop.run_until_complete(batch())
+
+    results = [
+        bench("bucket take (allowed)", lambda: store.take_now("caller", 1e12, 1e12), repeat=args.repeat),
+        bench("bucket take (refused)", lambda: store.take_now("drained", 1 / 60, 1), repeat=args.repeat),
+        bench("policy_for exact path", lambda: rate_limiter.policy_for("POST", "/api/bids/"), repeat=args.repeat),
+        bench("policy_for template", lambda: rate_limiter.policy_for("GET", "/api/tracking/6ad5e6146257bccd0d7b074e"),
+              repeat=args.repeat),
+        bench("policy_for default", lambda: rate_limiter.policy_for("GET", "/api/shipments/"), repeat=args.repeat),
+        bench("identity (cached token)", lambda: rate_limiter.identity(authenticated, rate_limiter.default),
+              repeat=args.repeat),
+        bench("identity (anonymous)", lambda: rate_limiter.identity(anonymous, rate_limiter.default), repeat=args.repeat),
+        bench("bare ASGI app", requests(endpoint), repeat=args.repeat, items=calls),
+        bench("RateLimitMiddleware", requests(RateLimitMiddleware(endpoint)), repeat=args.repeat, items=calls),
+        bench("AdmissionMiddleware", requests(AdmissionMiddleware(endpoint)), repeat=args.repeat, items=calls),
+    ]
+    loop.close()
+    report(results, args.json)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""Access tokens and password hashing as configured in `app.core.security`.
+
+JWTs are encoded and decoded on every authenticated request; bcrypt runs
+on register and login at the cost factor passlib is configured with
+(`--bcrypt-rounds` overrides it to see what a change would cost). The
+bcrypt figures are what one worker thread of the blocking executor
+spends per call.
+"""
+from datetime import timedelta
+from app.core.security import create_access_token, pwd_context, verify_token
+from .common import bench, parse_args, report
+
+def main():
+    def configure(parser):
+        parser.add_argument("--bcrypt-rounds", type=int, default=None, help="bcrypt cost factor; the configured one if omitted")
+
+    args = parse_args(__doc__, configure)
+    rounds = args.bcrypt_rounds or pwd_context.handler("bcrypt").default_rounds
+    context = pwd_context.copy(bcrypt__rounds=rounds)
+    claims = {"sub": "+251911000000", "user_id": "6ad5e6146257bccd0d7b074e"}
+    token = create_access_token(claims, timedelta(minutes=30))
+    tampered = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+    password = "correct horse battery"
+    hashed = context.hash(password)
+
+    results = [
+        bench("create_access_token", lambda: create_access_token(claims, timedelta(minutes=30)), repeat=args.repeat),
+        bench("verify_token (valid)", lambda: verify_token(token), repeat=args.repeat),
+        bench("verify_token (bad signature)", lambda: verify_token(tampered), repeat=args.repeat),
+        bench(f"bcrypt hash (rounds={rounds})", lambda: context.hash(password), repeat=args.repeat, number=1),
+        bench(f"bcrypt verify (rounds={rounds})", lambda: context.verify(password, hashed), repeat=args.repeat, number=1),
+    ]
+    report(results, args.json)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Response serialization cost per shipment list size.
+
+Compares FastAPI's default path (dump the service model, re-validate it as
+`response_model`, dump again in JSON mode, stdlib json) with the ORJSON
+response class used by the routes.
+"""
+import json
+from typing import List
+from pydantic import TypeAdapter
+from app.core.responses import ORJSONResponse
+from app.models.shipment import Shipment, ShipmentInDB
+from .common import bench, parse_args, report
+from .fixtures import make_shipment_docs
+
+SIZES = [1, 10, 100, 1000]
+
+def main():
+    args = parse_args(__doc__)
+    response_adapter = TypeAdapter(List[Shipment])
+    results = []
+
+    for size in SIZES:
+        shipments = [ShipmentInDB(**doc) for doc in make_shipment_docs(size)]
+
+        def default_path():
+            content = [shipment.model_dump(by_alias=True) for shipment in shipments]
+            validated = response_adapter.validate_python(content)
+            return json.dumps(response_adapter.dump_python(validated, mode="json", by_alias=True)).encode()
+
+        def orjson_path():
+            return ORJSONResponse(shipments).body
+
+        results.append(bench(f"default_response[{size}]", default_path, repeat=args.repeat, items=size))
+        results.append(bench(f"orjson_response[{size}]", orjson_path, repeat=args.repeat, items=size))
+
+    report(results, args.json)
+
+if __name__ == "__main__":
+    main()
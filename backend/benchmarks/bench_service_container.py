@@ -0,0 +1,41 @@
+"""Per-request cost of getting the services a route needs.
+
+Compares building ShipmentService/PaymentService per request (what the
+routes used to do, including the cloudinary.config call) with resolving
+them from the application-lifetime container.
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.services.container import container, get_shipment_service, get_payment_service
+from app.services.shipment_service import ShipmentService
+from app.services.payment_service import PaymentService
+from .common import bench, parse_args, report
+
+def main():
+    args = parse_args(__doc__)
+    # The client connects lazily, so no MongoDB server is needed here
+    database = AsyncIOMotorClient("mongodb://localhost:27017")["benchmark"]
+    # The dependencies read the module-level container, as the routes do
+    container.init(database)
+
+    async def from_container():
+        return await get_shipment_service(), await get_payment_service()
+
+    def resolve():
+        # The dependencies never suspend, so step the coroutine directly
+        # instead of measuring event loop overhead
+        try:
+            from_container().send(None)
+        except StopIteration as done:
+            return done.value
+
+    assert all(resolve()), "the container dependencies returned no service"
+
+    results = [
+        bench("ShipmentService(db) per request", lambda: ShipmentService(database), repeat=args.repeat),
+        bench("PaymentService(db) per request", lambda: PaymentService(database), repeat=args.repeat),
+        bench("container dependencies", resolve, repeat=args.repeat),
+    ]
+    report(results, args.json)
+
+if __name__ == "__main__":
+    main()
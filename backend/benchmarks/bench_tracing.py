@@ -0,0 +1,72 @@
+"""Cost of tracing per request and per instrumented service call.
+
+Compares a plain coroutine method with the same method behind
+`instrument_service`, outside any trace (the unsampled case, which is
+nearly all traffic) and inside a sampled request. The middleware part
+drives a bare ASGI app with TracingMiddleware at sample rates 0 and 1,
+exporting to memory.
+"""
+import asyncio
+from app.core.mongo_monitor import instrument_service
+from app.core.tracing import InMemoryExporter, TracingMiddleware, current_span, tracer
+from .common import bench, parse_args, report
+
+class Service:
+    async def method(self):
+        return None
+
+@instrument_service
+class InstrumentedService(Service):
+    async def method(self):
+        return None
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+async def send(message):
+    pass
+
+def main():
+    args = parse_args(__doc__)
+    loop = asyncio.new_event_loop()
+    exporter = InMemoryExporter(max_traces=100)
+    tracer.exporter = exporter
+    calls = 1000
+
+    def service_calls(service, sampled: bool):
+        async def batch():
+            root = tracer.start_trace("bench") if sampled else None
+            token = current_span.set(root)
+            for _ in range(calls):
+                await service.method()
+            current_span.reset(token)
+            if root is not None:
+                tracer.end_trace(root)
+        return lambda: loop.run_until_complete(batch())
+
+    def requests(app, sample_rate: float):
+        async def batch():
+            tracer.sample_rate = sample_rate
+            for _ in range(calls):
+                await app({"type": "http", "method": "GET", "path": "/health"}, receive, send)
+        return lambda: loop.run_until_complete(batch())
+
+    tracer.sample_rate = 1.0
+    middleware = TracingMiddleware(endpoint)
+    results = [
+        bench("plain service call", service_calls(Service(), False), repeat=args.repeat, items=calls),
+        bench("instrumented, unsampled", service_calls(InstrumentedService(), False), repeat=args.repeat, items=calls),
+        bench("instrumented, sampled", service_calls(InstrumentedService(), True), repeat=args.repeat, items=calls),
+        bench("bare ASGI app", requests(endpoint, 0.0), repeat=args.repeat, items=calls),
+        bench("TracingMiddleware, rate 0", requests(middleware, 0.0), repeat=args.repeat, items=calls),
+        bench("TracingMiddleware, rate 1", requests(middleware, 1.0), repeat=args.repeat, items=calls),
+    ]
+    loop.close()
+    report(results, args.json)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Storage size and read cost of one delivery's GPS track.
+
+Compares one document per position with the TrackStore layouts: open
+windows of delta-encoded integer arrays, sealed windows packed as varints,
+and the single Douglas-Peucker compacted document kept after delivery.
+Sizes are BSON bytes as MongoDB would store them; the read benchmarks
+decode those bytes back into an array of points, which is what a history
+query pays for beyond the index lookup.
+"""
+from datetime import datetime, timedelta
+import bson
+import numpy as np
+from bson import Binary, ObjectId
+from app.core.config import settings
+from app.core.track_codec import COORDINATE_SCALE, decode_track, encode_track
+from app.services.track_store import TrackStore, simplify
+from .common import bench, parse_args, report
+
+def synthetic_track(minutes: int, interval_s: float, rng: np.random.Generator) -> np.ndarray:
+    """A drive through a few straight streets at ~30 km/h with ~3 m of GPS noise."""
+    count = int(minutes * 60 / interval_s)
+    headings = np.repeat(rng.uniform(0, 2 * np.pi, count // 120 + 1), 120)[:count]
+    step_m = 30 / 3.6 * interval_s
+    east = np.cumsum(np.cos(headings) * step_m) + rng.normal(0, 3, count)
+    north = np.cumsum(np.sin(headings) * step_m) + rng.normal(0, 3, count)
+    longitude = 38.76 + east / (111_320 * np.cos(np.radians(9.01)))
+    latitude = 9.01 + north / 110_540
+    start_ms = int((datetime(2024, 1, 1, 8) - datetime(1970, 1, 1)).total_seconds() * 1000)
+    timestamps = start_ms + (np.arange(count) * interval_s * 1000).astype(np.int64)
+    return np.column_stack((
+        np.round(longitude * COORDINATE_SCALE), np.round(latitude * COORDINATE_SCALE), timestamps
+    )).astype(np.int64)
+
+def main():
+    args = parse_args(__doc__, lambda parser: parser.add_argument(
+        "--minutes", type=int, default=45, help="Length of the delivery"
+    ))
+    rng = np.random.default_rng(7)
+    points = synthetic_track(args.minutes, 1.0, rng)
+    shipment_id = ObjectId()
+    epoch = datetime(1970, 1, 1)
+
+    per_point = [
+        bson.encode({
+            "_id": ObjectId(),
+            "shipment_id": shipment_id,
+            "coordinates": [lon / COORDINATE_SCALE, lat / COORDINATE_SCALE],
+            "recorded_at": epoch + timedelta(milliseconds=int(ms)),
+        })
+        for lon, lat, ms in points.tolist()
+    ]
+
+    window_ms = settings.track_bucket_minutes * 60_000
+    windows = np.split(points, np.flatnonzero(np.diff(points[:, 2] // window_ms)) + 1)
+    open_windows, sealed_windows = [], []
+    for window in windows:
+        base = {
+            "_id": ObjectId(),
+            "shipment_id": shipment_id,
+            "start": epoch + timedelta(milliseconds=int(window[0, 2] // window_ms * window_ms)),
+            "end": epoch + timedelta(milliseconds=int(window[-1, 2])),
+            "count": len(window),
+        }
+        open_windows.append(bson.encode({
+            **base,
+            "origin": window[0].tolist(),
+            "last": window[-1].tolist(),
+            "deltas": np.diff(window, axis=0).ravel().tolist(),
+        }))
+        sealed_windows.append(bson.encode({**base, "packed": Binary(encode_track(window))}))
+
+    simplified = simplify(points, settings.track_compaction_tolerance_m)
+    compacted = [bson.encode({
+        "_id": ObjectId(),
+        "shipment_id": shipment_id,
+        "count": len(simplified),
+        "raw_count": len(points),
+        "packed": Binary(encode_track(simplified)),
+        "compacted": True,
+    })]
+
+    layouts = {
+        "document per point": per_point,
+        "open windows (delta arrays)": open_windows,
+        "sealed windows (packed)": sealed_windows,
+        f"compacted ({settings.track_compaction_tolerance_m:g} m)": compacted,
+    }
+    print(f"{len(points)} points over {args.minutes} min, {len(windows)} windows, "
+          f"{len(simplified)} kept after compaction\n")
+    print(f"{'layout':<30}  {'documents':>9}  {'bytes':>9}  {'bytes/point':>11}")
+    for name, documents in layouts.items():
+        size = sum(len(document) for document in documents)
+        print(f"{name:<30}  {len(documents):>9}  {size:>9,}  {size / len(points):>11.1f}")
+    print()
+
+    def read_per_point():
+        rows = [bson.decode(document) for document in per_point]
+        return np.array([row["coordinates"] for row in rows])
+
+    def read_windows(documents):
+        return lambda: np.concatenate([
+            TrackStore._bucket_points(bson.decode(document)) for document in documents
+        ])
+
+    results = [
+        bench("read document per point", read_per_point, repeat=args.repeat, items=len(points)),
+        bench("read open windows", read_windows(open_windows), repeat=args.repeat, items=len(points)),
+        bench("read sealed windows", read_windows(sealed_windows), repeat=args.repeat, items=len(points)),
+        bench("read compacted", read_windows(compacted), repeat=args.repeat, items=len(points)),
+        bench("encode sealed window", lambda: encode_track(points), repeat=args.repeat, items=len(points)),
+        bench("decode sealed window", lambda: decode_track(encode_track(points)), repeat=args.repeat, items=len(points)),
+        bench("Douglas-Peucker compaction", lambda: simplify(points, settings.track_compaction_tolerance_m), repeat=args.repeat, items=len(points)),
+    ]
+    report(results, args.json)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""Rows per second building models from 10k stored documents.
+
+Compares full validation (`Model(**doc)`, what the services used to do)
+with the trusted-read path (`Model.from_mongo(doc)`).
+"""
+from app.models.shipment import ShipmentInDB
+from app.models.user import UserInDB
+from .common import bench, parse_args, report
+from .fixtures import make_shipment_docs, make_user_docs
+
+ROWS = 10_000
+
+def main():
+    args = parse_args(__doc__)
+    shipment_docs = make_shipment_docs(ROWS)
+    user_docs = make_user_docs(ROWS)
+
+    results = [
+        bench("ShipmentInDB(**doc)", lambda: [ShipmentInDB(**doc) for doc in shipment_docs],
+              repeat=args.repeat, number=1, items=ROWS),
+        bench("ShipmentInDB.from_mongo", lambda: [ShipmentInDB.from_mongo(doc) for doc in shipment_docs],
+              repeat=args.repeat, number=1, items=ROWS),
+        bench("UserInDB(**doc)", lambda: [UserInDB(**doc) for doc in user_docs],
+              repeat=args.repeat, number=1, items=ROWS),
+        bench("UserInDB.from_mongo", lambda: [UserInDB.from_mongo(doc) for doc in user_docs],
+              repeat=args.repeat, number=1, items=ROWS),
+    ]
+    report(results, args.json)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Bytes and frames per WebSocket notification, batched or not.
+
+A peak-hour burst: every driver gets `--burst` new_shipment notifications
+within one batch window. Sizes are what goes on the wire from the server
+(payload plus the unmasked frame header), with and without
+permessage-deflate, which uvicorn negotiates by default. Deflate is
+applied the way the extension does it: one raw deflate stream per
+connection with context takeover, flushed at the end of every frame.
+Each frame is one transport write, i.e. one send syscall.
+
+The timing part pushes the same burst to `--drivers` sockets through
+ConnectionManager, one flush per notification versus one flush per
+window; frames sent drop by the burst size.
+"""
+import asyncio
+import random
+import zlib
+from datetime import datetime
+from app.services.realtime import ConnectionManager, encode_frame, encode_message
+from .common import bench, parse_args, report
+from .fixtures import make_shipment_doc
+
+def notifications(count: int, rng: random.Random) -> list:
+    messages = []
+    for _ in range(count):
+        shipment = make_shipment_doc(rng, bids=0)
+        messages.append({
+            "type": "notification",
+            "timestamp": datetime.utcnow().isoformat(),
+            "data": {
+                "title": "New Shipment Available",
+                "message": f"New shipment from {shipment['pickup_location']['address']} to {shipment['dropoff_location']['address']}",
+                "type": "new_shipment",
+                "shipment_id": str(shipment["_id"]),
+                "distance": None,
+                "urgency": shipment["urgency"],
+            },
+        })
+    return messages
+
+def frame_header(length: int) -> int:
+    return 2 if length < 126 else 4 if length < 65536 else 10
+
+def wire_bytes(frames: list, deflate: bool) -> int:
+    compressor = zlib.compressobj(wbits=-15) if deflate else None
+    total = 0
+    for frame in frames:
+        payload = frame.encode() if isinstance(frame, str) else frame
+        if compressor is not None:
+            # The extension strips the trailing empty block of each flush
+            payload = (compressor.compress(payload) + compressor.flush(zlib.Z_SYNC_FLUSH))[:-4]
+        total += frame_header(len(payload)) + len(payload)
+    return total
+
+class CountingSocket:
+    scope = {}
+
+    def __init__(self):
+        self.frames = 0
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+    async def send_text(self, message: str):
+        self.frames += 1
+
+    async def send_bytes(self, message: bytes):
+        self.frames += 1
+
+def main():
+    def configure(parser):
+        parser.add_argument("--burst", type=int, default=20, help="Notifications per driver in one window")
+        parser.add_argument("--drivers", type=int, default=1000, help="Sockets the burst fans out to")
+
+    args = parse_args(__doc__, configure)
+    burst = notifications(args.burst, random.Random(42))
+
+    print(f"{args.burst} notifications in one window\n")
+    print(f"{'encoding':<16}  {'frames':>6}  {'bytes/notification':>18}  {'with deflate':>12}")
+    for binary in (False, True):
+        encoded = [encode_message(message, binary) for message in burst]
+        for batched in (False, True):
+            frames = [encode_frame(encoded, binary)] if batched else encoded
+            name = ("msgpack" if binary else "json") + (" batched" if batched else "")
+            print(f"{name:<16}  {len(frames):>6}  {wire_bytes(frames, False) / len(burst):>18.1f}  "
+                  f"{wire_bytes(frames, True) / len(burst):>12.1f}")
+    print()
+
+    loop = asyncio.new_event_loop()
+    manager = ConnectionManager(max_connections=args.drivers, max_per_user=1, send_timeout=5.0)
+    sockets = [CountingSocket() for _ in range(args.drivers)]
+    for index, websocket in enumerate(sockets):
+        loop.run_until_complete(manager.connect(websocket, str(index)))
+    drivers = [str(index) for index in range(args.drivers)]
+
+    async def unbatched():
+        for message in burst:
+            manager.queue(drivers, message)
+            await manager.flush()
+
+    async def batched():
+        for message in burst:
+            manager.queue(drivers, message)
+        await manager.flush()
+
+    items = args.drivers * args.burst
+    results = [
+        bench("fan-out, frame per notification", lambda: loop.run_until_complete(unbatched()), repeat=args.repeat, items=items),
+        bench("fan-out, batched", lambda: loop.run_until_complete(batched()), repeat=args.repeat, items=items),
+    ]
+    if manager.flush_handle is not None:
+        manager.flush_handle.cancel()
+    loop.close()
+    report(results, args.json)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Shared timing helpers for the backend microbenchmarks.
+
+Run any benchmark from the backend directory, e.g.
+
+    python -m benchmarks.bench_serialization --json results.json
+"""
+import argparse
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+def bench(
+    name: str,
+    fn: Callable[[], object],
+    repeat: int = 7,
+    number: Optional[int] = None,
+    min_time: float = 0.2,
+    items: int = 1
+) -> Dict:
+    """Times `fn` like timeit: warm up, pick a loop count, then take `repeat` samples.
+
+    GC is disabled while sampling so collections don't land in random samples.
+    `items` is how many rows one call processes, used for per-item figures.
+    """
+    fn()  # warm up caches, lazy imports and schema builds
+
+    if number is None:
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            if time.perf_counter() - start >= min_time:
+                break
+            number *= 2
+
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter_ns()
+            for _ in range(number):
+                fn()
+            samples.append((time.perf_counter_ns() - start) / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    best = min(samples)
+    median = statistics.median(samples)
+    return {
+        "name": name,
+        "loops": number,
+        "repeat": repeat,
+        "items": items,
+        "best_ns": best,
+        "median_ns": median,
+        "stdev_ns": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "per_item_ns": median / items,
+        "items_per_second": items * 1e9 / median if median else 0.0,
+    }
+
+def _format_ns(ns: float) -> str:
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("us", 1e3)):
+        if ns >= scale:
+            return f"{ns / scale:.2f} {unit}"
+    return f"{ns:.0f} ns"
+
+def report(results: List[Dict], json_path: Optional[str] = None):
+    """Prints a table and optionally writes machine-readable results."""
+    width = max(len(result["name"]) for result in results)
+    print(f"{'benchmark':<{width}}  {'median':>10}  {'best':>10}  {'per item':>10}  {'items/s':>12}")
+    for result in results:
+        print(
+            f"{result['name']:<{width}}  {_format_ns(result['median_ns']):>10}  "
+            f"{_format_ns(result['best_ns']):>10}  {_format_ns(result['per_item_ns']):>10}  "
+            f"{result['items_per_second']:>12,.0f}"
+        )
+
+    if json_path:
+        with open(json_path, "w") as output:
+            json.dump({
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "results": results,
+            }, output, indent=2)
+
+def parse_args(
+    description: str,
+    configure: Optional[Callable[[argparse.ArgumentParser], None]] = None
+) -> argparse.Namespace:
+    """Common flags; `configure` can add benchmark-specific ones."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    parser.add_argument("--repeat", type=int, default=7, help="Samples per benchmark")
+    if configure:
+        configure(parser)
+    return parser.parse_args()
@@ -0,0 +1,71 @@
+"""Synthetic MongoDB documents shaped like the ones the services write."""
+import random
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+VEHICLE_TYPES = ["motorbike", "pickup", "truck"]
+URGENCY_LEVELS = ["low", "medium", "high"]
+
+# Roughly Addis Ababa
+CENTER = (38.76, 9.01)
+
+def _location(rng: random.Random) -> dict:
+    return {
+        "coordinates": [CENTER[0] + rng.uniform(-0.15, 0.15), CENTER[1] + rng.uniform(-0.15, 0.15)],
+        "address": f"{rng.randint(1, 999)} Bole Road, Addis Ababa",
+    }
+
+def make_user_doc(rng: random.Random, role: str = "driver") -> dict:
+    now = datetime.utcnow()
+    return {
+        "_id": ObjectId(),
+        "phone": f"+2519{rng.randint(10000000, 99999999)}",
+        "name": f"User {rng.randint(1, 100000)}",
+        "email": f"user{rng.randint(1, 10**9)}@example.com",
+        "role": role,
+        "vehicle_type": rng.choice(VEHICLE_TYPES) if role == "driver" else None,
+        "rating": round(rng.uniform(3, 5), 1),
+        "verification_status": "verified",
+        "payment_methods": ["telebirr"],
+        "hashed_password": "$2b$12$" + "x" * 53,
+        "created_at": now.isoformat(),
+        "updated_at": now.isoformat(),
+    }
+
+def make_shipment_doc(rng: random.Random, bids: int = 3, status: str = "bidding") -> dict:
+    now = datetime.utcnow()
+    return {
+        "_id": ObjectId(),
+        "customer_id": ObjectId(),
+        "pickup_location": _location(rng),
+        "dropoff_location": _location(rng),
+        "receiver_info": {"name": "Abebe Kebede", "phone": "+251911000000"},
+        "vehicle_requirements": [rng.choice(VEHICLE_TYPES)],
+        "shipment_date": now + timedelta(days=1),
+        "photos": ["https://res.cloudinary.com/demo/image/upload/sample.jpg"],
+        "item_description": "Household items",
+        "weight_kg": round(rng.uniform(1, 500), 1),
+        "urgency": rng.choice(URGENCY_LEVELS),
+        "status": status,
+        "bids": [
+            {
+                "driver_id": ObjectId(),
+                "amount": float(rng.randint(200, 5000)),
+                "status": "pending",
+                "bid_time": now,
+            }
+            for _ in range(bids)
+        ],
+        "accepted_bid_id": None,
+        "delivery_confirmation": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+def make_shipment_docs(count: int, seed: int = 42, **kwargs) -> list:
+    rng = random.Random(seed)
+    return [make_shipment_doc(rng, **kwargs) for _ in range(count)]
+
+def make_user_docs(count: int, seed: int = 42, **kwargs) -> list:
+    rng = random.Random(seed)
+    return [make_user_doc(rng, **kwargs) for _ in range(count)]
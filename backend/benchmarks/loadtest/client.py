@@ -0,0 +1,111 @@
+"""HTTP and WebSocket clients for the load test.
+
+HTTP calls go through `requests` on a thread pool sized to the wanted
+concurrency, one session (and keep-alive connection) per thread, and
+are timed on the thread so time spent queued for a free thread isn't
+counted as server latency.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import requests
+import websockets
+
+class LoadClient:
+    def __init__(self, base_url: str, concurrency: int, timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="loadtest")
+        self.local = threading.local()
+        # endpoint -> request latencies in seconds, and failed request counts
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        # endpoint -> [first request start, last response end], for throughput
+        self.windows: Dict[str, List[float]] = {}
+
+    def _session(self) -> requests.Session:
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        return session
+
+    def _call(self, method: str, path: str, token: Optional[str], body: Any) -> Tuple[float, Optional[requests.Response]]:
+        headers = {"Authorization": f"Bearer {token}"} if token else None
+        started = time.perf_counter()
+        try:
+            response = self._session().request(
+                method, self.base_url + path, json=body, headers=headers, timeout=self.timeout
+            )
+        except requests.RequestException:
+            response = None
+        return time.perf_counter() - started, response
+
+    async def request(
+        self,
+        endpoint: str,
+        method: str,
+        path: str,
+        token: Optional[str] = None,
+        body: Any = None
+    ) -> Optional[Any]:
+        """The decoded JSON body of a 2xx response, or None if the request failed.
+
+        `endpoint` is the label latencies are reported under, normally the
+        method and route template.
+        """
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        elapsed, response = await loop.run_in_executor(self.pool, self._call, method, path, token, body)
+        window = self.windows.setdefault(endpoint, [started, started])
+        window[1] = time.perf_counter()
+        self.latencies[endpoint].append(elapsed)
+        if response is None or not response.ok:
+            self.errors[endpoint] += 1
+            return None
+        return response.json()
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+class NotificationSocket:
+    """A driver's WebSocket, recording when each new_shipment notification arrived"""
+
+    def __init__(self, base_url: str, user_id: str, token: str):
+        scheme, _, rest = base_url.partition("://")
+        self.url = f"{'wss' if scheme == 'https' else 'ws'}://{rest.rstrip('/')}/ws/{user_id}?token={token}"
+        # shipment id -> perf_counter time the notification arrived
+        self.arrivals: Dict[str, float] = {}
+        self.connection = None
+        self.reader: Optional[asyncio.Task] = None
+
+    async def connect(self):
+        self.connection = await websockets.connect(self.url, max_queue=None)
+        self.reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        try:
+            async for frame in self.connection:
+                received = time.perf_counter()
+                payload = json.loads(frame)
+                # Frames batch several messages into an array
+                for message in payload if isinstance(payload, list) else [payload]:
+                    if not isinstance(message, dict):
+                        continue
+                    if message.get("type") == "ping":
+                        await self.connection.send(json.dumps({"type": "pong"}))
+                        continue
+                    data = message.get("data") or {}
+                    if message.get("type") == "notification" and data.get("type") == "new_shipment":
+                        self.arrivals.setdefault(data["shipment_id"], received)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def close(self):
+        if self.connection is not None:
+            await self.connection.close()
+        if self.reader is not None:
+            await self.reader
@@ -0,0 +1,141 @@
+"""End-to-end load test of the bidding marketplace.
+
+Drives the flows in `scenario` with synthetic users against a running
+API, or against one it starts itself with `--spawn` on a throwaway
+database, and reports throughput and p50/p95/p99 latency per endpoint,
+plus new_shipment fan-out latency over WebSockets.
+
+Run from the backend directory with MongoDB on localhost:
+
+    python -m benchmarks.loadtest.run --spawn --json results.json
+
+In CI, compare against a stored baseline; the exit status is 1 if any
+endpoint's p95 regressed beyond the tolerance:
+
+    python -m benchmarks.loadtest.run --spawn --baseline baseline.json
+    python -m benchmarks.loadtest.run --spawn --json baseline.json   # refresh it
+
+Numbers only compare between runs on the same machine with the same
+options.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import requests
+from .client import LoadClient
+from .scenario import Marketplace
+from .stats import compare, load_results, print_report, summarize, write_results
+
+FANOUT = "WS new_shipment fan-out"
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8765", help="API to load")
+    parser.add_argument("--spawn", action="store_true", help="Start uvicorn at --base-url on a throwaway database")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when spawning")
+    parser.add_argument("--mongodb-url", default="mongodb://localhost:27017", help="MongoDB for the spawned API")
+    parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight at once")
+    parser.add_argument("--customers", type=int, default=20)
+    parser.add_argument("--drivers", type=int, default=200)
+    parser.add_argument("--shipments-per-customer", type=int, default=5)
+    parser.add_argument("--hot-shipments", type=int, default=5, help="Shipments every driver bids on at once")
+    parser.add_argument("--bids-per-driver", type=int, default=3, help="Bids on other shipments per driver")
+    parser.add_argument("--browse-per-driver", type=int, default=3, help="Available-feed reads per driver")
+    parser.add_argument("--sockets", type=int, default=100, help="Drivers listening on WebSockets")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="Fail if results regressed against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p95 growth, as a fraction")
+    parser.add_argument("--floor-ms", type=float, default=5.0, help="p95 growth below this is never a regression")
+    return parser.parse_args()
+
+def spawn_api(args: argparse.Namespace, database_name: str) -> subprocess.Popen:
+    host, _, port = args.base_url.split("://", 1)[1].rstrip("/").partition(":")
+    # Every synthetic user comes from this one IP, which the login limit would throttle
+    env = {**os.environ, "MONGODB_URL": args.mongodb_url, "DATABASE_NAME": database_name, "RATE_LIMIT_ENABLED": "false",
+           "API_WORKERS": str(args.workers)}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", host, "--port", port or "80",
+         "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+        env=env
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{args.base_url}/health", timeout=1).ok:
+                return server
+        except requests.RequestException:
+            pass
+        if server.poll() is not None:
+            raise SystemExit("The API exited during startup")
+        time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("The API didn't start within 30 seconds")
+
+def drop_database(mongodb_url: str, database_name: str):
+    from pymongo import MongoClient
+    client = MongoClient(mongodb_url)
+    client.drop_database(database_name)
+    client.close()
+
+async def load(args: argparse.Namespace) -> dict:
+    client = LoadClient(args.base_url, args.concurrency)
+    marketplace = Marketplace(
+        client,
+        args.base_url,
+        customers=args.customers,
+        drivers=args.drivers,
+        shipments_per_customer=args.shipments_per_customer,
+        hot_shipments=args.hot_shipments,
+        bids_per_driver=args.bids_per_driver,
+        browse_per_driver=args.browse_per_driver,
+        sockets=args.sockets,
+        seed=args.seed
+    )
+    try:
+        await marketplace.run()
+    finally:
+        client.close()
+
+    endpoints = {
+        name: summarize(latencies, client.errors[name], client.windows[name][1] - client.windows[name][0])
+        for name, latencies in client.latencies.items()
+    }
+    fanout = marketplace.fanout_latencies()
+    expected = len(marketplace.sockets) * len(marketplace.shipments)
+    creates = client.windows.get("POST /api/shipments/", [0.0, 0.0])
+    endpoints[FANOUT] = summarize(fanout, expected - len(fanout), creates[1] - creates[0])
+    config = {name: value for name, value in vars(args).items() if name not in ("json", "baseline")}
+    return {"config": config, "phases": marketplace.phases, "endpoints": endpoints}
+
+def main():
+    args = parse_args()
+    server, database_name = None, f"birtu_loadtest_{os.getpid()}"
+    if args.spawn:
+        server = spawn_api(args, database_name)
+    try:
+        results = asyncio.run(load(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+            drop_database(args.mongodb_url, database_name)
+
+    print()
+    print_report(results)
+    if args.json:
+        write_results(results, args.json)
+    if args.baseline:
+        regressions = compare(results, load_results(args.baseline), args.tolerance, args.floor_ms)
+        print()
+        if regressions:
+            print("Regressions against the baseline:")
+            print("\n".join(f"  {line}" for line in regressions))
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
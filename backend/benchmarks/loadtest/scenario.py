@@ -0,0 +1,207 @@
+"""The marketplace flows the load test drives, phase by phase.
+
+1. customers and drivers register, drivers verify, everyone logs in
+2. some drivers open notification WebSockets
+3. customers create and publish shipments; every create fans a
+   new_shipment notification out to all verified drivers
+4. drivers browse the available feed
+5. bid storm: every matching driver bids on the hot shipments at once,
+   and each driver also bids on a few other shipments
+6. customers read the bids on their shipments and accept the cheapest
+7. customers pay for the accepted shipments
+"""
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from ..fixtures import CENTER, VEHICLE_TYPES, URGENCY_LEVELS
+from .client import LoadClient, NotificationSocket
+
+PASSWORD = "loadtest-password"
+
+class Account:
+    __slots__ = ("phone", "role", "vehicle_type", "user_id", "token")
+
+    def __init__(self, phone: str, role: str, vehicle_type: Optional[str] = None):
+        self.phone = phone
+        self.role = role
+        self.vehicle_type = vehicle_type
+        self.user_id: Optional[str] = None
+        self.token: Optional[str] = None
+
+class Marketplace:
+    def __init__(
+        self,
+        client: LoadClient,
+        base_url: str,
+        customers: int,
+        drivers: int,
+        shipments_per_customer: int,
+        hot_shipments: int,
+        bids_per_driver: int,
+        browse_per_driver: int,
+        sockets: int,
+        seed: int
+    ):
+        self.client = client
+        self.base_url = base_url
+        self.rng = random.Random(seed)
+        # Phones must be unique in the database; a per-run tag lets runs share one
+        tag = f"{random.randrange(10**4):04d}"
+        self.customers = [Account(f"+2519{tag}{index:05d}", "customer") for index in range(customers)]
+        self.drivers = [
+            Account(f"+2517{tag}{index:05d}", "driver", self.rng.choice(VEHICLE_TYPES)) for index in range(drivers)
+        ]
+        self.shipments_per_customer = shipments_per_customer
+        self.hot_shipments = hot_shipments
+        self.bids_per_driver = bids_per_driver
+        self.browse_per_driver = browse_per_driver
+        self.socket_count = sockets
+        self.sockets: List[NotificationSocket] = []
+        # shipment id -> (customer, vehicle requirements, perf_counter time its create was sent)
+        self.shipments: Dict[str, tuple] = {}
+        self.hot: List[str] = []
+        self.accepted: Dict[str, float] = {}
+        self.phases: Dict[str, float] = {}
+
+    async def _phase(self, name: str, jobs):
+        started = time.perf_counter()
+        await asyncio.gather(*jobs)
+        self.phases[name] = time.perf_counter() - started
+        print(f"{name:<10} {self.phases[name]:8.2f} s")
+
+    def _location(self) -> Dict:
+        return {
+            "coordinates": [CENTER[0] + self.rng.uniform(-0.15, 0.15), CENTER[1] + self.rng.uniform(-0.15, 0.15)],
+            "address": f"{self.rng.randint(1, 999)} Bole Road, Addis Ababa",
+        }
+
+    async def _register(self, account: Account):
+        body = {
+            "phone": account.phone,
+            "name": f"Load {account.role} {account.phone[-5:]}",
+            "email": f"load{account.phone[1:]}@example.com",
+            "password": PASSWORD,
+            "role": account.role,
+        }
+        if account.vehicle_type:
+            body["vehicle_type"] = account.vehicle_type
+        await self.client.request("POST /api/auth/register", "POST", "/api/auth/register", body=body)
+        if account.role == "driver":
+            await self.client.request(
+                "POST /api/auth/verify-otp", "POST", "/api/auth/verify-otp", body={"phone": account.phone, "otp": "123456"}
+            )
+        login = await self.client.request(
+            "POST /api/auth/login", "POST", "/api/auth/login", body={"phone": account.phone, "password": PASSWORD}
+        )
+        if login:
+            account.token = login["access_token"]
+            account.user_id = login["user"]["id"]
+
+    async def _connect(self, driver: Account):
+        socket = NotificationSocket(self.base_url, driver.user_id, driver.token)
+        try:
+            await socket.connect()
+        except Exception as e:
+            print(f"WebSocket for {driver.phone} failed: {e}")
+            return
+        self.sockets.append(socket)
+
+    async def _create(self, customer: Account, hot: bool):
+        requirements = list(VEHICLE_TYPES) if hot else [self.rng.choice(VEHICLE_TYPES)]
+        body = {
+            "pickup_location": self._location(),
+            "dropoff_location": self._location(),
+            "receiver_info": {"name": "Abebe Kebede", "phone": "+251911000000"},
+            "vehicle_requirements": requirements,
+            "shipment_date": (datetime.utcnow() + timedelta(days=1)).isoformat(),
+            "item_description": "Household items",
+            "weight_kg": round(self.rng.uniform(1, 500), 1),
+            "urgency": self.rng.choice(URGENCY_LEVELS),
+        }
+        sent = time.perf_counter()
+        shipment = await self.client.request("POST /api/shipments/", "POST", "/api/shipments/", customer.token, body)
+        if shipment is None:
+            return
+        shipment_id = shipment["_id"]
+        self.shipments[shipment_id] = (customer, requirements, sent)
+        if hot:
+            self.hot.append(shipment_id)
+        await self.client.request(
+            "POST /api/shipments/{shipment_id}/publish", "POST", f"/api/shipments/{shipment_id}/publish", customer.token
+        )
+
+    async def _browse(self, driver: Account):
+        for _ in range(self.browse_per_driver):
+            await self.client.request("GET /api/shipments/available", "GET", "/api/shipments/available", driver.token)
+
+    async def _bid(self, driver: Account, shipment_id: str):
+        await self.client.request(
+            "POST /api/bids/", "POST", "/api/bids/", driver.token,
+            {"shipment_id": shipment_id, "amount": float(self.rng.randint(200, 5000))}
+        )
+
+    async def _accept(self, shipment_id: str):
+        customer = self.shipments[shipment_id][0]
+        bids = await self.client.request(
+            "GET /api/bids/shipment/{shipment_id}", "GET", f"/api/bids/shipment/{shipment_id}", customer.token
+        )
+        if not bids:
+            return
+        cheapest = min(bids, key=lambda bid: bid["amount"])
+        accepted = await self.client.request(
+            "PUT /api/bids/{bid_id}/accept", "PUT", f"/api/bids/{cheapest['_id']}/accept", customer.token
+        )
+        if accepted:
+            self.accepted[shipment_id] = cheapest["amount"]
+
+    async def _pay(self, shipment_id: str, amount: float):
+        customer = self.shipments[shipment_id][0]
+        await self.client.request(
+            "POST /api/payments/initiate", "POST", "/api/payments/initiate", customer.token,
+            {"shipment_id": shipment_id, "amount": amount, "payment_method": "telebirr"}
+        )
+
+    def _bid_jobs(self) -> list:
+        jobs = []
+        for shipment_id in self.hot:
+            jobs.extend(self._bid(driver, shipment_id) for driver in self.drivers if driver.token)
+        others = [shipment_id for shipment_id in self.shipments if shipment_id not in self.hot]
+        for driver in self.drivers:
+            if not driver.token:
+                continue
+            matching = [shipment_id for shipment_id in others if driver.vehicle_type in self.shipments[shipment_id][1]]
+            for shipment_id in self.rng.sample(matching, min(self.bids_per_driver, len(matching))):
+                jobs.append(self._bid(driver, shipment_id))
+        self.rng.shuffle(jobs)
+        return jobs
+
+    def fanout_latencies(self) -> List[float]:
+        """Seconds from sending each create to each socket receiving its notification"""
+        latencies = []
+        for socket in self.sockets:
+            for shipment_id, (_, _, sent) in self.shipments.items():
+                if shipment_id in socket.arrivals:
+                    latencies.append(socket.arrivals[shipment_id] - sent)
+        return latencies
+
+    async def run(self):
+        accounts = self.customers + self.drivers
+        await self._phase("register", [self._register(account) for account in accounts])
+        connectable = [driver for driver in self.drivers if driver.token][:self.socket_count]
+        await self._phase("connect", [self._connect(driver) for driver in connectable])
+
+        owners = [customer for customer in self.customers if customer.token for _ in range(self.shipments_per_customer)]
+        await self._phase("create", [
+            self._create(customer, hot=index < self.hot_shipments) for index, customer in enumerate(owners)
+        ])
+
+        await self._phase("browse", [self._browse(driver) for driver in self.drivers if driver.token])
+        await self._phase("bid", self._bid_jobs())
+        await self._phase("accept", [self._accept(shipment_id) for shipment_id in self.shipments])
+        await self._phase("pay", [self._pay(shipment_id, amount) for shipment_id, amount in self.accepted.items()])
+
+        # Let the last notifications of the batch window arrive
+        await asyncio.sleep(0.5)
+        await asyncio.gather(*(socket.close() for socket in self.sockets))
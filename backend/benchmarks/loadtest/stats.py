@@ -0,0 +1,73 @@
+"""Latency summaries for the load test and comparison against a baseline."""
+import json
+import math
+import platform
+import sys
+from typing import Dict, List, Optional
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict:
+    """Counts, throughput and latency percentiles (ms) for one endpoint over a phase of `elapsed` seconds"""
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput": len(ordered) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+    }
+
+def print_report(results: Dict):
+    endpoints = results["endpoints"]
+    width = max([len(name) for name in endpoints] + [8])
+    print(f"{'endpoint':<{width}}  {'requests':>8}  {'errors':>6}  {'req/s':>8}  "
+          f"{'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}  {'max ms':>8}")
+    for name, row in endpoints.items():
+        print(
+            f"{name:<{width}}  {row['requests']:>8}  {row['errors']:>6}  {row['throughput']:>8.1f}  "
+            f"{row['p50_ms']:>8.1f}  {row['p95_ms']:>8.1f}  {row['p99_ms']:>8.1f}  {row['max_ms']:>8.1f}"
+        )
+
+def write_results(results: Dict, path: str):
+    with open(path, "w") as output:
+        json.dump({"python": sys.version.split()[0], "platform": platform.platform(), **results}, output, indent=2)
+
+def load_results(path: str) -> Dict:
+    with open(path) as source:
+        return json.load(source)
+
+def compare(
+    results: Dict,
+    baseline: Dict,
+    tolerance: float,
+    floor_ms: float,
+    metric: str = "p95_ms"
+) -> List[str]:
+    """Regressions against the baseline, one line each.
+
+    An endpoint regresses when `metric` grew by more than `tolerance`
+    (a fraction) and by more than `floor_ms`, so noise on fast endpoints
+    doesn't fail a run, or when it errored where the baseline didn't.
+    """
+    regressions = []
+    for name, before in baseline["endpoints"].items():
+        after: Optional[Dict] = results["endpoints"].get(name)
+        if after is None:
+            regressions.append(f"{name}: missing from this run")
+            continue
+        growth = after[metric] - before[metric]
+        if growth > floor_ms and after[metric] > before[metric] * (1 + tolerance):
+            regressions.append(
+                f"{name}: {metric} {before[metric]:.1f} -> {after[metric]:.1f} "
+                f"(+{growth / before[metric] * 100 if before[metric] else float('inf'):.0f}%)"
+            )
+        if after["errors"] and not before["errors"]:
+            regressions.append(f"{name}: {after['errors']} errors, baseline had none")
+    return regressions
@@ -0,0 +1,92 @@
+"""Runs the microbenchmarks and collects their results in one JSON file.
+
+Each benchmark module runs in its own interpreter so one benchmark's
+allocations and warmed caches don't leak into the next. With
+`--compare` the medians are set against an earlier run's file, so an
+optimization is quantified rather than guessed:
+
+    python -m benchmarks.suite --json before.json
+    # ...change the code...
+    python -m benchmarks.suite --json after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from typing import Dict
+from .common import _format_ns
+
+# Hot-path microbenchmarks; the slower scenario benchmarks (assignment,
+# track storage, idle sockets) are run on their own or with --only
+DEFAULT_MODULES = [
+    "bench_models",
+    "bench_trusted_decode",
+    "bench_serialization",
+    "bench_security",
+    "bench_fanout",
+    "bench_websocket_frames",
+    "bench_metrics",
+    "bench_tracing",
+    "bench_rate_limit",
+]
+
+def run_module(module: str, repeat: int) -> Dict:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "results.json")
+        subprocess.run(
+            [sys.executable, "-m", f"benchmarks.{module}", "--repeat", str(repeat), "--json", path],
+            check=True
+        )
+        with open(path) as results:
+            return json.load(results)["results"]
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def print_comparison(current: Dict, baseline: Dict):
+    print(f"\n{'benchmark':<48}  {'before':>10}  {'after':>10}  {'change':>8}")
+    for module, results in current["modules"].items():
+        before = {result["name"]: result for result in baseline["modules"].get(module, [])}
+        for result in results:
+            old = before.get(result["name"])
+            if old is None:
+                continue
+            change = (result["median_ns"] / old["median_ns"] - 1) * 100
+            print(f"{module + ': ' + result['name']:<48}  {_format_ns(old['median_ns']):>10}  "
+                  f"{_format_ns(result['median_ns']):>10}  {change:>+7.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", default=None, help="Benchmark modules to run, e.g. bench_models")
+    parser.add_argument("--repeat", type=int, default=7, help="Samples per benchmark")
+    parser.add_argument("--json", default=None, help="Write the combined results to this JSON file")
+    parser.add_argument("--compare", default=None, help="Earlier --json output to compare medians against")
+    args = parser.parse_args()
+
+    combined = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "revision": git_revision(),
+        "modules": {},
+    }
+    for module in args.only or DEFAULT_MODULES:
+        print(f"\n== {module}")
+        combined["modules"][module] = run_module(module, args.repeat)
+
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(combined, output, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline:
+            print_comparison(combined, json.load(baseline))
+
+if __name__ == "__main__":
+    main()